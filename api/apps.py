@@ -1,6 +1,33 @@
+import os
+import sys
+from pathlib import Path
+
 from django.apps import AppConfig
+from django.conf import settings
+
+
+def _serving() -> bool:
+    """
+    DATASET_WATCHER خودش opt-in است (gunicorn.conf.py روشنش می‌کند)؛ حتی با آن،
+    دستورهای manage.py به‌جز runserver (migrate، test، ...) به watcher نیاز ندارند.
+    """
+    if Path(sys.argv[0]).name != "manage.py":
+        return True  # gunicorn / uwsgi / ...
+    if sys.argv[1:2] != ["runserver"]:
+        return False
+    # فقط پروسه‌ای که واقعاً سرو می‌کند، نه پروسه‌ی autoreloader
+    return os.environ.get("RUN_MAIN") == "true" or "--noreload" in sys.argv
 
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        if getattr(settings, "DATASET_WATCHER", False) and _serving():
+            from .views_insights import _dataset_watcher
+
+            # pre-warm همین‌جا (در gunicorn --preload: در master و قبل از fork)؛
+            # thread هر پروسه با اولین درخواستش شروع می‌شود
+            _dataset_watcher.autostart = True
+            _dataset_watcher.preload()
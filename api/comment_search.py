@@ -0,0 +1,173 @@
+"""
+جستجوی متن کامل در نظرات، روی ایندکسی که scripts/index_comments.py می‌سازد.
+
+فایل‌های بزرگ (postings و متن نظرات) به صورت mmap باز می‌شوند، پس بارگذاری
+ایندکس سریع است و فقط صفحه‌هایی از دیسک خوانده می‌شوند که جستجو لازم دارد.
+
+منطق query:
+- کلمه‌ها بعد از نرمال‌سازی فارسی با هم AND می‌شوند.
+- هر کلمه‌ی دو حرفی یا بلندتر پیشوندی تطبیق می‌خورد ("کیفیت" → "کیفیتش").
+- اسم برچسب‌ها ("packaging"، "delivery"، ...) به کلمات کلیدی خودشان باز می‌شود.
+"""
+from __future__ import annotations
+
+import json
+import mmap
+import threading
+import time
+from bisect import bisect_left
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from scripts.persian_text import TOKEN_RE, normalize_fa, tokenize
+
+INDEX_FORMAT = 1
+INDEX_CHECK_INTERVAL = 1.0
+MIN_PREFIX_LEN = 2
+
+_EPOCH = date(1970, 1, 1)
+
+
+def _term_matches(token: str, term: str) -> bool:
+    if len(term) >= MIN_PREFIX_LEN:
+        return token.startswith(term)
+    return token == term
+
+
+class CommentIndex:
+    def __init__(self, path: Path):
+        meta = json.loads((path / "meta.json").read_text(encoding="utf-8"))
+        if meta.get("format") != INDEX_FORMAT:
+            raise ValueError(f"unsupported comment index format: {meta.get('format')}")
+
+        self.products: Dict[str, List[int]] = meta["products"]
+        self.aliases: Dict[str, List[List[str]]] = meta.get("aliases") or {}
+        self.n_docs: int = meta["docs"]
+
+        text = (path / "terms.txt").read_text(encoding="utf-8")
+        self.terms: List[str] = text.split("\n") if text else []
+        self.term_offsets = np.load(path / "term_offsets.npy", mmap_mode="r")
+        self.postings = np.load(path / "postings.npy", mmap_mode="r")
+
+        with np.load(path / "docs.npz") as docs:
+            self.comment_id = docs["comment_id"]
+            self.date = docs["date"]
+            self.rating = docs["rating"]
+            self.body_offsets = docs["body_offsets"]
+
+        with (path / "bodies.bin").open("rb") as f:
+            self._bodies = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.body_offsets[-1] else b""
+
+    # ---------- query ----------
+
+    def _term_bits(self, term: str, lo: int, hi: int) -> np.ndarray:
+        """bitmap روی docهای [lo, hi): کدام نظرها term (یا کلمه‌ای با این پیشوند) را دارند."""
+        bits = np.zeros(hi - lo, dtype=bool)
+        first = bisect_left(self.terms, term)
+        if len(term) >= MIN_PREFIX_LEN:
+            last = bisect_left(self.terms, term + "\U0010ffff")
+        else:
+            last = first + 1 if first < len(self.terms) and self.terms[first] == term else first
+        for t in range(first, last):
+            plist = self.postings[self.term_offsets[t]:self.term_offsets[t + 1]]
+            a, b = np.searchsorted(plist, [lo, hi])
+            bits[plist[a:b] - lo] = True
+        return bits
+
+    def _alternatives(self, word: str) -> List[List[str]]:
+        return self.aliases.get(word) or [[word]]
+
+    def parse(self, q: str) -> List[List[List[str]]]:
+        """query → [کلمه: [جایگزین: [term, ...]]]"""
+        return [self._alternatives(word) for word in tokenize(q)]
+
+    def search(self, q: str, sku: Optional[str] = None):
+        """(doc idها به ترتیب محصول و جدیدترین اول، query پارس‌شده برای هایلایت)"""
+        query = self.parse(q)
+        if sku is None:
+            lo, hi = 0, self.n_docs
+        elif sku in self.products:
+            lo, hi = self.products[sku]
+        else:
+            return np.zeros(0, dtype=np.int32), query
+
+        # AND/OR روی bitmap محدوده‌ی محصول: هزینه خطی است، بدون sort و merge
+        hits = np.ones(hi - lo, dtype=bool) if query else np.zeros(hi - lo, dtype=bool)
+        for alternatives in query:
+            word_bits = np.zeros(hi - lo, dtype=bool)
+            for alt in alternatives:
+                alt_bits = self._term_bits(alt[0], lo, hi)
+                for term in alt[1:]:
+                    alt_bits &= self._term_bits(term, lo, hi)
+                word_bits |= alt_bits
+            hits &= word_bits
+            if not hits.any():
+                break
+        return np.flatnonzero(hits) + lo, query
+
+    # ---------- docs ----------
+
+    def body(self, doc: int) -> str:
+        a, b = self.body_offsets[doc], self.body_offsets[doc + 1]
+        return self._bodies[a:b].decode("utf-8")
+
+    def hit(self, doc: int, query) -> Dict[str, Any]:
+        body = self.body(doc)
+        tokens = [(m.start(), m.end(), normalize_fa(m.group()).lower()) for m in TOKEN_RE.finditer(body)]
+        # فقط termهای جایگزین‌هایی که واقعاً در این نظر آمده‌اند هایلایت می‌شوند
+        terms = [
+            term
+            for alternatives in query
+            for alt in alternatives
+            if all(any(_term_matches(tok, t) for _, _, tok in tokens) for t in alt)
+            for term in alt
+        ]
+        highlights = [[a, b] for a, b, tok in tokens if any(_term_matches(tok, t) for t in terms)]
+        days = int(self.date[doc])
+        return {
+            "comment_id": int(self.comment_id[doc]) if self.comment_id[doc] >= 0 else None,
+            "date": (_EPOCH + timedelta(days=days)).isoformat() if days >= 0 else None,
+            "rating": int(self.rating[doc]) or None,
+            "body": body,
+            "highlights": highlights,
+        }
+
+
+class _CommentIndexStore:
+    """
+    ایندکس یک بار باز می‌شود؛ اگر meta.json عوض شود (ساخت دوباره)، دوباره باز می‌شود.
+    path یک symlink به آخرین build است؛ هر بار فقط یک بار resolve می‌شود تا
+    meta.json و postings همیشه از یک build خوانده شوند.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._index: Optional[CommentIndex] = None
+        self._stamp = None
+        self._checked_at = 0.0
+
+    def _current(self):
+        """(پوشه‌ی build فعلی، stamp آن) یا (None, None) اگر ایندکسی نیست."""
+        try:
+            target = self.path.resolve(strict=True)
+            st = (target / "meta.json").stat()
+        except OSError:
+            return None, None
+        return target, (str(target), st.st_mtime_ns, st.st_size)
+
+    def get(self) -> Optional[CommentIndex]:
+        now = time.monotonic()
+        if now - self._checked_at < INDEX_CHECK_INTERVAL:
+            return self._index
+
+        with self._lock:
+            target, stamp = self._current()
+            if stamp != self._stamp:
+                self._index = CommentIndex(target) if stamp is not None else None
+                self._stamp = stamp
+            self._checked_at = now
+        return self._index
@@ -0,0 +1,159 @@
+# api/dataset_watcher.py
+"""
+Snapshot دیتاست insightها که در پس‌زمینه به‌روز می‌شود.
+
+با DATASET_WATCHER=1 (gunicorn.conf.py) ApiConfig.ready snapshot اول را
+می‌سازد (در gunicorn --preload یعنی قبل از fork، تا workerها همان را به ارث
+ببرند) و autostart را روشن می‌کند؛ thread در هر پروسه با اولین درخواست شروع
+می‌شود (threadها بعد از fork منتقل نمی‌شوند) و هر DATASET_WATCH_INTERVAL ثانیه fingerprint
+فایل‌های data/ را چک می‌کند. وقتی تغییری دید و fingerprint در دور بعدی هم
+همان بود (یعنی کپی فایل‌ها تمام شده)، دیتاست، ایندکس‌ها و rollupها را بیرون از
+مسیر درخواست می‌سازد و snapshot جدید را با یک انتساب جایگزین می‌کند.
+
+درخواست‌ها snapshot را یک بار در ابتدای کار می‌گیرند، پس همیشه یک نسخه‌ی
+کامل و سازگار می‌بینند و هیچ‌وقت پشت بارگذاری دوباره منتظر نمی‌مانند؛
+snapshot قبلی تا وقتی درخواستی به آن ارجاع دارد زنده می‌ماند.
+
+بدون thread (manage.py test، دستورهای مدیریتی) همان چک fingerprint هنگام
+دسترسی انجام و در صورت تغییر همان‌جا بارگذاری می‌شود.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+from rest_framework.exceptions import APIException
+
+from . import metrics, singleflight
+from .insights_store import DatasetFingerprint
+
+logger = logging.getLogger(__name__)
+
+
+class DatasetUnavailable(APIException):
+    """اولین بارگذاری thread در first_load_wait ثانیه تمام نشد؛ درخواست 503 می‌گیرد."""
+
+    status_code = 503
+    default_detail = "Dataset is still loading, try again shortly."
+    default_code = "dataset_loading"
+
+
+@dataclass(frozen=True)
+class DatasetSnapshot:
+    fingerprint: str
+    data: Any
+
+
+class DatasetWatcher:
+    def __init__(self, load: Callable[[], Any], fingerprint: DatasetFingerprint, interval: float = 2.0,
+                 first_load_wait: float = 10.0):
+        self.load = load
+        self.fingerprint = fingerprint
+        self.interval = interval
+        self.first_load_wait = first_load_wait
+        self._snapshot: Optional[DatasetSnapshot] = None
+        self.autostart = False
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._seen: Optional[str] = None
+        self._stop = threading.Event()
+        self._first_attempt = threading.Event()
+        # بارگذاری هم‌زمان یک fingerprint فقط یک بار اجرا می‌شود؛ گروه بین
+        # watcherها مشترک است و کلید شامل خود watcher است
+        self._loads = singleflight.group("dataset_load")
+
+    @property
+    def running(self) -> bool:
+        # بعد از fork (gunicorn --preload) thread والد در فرزند وجود ندارد
+        return self._thread is not None and self._pid == os.getpid() and self._thread.is_alive()
+
+    def start(self):
+        with self._lock:
+            if self.running:
+                return
+            self._stop.clear()
+            self._first_attempt.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="dataset-watcher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def preload(self):
+        """snapshot را همین حالا و بدون thread می‌سازد."""
+        try:
+            self._snapshot = self._build(self.fingerprint.compute())
+        except Exception:
+            logger.exception("Dataset preload failed")
+
+    def _build(self, fingerprint: str) -> DatasetSnapshot:
+        return self._loads.do(
+            (id(self), fingerprint), lambda: DatasetSnapshot(fingerprint=fingerprint, data=self._load())
+        )
+
+    def _load(self):
+        t0 = time.perf_counter()
+        try:
+            data = self.load()
+        except Exception:
+            metrics.dataset_load_failures.inc()
+            raise
+        metrics.dataset_load_duration.observe(time.perf_counter() - t0)
+        return data
+
+    def refresh(self) -> bool:
+        """یک دور چک؛ True اگر snapshot جدید جایگزین شد."""
+        fingerprint = self.fingerprint.compute()
+        current = self._snapshot
+        if current is not None and fingerprint == current.fingerprint:
+            self._seen = fingerprint
+            return False
+        # فایل‌ها هنوز در حال تغییرند؛ دور بعد دوباره نگاه می‌کنیم
+        if current is not None and fingerprint != self._seen:
+            self._seen = fingerprint
+            return False
+
+        snapshot = self._build(fingerprint)
+        self._snapshot = snapshot
+        self._seen = fingerprint
+        return True
+
+    def _run(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception:
+                # snapshot قبلی سر جایش می‌ماند
+                logger.exception("Dataset reload failed")
+            self._first_attempt.set()
+            if self._stop.wait(self.interval):
+                return
+
+    def current(self) -> DatasetSnapshot:
+        if self.autostart and not self.running:
+            self.start()
+        snapshot = self._snapshot
+        if self.running:
+            if snapshot is not None:
+                return snapshot
+            # pre-warm هنوز تمام نشده؛ فقط اولین درخواست‌ها و حداکثر first_load_wait
+            # ثانیه منتظر می‌مانند. بارگذاری هم‌زمان در این پروسه فقط به همان
+            # بارگذاری thread (SingleFlight) می‌پیوندد، پس به‌جایش 503 برمی‌گردد.
+            if not self._first_attempt.wait(self.first_load_wait):
+                raise DatasetUnavailable()
+            snapshot = self._snapshot
+            if snapshot is not None:
+                return snapshot
+
+        if snapshot is None or self.fingerprint.current() != snapshot.fingerprint:
+            # اولین بارگذاری، یا حالت بدون thread؛ درخواست‌های هم‌زمان یک بار بارگذاری می‌کنند
+            fingerprint = self.fingerprint.compute()
+            if snapshot is None or fingerprint != snapshot.fingerprint:
+                snapshot = self._snapshot = self._build(fingerprint)
+        return snapshot
@@ -2,6 +2,8 @@ import requests
 from typing import Dict, Any
 from django.conf import settings
 
+from .metrics import outbound_call
+
 
 # api/digikala.py
 
@@ -36,25 +38,28 @@ def _headers(token: str) -> Dict[str, str]:
     return {"Authorization": f"Bearer {token}", "Accept": "application/json"}
 
 def validate_token_and_get_profile(token: str) -> Dict[str, Any]:
-    r = requests.get(f"{DK_BASE}/profile/", headers=_headers(token), timeout=TIMEOUT)
-    r.raise_for_status()
-    return r.json()
+    with outbound_call("digikala"):
+        r = requests.get(f"{DK_BASE}/profile/", headers=_headers(token), timeout=TIMEOUT)
+        r.raise_for_status()
+        return r.json()
 
 def get_profile_with_user_token(token: str) -> Dict[str, Any]:
-    r = requests.get(f"{DK_BASE}/profile/", headers=_headers(token), timeout=TIMEOUT)
-    if r.status_code == 401:
-        # توکن منقضی/باطل؛ به کاربر پیام بده دوباره وارد شود.
+    with outbound_call("digikala"):
+        r = requests.get(f"{DK_BASE}/profile/", headers=_headers(token), timeout=TIMEOUT)
+        if r.status_code == 401:
+            # توکن منقضی/باطل؛ به کاربر پیام بده دوباره وارد شود.
+            r.raise_for_status()
         r.raise_for_status()
-    r.raise_for_status()
-    return r.json()
+        return r.json()
 
 import requests
 
 def get_products_from_dk(token: str):
     url = "https://seller.digikala.com/api/v1/products/"
     headers = {"Authorization": f"Token {token}"}
-    r = requests.get(url, headers=headers, timeout=20)
-    if r.status_code != 200:
-        raise Exception(f"Digikala error: {r.text}")
-    return r.json()
+    with outbound_call("digikala"):
+        r = requests.get(url, headers=headers, timeout=20)
+        if r.status_code != 200:
+            raise Exception(f"Digikala error: {r.text}")
+        return r.json()
 
@@ -0,0 +1,264 @@
+# api/ingest.py
+"""
+اعتبارسنجی و تبدیل نوع CSVهای دیتاست، یک بار هنگام بارگذاری و ستونی.
+
+schema هر جدول: نام ستون → نوع
+- "str"     رشته (شناسه‌ها و مقدارهای تکراری؛ intern می‌شود)
+- "text"    رشته‌ی آزاد
+- "int"     int64؛ خالی → 0 (مقدار اعشاری مثل int(float(x)) بریده می‌شود)
+- "float"   float64؛ خالی → 0.0
+- "float?"  float64؛ خالی → NaN
+- "date"    ordinal تاریخ (int32)؛ خالی → 0
+
+هر چند ده هزار ردیف (ROW_CHUNK) یک تکه است و هر ستون عددی تکه با یک
+astype در numpy تبدیل می‌شود؛ فقط اگر تکه مقدار نامعتبر داشته باشد همان
+ستون مقدار به مقدار دوباره خوانده می‌شود تا ردیف‌های خراب پیدا شوند.
+ردیفی که مقدار غیرخالی و نامعتبر دارد (مثلاً quantity="abc" یا تاریخ
+ناخوانا) یا کمتر از header ستون دارد (خط بریده‌شده) کنار گذاشته (quarantine)
+و در IngestReport ثبت می‌شود، به‌جای اینکه مثل قبل بی‌صدا صفر شود؛ خطای
+ردیف کوتاه با کلید SHORT_ROW شمرده می‌شود. سلول خالی همان مقدار پیش‌فرض
+نوعش را می‌گیرد. ستون‌هایی که در schema نیستند دست نخورده (رشته) می‌مانند.
+
+پس کدی که خروجی را می‌خواند به مقدارهای تایپ‌دار تکیه می‌کند و دیگر
+لازم نیست در هر دسترسی _safe_int/_safe_float/fromisoformat صدا بزند.
+"""
+from __future__ import annotations
+
+import csv
+import sys
+from collections import Counter
+from datetime import date, datetime
+from itertools import chain, repeat, zip_longest
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+ROW_CHUNK = 65_536
+DATE_FORMATS = ("%Y-%m-%d", "%Y/%m/%d", "%Y-%m-%d %H:%M:%S")
+MAX_SAMPLES = 20
+# کلید errors/samples برای ردیف‌هایی که کمتر از header ستون دارند
+SHORT_ROW = "(short row)"
+
+# date(1970, 1, 1).toordinal(): datetime64[D] → ordinal
+_EPOCH_ORDINAL = 719_163
+_INT64_LIMIT = 2.0 ** 63
+
+
+def parse_date(value: str) -> Optional[date]:
+    if not value:
+        return None
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def _parse_numbers(raw: np.ndarray, empty: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """(float64 با NaN برای خالی، ماسک نامعتبرها)"""
+    filled = np.where(empty, "nan", raw)
+    try:
+        return filled.astype(np.float64), np.zeros(len(raw), dtype=bool)
+    except ValueError:
+        pass
+    # تکه‌ی کثیف: مقدار به مقدار، فقط برای پیدا کردن ردیف‌های خراب
+    values: List[float] = []
+    bad: List[bool] = []
+    for v in filled.tolist():
+        try:
+            values.append(float(v))
+            bad.append(False)
+        except ValueError:
+            values.append(np.nan)
+            bad.append(True)
+    return np.array(values, dtype=np.float64), np.array(bad, dtype=bool)
+
+
+def _parse_dates(raw: np.ndarray, empty: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    ordinals = np.zeros(len(raw), dtype=np.int32)
+    todo = ~empty
+    # مسیر سریع: فقط رشته‌های ده‌حرفی YYYY-MM-DD (numpy شکل‌های دیگری مثل
+    # "2024-01" یا "today" را هم می‌پذیرد که strptime نمی‌پذیرد)
+    iso = todo & (np.char.str_len(raw) == 10)
+    if iso.any():
+        try:
+            days = raw[iso].astype("datetime64[D]").astype(np.int64)
+        except ValueError:
+            pass
+        else:
+            ordinals[iso] = days + _EPOCH_ORDINAL
+            todo &= ~iso
+    bad = np.zeros(len(raw), dtype=bool)
+    for i in np.flatnonzero(todo).tolist():
+        d = parse_date(str(raw[i]))
+        if d is None:
+            bad[i] = True
+        else:
+            ordinals[i] = d.toordinal()
+    return ordinals, bad
+
+
+def parse_column(values: Sequence[str], kind: str) -> Tuple[Any, np.ndarray]:
+    """مقدارهای تبدیل‌شده‌ی یک ستون و ماسک مقدارهای نامعتبر."""
+    n = len(values)
+    if kind == "str":
+        return [sys.intern(v) for v in values], np.zeros(n, dtype=bool)
+    if kind == "text":
+        return list(values), np.zeros(n, dtype=bool)
+    raw = np.asarray(values, dtype=str)
+    empty = raw == ""
+    if kind == "date":
+        return _parse_dates(raw, empty)
+    numbers, bad = _parse_numbers(raw, empty)
+    if kind == "float?":
+        return numbers, bad
+    if kind == "float":
+        return np.where(empty, 0.0, numbers), bad
+    if kind == "int":
+        # nan/inf یا خارج از int64 را نمی‌شود int کرد
+        bad |= ~empty & ~(np.abs(numbers) < _INT64_LIMIT)
+        ok = ~bad & ~empty
+        return np.where(ok, numbers, 0.0).astype(np.int64), bad
+    raise ValueError(f"unknown column kind: {kind!r}")
+
+
+class IngestReport:
+    """خلاصه‌ی اعتبارسنجی یک جدول: تعداد ردیف‌ها، خطاها به تفکیک ستون و چند نمونه."""
+
+    def __init__(self, table: str, keep_rows: bool = False):
+        self.table = table
+        self.header: List[str] = []
+        self.missing_columns: List[str] = []
+        self.rows = 0
+        self.quarantined = 0
+        self.errors: Counter = Counter()  # ستون → تعداد مقدار نامعتبر
+        self.samples: List[Dict[str, Any]] = []
+        # همه‌ی ردیف‌های کنار گذاشته‌شده (خام)، فقط برای manage.py validate_dataset
+        self.keep_rows = keep_rows
+        self.quarantined_rows: List[List[str]] = []
+
+    @property
+    def loaded(self) -> int:
+        return self.rows - self.quarantined
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "table": self.table,
+            "rows": self.rows,
+            "loaded": self.loaded,
+            "quarantined": self.quarantined,
+            "missing_columns": self.missing_columns,
+            "errors": dict(self.errors),
+            "samples": self.samples,
+        }
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "IngestReport":
+        report = cls(d["table"])
+        report.rows = d["rows"]
+        report.quarantined = d["quarantined"]
+        report.missing_columns = list(d.get("missing_columns", []))
+        report.errors = Counter(d.get("errors", {}))
+        report.samples = list(d.get("samples", []))
+        return report
+
+    def summary(self) -> str:
+        errors = ", ".join(f"{col}={n}" for col, n in self.errors.most_common())
+        return f"{self.table}: {self.quarantined} of {self.rows} rows quarantined ({errors})"
+
+
+def validate_rows(
+    header: List[str],
+    rows: List[List[str]],
+    schema: Dict[str, str],
+    report: IngestReport,
+) -> Tuple[Dict[str, Any], int]:
+    """
+    یک تکه ردیف خام csv.reader → (ستون‌های تبدیل‌شده بدون ردیف‌های خراب، تعداد ردیف‌های سالم).
+    ستون‌های schema که در header نیستند در خروجی هم نیستند.
+    """
+    n = len(rows)
+    first = report.rows
+    report.rows += n
+    parsed: Dict[str, Any] = {}
+    bad = np.zeros(n, dtype=bool)
+    column_bad: Dict[str, np.ndarray] = {}
+    # ترانهاده‌ی تکه؛ جای خالی ردیف‌های کوتاه‌تر از header با "" پر می‌شود
+    # (تا ستون‌ها هم‌طول بمانند؛ خود این ردیف‌ها پایین‌تر کنار گذاشته می‌شوند)
+    transposed = chain(zip_longest(*rows, fillvalue=""), repeat(("",) * n))
+    for name, values in zip(header, transposed):
+        parsed[name], col_bad = parse_column(values, schema.get(name, "text"))
+        if col_bad.any():
+            column_bad[name] = col_bad
+            bad |= col_bad
+    width = len(header)
+    if rows and min(map(len, rows)) < width:
+        column_bad[SHORT_ROW] = short = np.fromiter((len(row) < width for row in rows), dtype=bool, count=n)
+        bad |= short
+    if not column_bad:
+        return parsed, n
+
+    for name, col_bad in column_bad.items():
+        report.errors[name] += int(col_bad.sum())
+    j_of = {name: j for j, name in enumerate(header)}
+
+    def cell(row: List[str], name: str) -> str:
+        if name == SHORT_ROW:
+            return ",".join(row)
+        return row[j_of[name]] if j_of[name] < len(row) else ""
+
+    for i in np.flatnonzero(bad).tolist():
+        row = rows[i]
+        if report.keep_rows:
+            report.quarantined_rows.append(row)
+        if len(report.samples) < MAX_SAMPLES:
+            report.samples.append({
+                "row": first + i + 1,  # شماره‌ی ردیف داده (بدون header و خط‌های خالی)
+                "columns": {name: cell(row, name) for name, col_bad in column_bad.items() if col_bad[i]},
+            })
+    report.quarantined += int(bad.sum())
+
+    keep = ~bad
+    for name, values in parsed.items():
+        if isinstance(values, np.ndarray):
+            parsed[name] = values[keep]
+        else:
+            parsed[name] = [v for v, k in zip(values, keep.tolist()) if k]
+    return parsed, int(keep.sum())
+
+
+def read_csv_chunks(
+    path: Path,
+    schema: Dict[str, str],
+    report: IngestReport,
+    chunk_rows: int = ROW_CHUNK,
+) -> Iterator[Tuple[Dict[str, Any], int]]:
+    """(ستون‌ها، تعداد ردیف) برای هر تکه‌ی CSV، تبدیل و اعتبارسنجی‌شده. ردیف‌های خالی نادیده گرفته می‌شوند."""
+    if not path.exists():
+        return
+    with path.open(newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        report.header = header
+        report.missing_columns = [name for name in schema if name not in header]
+        chunk: List[List[str]] = []
+        for row in reader:
+            if not row:
+                continue
+            chunk.append(row)
+            if len(chunk) == chunk_rows:
+                yield validate_rows(header, chunk, schema, report)
+                chunk = []
+        if chunk or report.rows == 0:
+            yield validate_rows(header, chunk, schema, report)
+
+
+def read_csv_columns(path: Path, schema: Dict[str, str], report: IngestReport) -> Tuple[Dict[str, Any], int]:
+    """کل فایل به‌صورت یک تکه (برای جدول‌های کوچک)."""
+    columns: Dict[str, Any] = {}
+    n = 0
+    for chunk, rows in read_csv_chunks(path, schema, report, chunk_rows=sys.maxsize):
+        columns, n = chunk, rows
+    return columns, n
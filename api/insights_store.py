@@ -0,0 +1,152 @@
+# api/insights_store.py
+"""
+نتایج از پیش محاسبه‌شده‌ی insightها (خروجی manage.py materialize_insights).
+
+یک فایل SQLite با دو جدول:
+
+- meta(key, value)                                  fingerprint دیتاست، format، زمان ساخت
+- insights(insight, sku, profile, status, payload)  کلید اصلی (insight, sku, profile)
+
+sku خالی یعنی درخواست بدون ?sku=، و profile رشته‌ی JSON همان فیلدهایی از
+SellerSettings است که آن insight لازم دارد (برای بقیه خالی).
+
+فایل اول کنار مقصد ساخته و بعد با os.replace جایگزین می‌شود؛ خواننده‌ها با
+تغییر mtime/size فایل را دوباره باز می‌کنند و درخواست‌های در حال اجرا روی
+فایل قبلی تمام می‌شوند.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Iterable, Optional, Tuple
+
+MATERIALIZED_FORMAT = 1
+
+
+def file_stamp(path: Path):
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+class DatasetFingerprint:
+    """
+    اثر انگشت فایل‌های دیتاست (mtime/size هر فایل + نسخه‌ی منطق محاسبه).
+    حداکثر هر check_interval ثانیه یک بار دوباره stat می‌شود.
+    """
+
+    def __init__(self, data_dir: Path, names: Iterable[str], version: int, check_interval: float = 1.0):
+        self.data_dir = Path(data_dir)
+        self.names = tuple(names)
+        self.version = version
+        self.check_interval = check_interval
+        self._value: Optional[str] = None
+        self._checked_at = 0.0
+
+    def compute(self) -> str:
+        h = hashlib.sha1(f"v{self.version}".encode())
+        for name in self.names:
+            h.update(f"|{name}:{file_stamp(self.data_dir / name)}".encode())
+        return h.hexdigest()
+
+    def current(self) -> str:
+        now = time.monotonic()
+        if self._value is None or now - self._checked_at >= self.check_interval:
+            self._value = self.compute()
+            self._checked_at = now
+        return self._value
+
+
+class MaterializedInsights:
+    """خواننده‌ی فایل SQLite؛ هر thread اتصال read-only خودش را دارد."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._local = threading.local()
+
+    def _open(self):
+        local = self._local
+        stamp = file_stamp(self.path)
+        if stamp == getattr(local, "stamp", None) and stamp is not None:
+            return local.conn, local.fingerprint
+
+        if getattr(local, "conn", None) is not None:
+            local.conn.close()
+        local.conn, local.fingerprint, local.stamp = None, None, stamp
+        if stamp is None:
+            return None, None
+        try:
+            conn = sqlite3.connect(f"{self.path.resolve().as_uri()}?mode=ro", uri=True, check_same_thread=False)
+            meta = dict(conn.execute("SELECT key, value FROM meta"))
+        except sqlite3.Error:
+            return None, None
+        if meta.get("format") != str(MATERIALIZED_FORMAT):
+            conn.close()
+            return None, None
+        local.conn, local.fingerprint = conn, meta.get("fingerprint")
+        return local.conn, local.fingerprint
+
+    def get(self, insight: str, sku: str, profile: str, fingerprint: str) -> Optional[Tuple[Any, int]]:
+        """(payload, status) اگر نتیجه‌ای برای همین fingerprint ذخیره شده باشد، وگرنه None."""
+        conn, stored = self._open()
+        if conn is None or stored != fingerprint:
+            return None
+        row = conn.execute(
+            "SELECT payload, status FROM insights WHERE insight = ? AND sku = ? AND profile = ?",
+            (insight, sku, profile),
+        ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+
+def write_materialized(path: Path, fingerprint: str, rows: Iterable[tuple]) -> int:
+    """
+    rows: (insight, sku, profile, status, payload_json)
+    فایل جدید کنار مقصد ساخته و به‌صورت اتمیک جایگزین می‌شود.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.unlink(missing_ok=True)
+
+    conn = sqlite3.connect(tmp)
+    try:
+        conn.executescript(
+            """
+            PRAGMA journal_mode = OFF;
+            PRAGMA synchronous = OFF;
+            CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+            CREATE TABLE insights (
+                insight TEXT NOT NULL,
+                sku TEXT NOT NULL,
+                profile TEXT NOT NULL,
+                status INTEGER NOT NULL,
+                payload TEXT NOT NULL,
+                PRIMARY KEY (insight, sku, profile)
+            ) WITHOUT ROWID;
+            """
+        )
+        cur = conn.executemany("INSERT INTO insights VALUES (?, ?, ?, ?, ?)", rows)
+        count = cur.rowcount
+        conn.executemany(
+            "INSERT INTO meta VALUES (?, ?)",
+            [
+                ("format", str(MATERIALIZED_FORMAT)),
+                ("fingerprint", fingerprint),
+                ("built_at", str(int(time.time()))),
+                ("rows", str(count)),
+            ],
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp, path)
+    return count
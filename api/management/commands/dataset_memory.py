@@ -0,0 +1,162 @@
+# api/management/commands/dataset_memory.py
+"""
+python manage.py dataset_memory [--json FILE]
+
+حافظه‌ی ExistingData (خروجی _load_existing_data) را به تفکیک جدول و ستون
+گزارش می‌کند. دیتاست دیگر: INSIGHTS_DATA_DIR=<dir>؛ جدول فروش mmap: DATASET_MMAP=1.
+
+- tracemalloc: حافظه‌ای که بعد از بارگذاری نگه داشته شده (retained) و بیشینه‌ی
+  حین بارگذاری؛ یعنی همه‌ی allocationهای پایتون و numpy
+- تفکیک: اندازه‌ی واقعی اشیای هر جدول با پیمایش آن‌ها (sys.getsizeof و
+  nbytes آرایه‌ها)؛ هر شیء فقط یک بار و به اولین جایی که دیده شد حساب می‌شود
+  (مثلاً product_idهای intern‌شده به ستون product_id جدول products، و ردیف‌ها
+  به جدولشان و نه به ایندکس‌ها)
+  - «rows»: ظرف ردیف‌ها (dict هر ردیف و لیست، یا خود شیء جدول ستونی)
+  - هر ستون: مقدارهای آن ستون (رشته، عدد، date یا آرایه)
+  - mapped: آرایه‌های mmap که در heap نیستند و بین workerها مشترک‌اند
+- ایندکس‌ها و rollupها (products_by_id، sales_by_product، ...): فقط حافظه‌ی
+  اضافه‌ای که خودشان دارند
+"""
+import json
+import sys
+import time
+import tracemalloc
+from types import FunctionType, ModuleType
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+TABLES = ("products", "sales", "inventory", "pricing", "reviews", "restocks")
+INDEXES = (
+    "products_by_id",
+    "sales_by_product",
+    "inventory_by_product",
+    "pricing_by_product",
+    "restocks_by_product",
+    "totals_qty",
+    "daily_sales_avg",
+)
+
+
+class _Sizer:
+    """اندازه‌ی عمیق با شمارش هر شیء فقط یک بار (بین همه‌ی فراخوانی‌ها)."""
+
+    def __init__(self):
+        self.seen = set()
+        self.mapped = 0
+
+    def size(self, obj) -> int:
+        total = 0
+        stack = [obj]
+        while stack:
+            o = stack.pop()
+            if id(o) in self.seen or isinstance(o, (type, ModuleType, FunctionType)):
+                continue
+            self.seen.add(id(o))
+            if isinstance(o, np.ndarray):
+                total += sys.getsizeof(o) if o.base is None else 0
+                if isinstance(o, np.memmap) or (o.base is not None and not isinstance(o.base, np.ndarray)):
+                    self.mapped += o.nbytes
+                elif o.base is not None:
+                    stack.append(o.base)
+                continue
+            total += sys.getsizeof(o)
+            if isinstance(o, (str, bytes, int, float)):
+                continue
+            if isinstance(o, dict):  # نه Mappingهای تنبل مثل RecordIndex که مقدارشان را می‌سازند
+                stack.extend(o.keys())
+                stack.extend(o.values())
+            elif isinstance(o, (list, tuple, set, frozenset)):
+                stack.extend(o)
+            if hasattr(o, "__dict__"):
+                stack.append(vars(o))
+            for cls in type(o).__mro__:
+                for slot in getattr(cls, "__slots__", ()):
+                    if hasattr(o, slot):
+                        stack.append(getattr(o, slot))
+        return total
+
+
+def _columns(table):
+    """(نام ستون، مقدارها) برای هر نوع جدول."""
+    if hasattr(table, "columns"):  # RecordTable / SalesTable
+        return list(table.columns.items())
+    names = list(table[0].keys()) if len(table) else []
+    return [(name, [row.get(name) for row in table]) for name in names]
+
+
+def _table_report(sizer: _Sizer, table) -> dict:
+    mapped_before = sizer.mapped
+    columns = {}
+    if isinstance(table, list):
+        # اول مقدارهای هر ستون، بعد dictها و لیست (که حالا فقط ظرف‌اند)
+        for name, values in _columns(table):
+            columns[name] = sum(sizer.size(v) for v in values)
+        rows = sizer.size(table)
+    else:
+        for name, values in _columns(table):
+            columns[name] = sizer.size(values)
+        rows = sizer.size(table)
+    return {
+        "rows": len(table),
+        "type": type(table).__name__,
+        "bytes": rows + sum(columns.values()),
+        "container_bytes": rows,
+        "mapped_bytes": sizer.mapped - mapped_before,
+        "columns": columns,
+    }
+
+
+def _mb(n: int) -> str:
+    return f"{n / 2**20:9.2f} MB"
+
+
+class Command(BaseCommand):
+    help = "Report the memory used by the insights dataset, per table and column."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--json", default=None, help="Also write the report to this file.")
+
+    def handle(self, *args, **options):
+        from api.views_insights import DATA_DIR, _load_existing_data
+
+        tracemalloc.start()
+        base = tracemalloc.get_traced_memory()[0]
+        t0 = time.perf_counter()
+        data = _load_existing_data()
+        seconds = time.perf_counter() - t0
+        retained, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        sizer = _Sizer()
+        tables = {name: _table_report(sizer, getattr(data, name)) for name in TABLES}
+        indexes = {name: sizer.size(getattr(data, name)) for name in INDEXES}
+        report = {
+            "data_dir": str(DATA_DIR),
+            "load_seconds": round(seconds, 3),
+            "tracemalloc_retained_bytes": retained - base,
+            "tracemalloc_peak_bytes": peak - base,
+            "tables": tables,
+            "indexes": indexes,
+        }
+
+        w = self.stdout.write
+        w(f"{DATA_DIR}: loaded in {seconds:.2f}s")
+        w(f"tracemalloc: retained {_mb(retained - base).strip()}, peak {_mb(peak - base).strip()}\n")
+        w(f"{'table / column':<34} {'rows':>10} {'heap':>12} {'per row':>9}")
+        for name, t in tables.items():
+            per_row = t["bytes"] / t["rows"] if t["rows"] else 0
+            mapped = f"  (+{_mb(t['mapped_bytes']).strip()} mapped)" if t["mapped_bytes"] else ""
+            w(f"{name + ' [' + t['type'] + ']':<34} {t['rows']:>10,} {_mb(t['bytes'])} {per_row:8.0f}B{mapped}")
+            w(f"  {'rows':<32} {'':>10} {_mb(t['container_bytes'])}")
+            for column, n in sorted(t["columns"].items(), key=lambda kv: -kv[1]):
+                w(f"  {column:<32} {'':>10} {_mb(n)}")
+        w("")
+        for name, n in indexes.items():
+            w(f"{'index ' + name:<34} {'':>10} {_mb(n)}")
+        total = sum(t["bytes"] for t in tables.values()) + sum(indexes.values())
+        w(f"{'total':<34} {'':>10} {_mb(total)}")
+
+        if options["json"]:
+            with open(options["json"], "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
@@ -0,0 +1,344 @@
+# api/management/commands/generate_dataset.py
+"""
+python manage.py generate_dataset --products N --days D --seed S [--output DIR]
+
+یک دیتاست مصنوعی با همان ستون‌های data/*.csv می‌سازد تا insightها، materialize
+و بنچمارک‌ها روی اندازه‌ی واقعی (تا میلیون‌ها SKU و صدها میلیون فروش) اجرا
+شوند:
+
+- products / inventory / pricing / restocks: یک ردیف برای هر محصول
+- sales:        سفارش‌های روزانه (Poisson) با فصلی بودن، اثر روز هفته، روند،
+                محصولات تازه‌وارد، تغییر قیمت و تخفیف‌های کوتاه‌مدت با کشش قیمتی
+- reviews:      نظرهای کوتاه انگلیسی (مثل reviews.csv)
+- comments_raw: کامنت‌های فارسی با تاریخ شمسی (ستون‌های scripts/crawl_comments.py)
+
+محصولات بلوک‌به‌بلوک (BLOCK_PRODUCTS تایی) ساخته و مستقیم در فایل‌ها نوشته
+می‌شوند، پس حافظه به تعداد محصولات و فروش‌ها بستگی ندارد. هر بلوک RNG خودش را
+از (seed, شماره‌ی بلوک) می‌گیرد؛ با seed و --end یکسان خروجی بایت‌به‌بایت یکسان
+است. فایل‌ها اول با پسوند .tmp نوشته و در پایان با os.replace جایگزین می‌شوند.
+
+برای سرو کردن خروجی (تحلیل، سری زمانی و جستجوی نظرها هم از همان پوشه):
+
+    python scripts/analyze_comments.py --data-dir <output>
+    python scripts/index_comments.py --data-dir <output>
+    INSIGHTS_DATA_DIR=<output> python manage.py runserver
+"""
+import csv
+import os
+import random
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from scripts.jalali import MONTH_NAMES, gregorian_to_jalali
+
+BLOCK_PRODUCTS = 1_000
+SALES_CHUNK = 100_000  # ردیف‌های فروشی که یک‌جا به رشته تبدیل می‌شوند
+DEFAULT_END = date(2025, 11, 20)
+
+REVIEW_RATE = 0.02  # سهم سفارش‌هایی که review انگلیسی می‌گیرند
+COMMENT_RATE = 0.03  # سهم سفارش‌هایی که کامنت فارسی می‌گیرند
+
+COLUMNS = {
+    "products.csv": ["product_id", "title", "category", "brand", "cost_price", "selling_price", "stock"],
+    "inventory.csv": ["product_id", "current_stock", "last_restock_date", "restock_quantity"],
+    "pricing.csv": ["product_id", "your_price", "your_discount_pct", "competitor_min_price",
+                    "competitor_avg_price", "competitor_max_price"],
+    "restocks.csv": ["product_id", "typical_restock_delay_days", "supplier_lead_time_days"],
+    "sales.csv": ["sale_id", "product_id", "sale_date", "quantity", "final_price"],
+    "reviews.csv": ["review_id", "product_id", "review_date", "rating", "comment_text"],
+    "comments_raw.csv": ["product_id", "digikala_id", "comment_id", "rating", "title", "body", "created_at",
+                         "created_date", "recommendation_status", "likes", "dislikes"],
+}
+
+# دسته → (عنوان‌ها، میانه‌ی قیمت، دامنه‌ی فصلی بودن)
+CATEGORIES = {
+    "Fashion": (["Men’s leather coat", "Women’s leather coat", "Wool scarf", "Running shoes", "Denim jacket"],
+                1200, 0.35),
+    "Beauty": (["Lipstick pencil", "Eyebrow pencil", "Hair color No.85", "Men’s perfume", "Women’s body splash"],
+               300, 0.10),
+    "Digital": (["Apple mobile phone", "Asus laptop", "Apple bluetooth headphone", "Sony game console",
+                 "Smart watch"], 25000, 0.15),
+    "Home": (["Inflatable sofa for kids", "Ceramic cookware set", "Desk lamp", "Cotton bed sheet", "Wall clock"],
+             900, 0.20),
+    "Toys": (["Building blocks set", "Remote control car", "Plush bear", "Puzzle 1000 pieces"], 450, 0.25),
+}
+CATEGORY_NAMES = list(CATEGORIES)
+
+# دوشنبه..یکشنبه (date.weekday)؛ شنبه و یکشنبه شلوغ‌ترند، پنج‌شنبه و جمعه کم‌فروش‌تر
+WEEKDAY_FACTOR = np.array([1.00, 1.00, 0.95, 0.90, 0.85, 1.10, 1.05])
+
+# (ماه، روز شروع، روز پایان، ضریب)؛ جشنواره‌ی آخر آبان و خرید شب عید
+PEAKS = [(11, 20, 30, 1.8), (3, 5, 19, 1.5)]
+
+REVIEW_TEXTS = {
+    "positive": ["Excellent!", "Satisfied", "Good quality", "Fast delivery", "Value for money"],
+    "negative": ["Bad packaging", "Not as expected", "Could be better"],
+}
+
+# عبارت‌ها کلیدواژه‌های ISSUE/POSITIVE_KEYWORDS در scripts/analyze_comments.py را پوشش می‌دهند
+COMMENT_PHRASES = {
+    "positive": [
+        "عالی بود", "کیفیت خوب و دوام خوب داره", "قیمت مناسب بود و به صرفه", "ارسال سریع بود",
+        "بسته بندی خوب بود", "راضی ام", "نسبت به قیمت ارزش خرید داره", "خیلی محکم و با کیفیته",
+        "رنگش دقیقا مثل عکس بود", "سایز انتخابی مناسب بود", "به موقع رسید", "بسته‌بندی عالی و جمع و جور",
+    ],
+    "neutral": [
+        "معمولی بود", "بد نیست ولی انتظار بیشتری داشتم", "برای این قیمت قابل قبوله",
+        "رنگش کمی با عکس فرق داشت", "ارسال کمی دیر شد ولی سالم رسید",
+    ],
+    "negative": [
+        "کیفیت پایینی داشت", "بعد از یک هفته خراب شد", "شکسته بود مرجوع کردم", "ارسال خیلی دیر انجام شد",
+        "بسته بندی ضعیف بود و جعبه له شده بود", "نسبت به کیفیت گرونه", "اصلا ارزش خرید نداره",
+        "سایزش کوچک بود", "معیوب بود",
+    ],
+}
+COMMENT_TITLES = ["", "", "", "", "", "", "", "", "خرید خوب", "پیشنهاد میکنم", "راضی نبودم"]
+LIKES = [0, 0, 0, 1, 1, 2, 3, 5, 8]
+DISLIKES = [0, 0, 0, 0, 0, 0, 1, 2]
+RECOMMENDATION = {"positive": "recommended", "neutral": "no_idea", "negative": "not_recommended"}
+# بعضی کامنت‌ها با ی/ک عربی تایپ می‌شوند (مثل داده‌ی واقعی)
+ARABIC_LETTERS = str.maketrans({"ی": "ي", "ک": "ك"})
+
+
+def _tone(rating: int) -> str:
+    return "positive" if rating >= 4 else "neutral" if rating == 3 else "negative"
+
+
+class _Calendar:
+    """ضریب‌های هر روز و رشته‌ی تاریخ‌ها (میلادی و شمسی) یک بار برای کل بازه."""
+
+    def __init__(self, start: date, days: int):
+        self.start = start
+        self.days = days
+        dates = [start + timedelta(days=i) for i in range(days)]
+        self.iso = [d.isoformat() for d in dates]
+        self.jalali = []
+        for d in dates:
+            jy, jm, jd = gregorian_to_jalali(d)
+            self.jalali.append(f"{jd} {MONTH_NAMES[jm]} {jy}")
+
+        doy = np.array([d.timetuple().tm_yday for d in dates], dtype=np.float64)
+        # بیشینه‌ی سالانه حوالی اواخر آذر؛ دامنه برای هر محصول جدا
+        self.annual = np.cos(2 * np.pi * (doy - 355) / 365.25)
+        self.factor = WEEKDAY_FACTOR[[d.weekday() for d in dates]].copy()
+        for month, first, last, boost in PEAKS:
+            self.factor[[i for i, d in enumerate(dates) if d.month == month and first <= d.day <= last]] *= boost
+
+
+class _Writers:
+    def __init__(self, out_dir: Path):
+        self.out_dir = out_dir
+        self.files = {}
+        self.writers = {}
+        self.counts = {}
+        for name, columns in COLUMNS.items():
+            f = (out_dir / f"{name}.tmp").open("w", newline="", encoding="utf-8")
+            self.files[name] = f
+            self.writers[name] = csv.writer(f, lineterminator="\n")
+            self.writers[name].writerow(columns)
+            self.counts[name] = 0
+
+    def write(self, name: str, rows):
+        rows = list(rows)
+        self.writers[name].writerows(rows)
+        self.counts[name] += len(rows)
+
+    def write_lines(self, name: str, lines):
+        """برای sales: ردیف‌های بدون کاما/کوتیشن، سریع‌تر از csv.writer."""
+        self.files[name].write("".join(lines))
+        self.counts[name] += len(lines)
+
+    def close(self, commit: bool):
+        for name, f in self.files.items():
+            f.close()
+            tmp = self.out_dir / f"{name}.tmp"
+            if commit:
+                os.replace(tmp, self.out_dir / name)
+            else:
+                tmp.unlink(missing_ok=True)
+
+
+def _generate_block(block: int, first: int, count: int, options, cal: _Calendar, out: _Writers, state):
+    rng = np.random.default_rng([options["seed"], block])
+    # انتخاب‌های تک‌تک ردیف‌ها (متن کامنت، ...) با random که برای اسکالر سریع‌تر است
+    pick = random.Random(f"{options['seed']}-{block}")
+    days = cal.days
+    width = state["id_width"]
+    pids = [f"P{i:0{width}d}" for i in range(first + 1, first + count + 1)]
+
+    # --- ویژگی‌های ثابت هر محصول
+    category = rng.integers(0, len(CATEGORY_NAMES), count)
+    title_pick = rng.random(count)
+    median_price = np.array([CATEGORIES[CATEGORY_NAMES[c]][1] for c in category], dtype=np.float64)
+    seasonal_amp = np.array([CATEGORIES[CATEGORY_NAMES[c]][2] for c in category]) * rng.uniform(0.5, 1.5, count)
+    base_price = median_price * rng.lognormal(0.0, 0.5, count)
+    cost_ratio = rng.uniform(0.5, 0.85, count)
+    brand = rng.integers(1, 51, count)
+    # محبوبیت با دم بلند؛ میانگین آن 1 است تا --sales-per-day میانگین کل بماند
+    popularity = rng.lognormal(-0.5, 1.0, count)
+    rate = options["sales_per_day"] * popularity
+    elasticity = rng.uniform(1.0, 3.0, count)
+    trend = rng.normal(0.1, 0.3, count)
+    launch = np.where(rng.random(count) < 0.2, rng.integers(0, days, count), 0)
+    mean_rating = rng.uniform(3.0, 4.8, count)
+
+    # --- قیمت روزانه: تغییرهای پله‌ای (به طور میانگین هر ۴۵ روز) + تخفیف‌های ۳ تا ۷ روزه
+    steps = np.where(rng.random((count, days)) < 1 / 45, rng.lognormal(0.0, 0.08, (count, days)), 1.0)
+    list_price = base_price[:, None] * np.cumprod(steps, axis=1)
+    promo_start = rng.random((count, days)) < 1 / 60
+    promo_len = rng.integers(3, 8, count)
+    started = np.cumsum(promo_start, axis=1)
+    lagged = np.zeros_like(started)
+    for i in range(count):
+        n = promo_len[i]
+        lagged[i, n:] = started[i, :-n] if n < days else 0
+    discount = np.where(started - lagged > 0, rng.choice([10, 15, 20, 25, 30], count)[:, None], 0)
+    price = list_price * (1 - discount / 100)
+
+    t = np.arange(days)
+    lam = (
+        rate[:, None]
+        * (1 + seasonal_amp[:, None] * cal.annual[None, :])
+        * cal.factor[None, :]
+        * np.exp(trend[:, None] * t[None, :] / 365)
+        * (price / base_price[:, None]) ** -elasticity[:, None]
+    )
+    lam[t[None, :] < launch[:, None]] = 0
+    orders = rng.poisson(lam)
+
+    # --- sales: ترتیب محصول و بعد تاریخ (مثل sales.csv)
+    per_cell = orders.ravel()
+    cells = np.repeat(np.arange(per_cell.size), per_cell)
+    product = cells // days
+    day = cells % days
+    n_sales = len(cells)
+    per_product = np.bincount(product, minlength=count)
+    seq = np.arange(n_sales) - np.repeat(np.cumsum(per_product) - per_product, per_product)
+    quantity = rng.geometric(0.65, n_sales)
+    final_price = price.ravel()[cells] * rng.normal(1.0, 0.01, n_sales)
+
+    iso = cal.iso
+    for s in range(0, n_sales, SALES_CHUNK):
+        e = s + SALES_CHUNK
+        out.write_lines("sales.csv", [
+            f"S-{pids[p]}-{k},{pids[p]},{iso[d]},{q},{fp:.2f}\n"
+            for p, k, d, q, fp in zip(product[s:e].tolist(), seq[s:e].tolist(), day[s:e].tolist(),
+                                      quantity[s:e].tolist(), final_price[s:e].tolist())
+        ])
+
+    # --- reviews و کامنت‌ها از روی سفارش‌ها، چند روز بعد از خرید
+    rating = np.clip(np.rint(rng.normal(mean_rating[product], 1.0)), 1, 5).astype(np.int64)
+    delay = rng.integers(2, 15, n_sales)
+    posted = np.minimum(day + delay, days - 1)
+    picked = rng.random(n_sales)
+
+    reviewed = np.flatnonzero(picked < REVIEW_RATE)
+    review_seq = np.zeros(count, dtype=np.int64)
+    review_rows = []
+    for i in reviewed.tolist():
+        p, r = int(product[i]), int(rating[i])
+        review_rows.append((f"R-{pids[p]}-{review_seq[p]}", pids[p], iso[posted[i]], r,
+                            pick.choice(REVIEW_TEXTS["positive" if r >= 4 else "negative"])))
+        review_seq[p] += 1
+    out.write("reviews.csv", review_rows)
+
+    commented = np.flatnonzero((picked >= REVIEW_RATE) & (picked < REVIEW_RATE + COMMENT_RATE))
+    comment_rows = []
+    for i in commented.tolist():
+        p, r = int(product[i]), int(rating[i])
+        tone = _tone(r)
+        body = " و ".join(pick.sample(COMMENT_PHRASES[tone], pick.randint(1, 3)))
+        if pick.random() < 0.05:
+            body = body.translate(ARABIC_LETTERS)
+        state["comment_id"] += 1
+        comment_rows.append((
+            pids[p],
+            state["digikala_base"] + first + p,
+            state["comment_id"],
+            r,
+            pick.choice(COMMENT_TITLES),
+            body,
+            cal.jalali[posted[i]],
+            iso[posted[i]],
+            RECOMMENDATION[tone] if pick.random() < 0.6 else "",
+            pick.choice(LIKES) or "",
+            pick.choice(DISLIKES) or "",
+        ))
+    out.write("comments_raw.csv", comment_rows)
+
+    # --- جدول‌های هر محصول؛ قیمت و موجودی روز آخر
+    last_price = list_price[:, -1]
+    avg_daily = per_product / np.maximum(days - launch, 1)
+    stock = np.rint(avg_daily * rng.uniform(3, 40, count) + rng.integers(0, 10, count)).astype(np.int64)
+    restock_qty = np.rint(avg_daily * rng.uniform(14, 60, count) + 10).astype(np.int64)
+    last_restock = days - 1 - rng.integers(0, min(30, days), count)
+    competitor_avg = last_price * rng.uniform(0.9, 1.1, count)
+    competitor_min = competitor_avg * rng.uniform(0.85, 0.97, count)
+    competitor_max = competitor_avg * rng.uniform(1.03, 1.2, count)
+    listed_stock = stock + rng.integers(0, 10, count)
+    restock_delay = rng.integers(2, 21, count)
+    lead_time = rng.integers(3, 31, count)
+
+    products, inventory, pricing, restocks = [], [], [], []
+    for i, pid in enumerate(pids):
+        titles = CATEGORIES[CATEGORY_NAMES[category[i]]][0]
+        products.append((pid, titles[int(title_pick[i] * len(titles))], CATEGORY_NAMES[category[i]],
+                         f"Brand {brand[i]}", round(float(base_price[i] * cost_ratio[i])),
+                         f"{last_price[i]:.2f}", int(listed_stock[i])))
+        inventory.append((pid, int(stock[i]), iso[last_restock[i]], int(restock_qty[i])))
+        pricing.append((pid, f"{last_price[i]:.2f}", int(discount[i, -1]),
+                        round(float(competitor_min[i])), round(float(competitor_avg[i])),
+                        round(float(competitor_max[i]))))
+        restocks.append((pid, int(restock_delay[i]), int(lead_time[i])))
+    out.write("products.csv", products)
+    out.write("inventory.csv", inventory)
+    out.write("pricing.csv", pricing)
+    out.write("restocks.csv", restocks)
+
+
+class Command(BaseCommand):
+    help = "Write a synthetic seller dataset (same CSV schemas as data/) for scale testing."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=1_000)
+        parser.add_argument("--days", type=int, default=365)
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--sales-per-day", type=float, default=1.0,
+                            help="Average orders per product per day before seasonality/price effects.")
+        parser.add_argument("--end", type=date.fromisoformat, default=DEFAULT_END,
+                            help=f"Last sale date (default: {DEFAULT_END.isoformat()}).")
+        parser.add_argument("--output", type=Path, default=None,
+                            help="Directory to write (default: data/synthetic).")
+
+    def handle(self, *args, **options):
+        if options["products"] < 1 or options["days"] < 1:
+            raise CommandError("--products and --days must be positive")
+        out_dir = options["output"] or Path(settings.BASE_DIR) / "data" / "synthetic"
+        out_dir.mkdir(parents=True, exist_ok=True)
+
+        t0 = time.perf_counter()
+        n, days = options["products"], options["days"]
+        cal = _Calendar(options["end"] - timedelta(days=days - 1), days)
+        state = {"id_width": max(3, len(str(n))), "comment_id": 60_000_000, "digikala_base": 10_000_000}
+        out = _Writers(out_dir)
+        blocks = -(-n // BLOCK_PRODUCTS)
+        ok = False
+        try:
+            for block in range(blocks):
+                first = block * BLOCK_PRODUCTS
+                _generate_block(block, first, min(BLOCK_PRODUCTS, n - first), options, cal, out, state)
+                if options["verbosity"] >= 2 or (blocks >= 20 and (block + 1) % (blocks // 10) == 0):
+                    self.stdout.write(f"  {min(first + BLOCK_PRODUCTS, n):,} / {n:,} products, "
+                                      f"{out.counts['sales.csv']:,} sales ({time.perf_counter() - t0:.0f}s)")
+            ok = True
+        finally:
+            out.close(commit=ok)
+
+        counts = ", ".join(f"{name} {count:,}" for name, count in out.counts.items())
+        self.stdout.write(f"Wrote {counts} rows to {out_dir} in {time.perf_counter() - t0:.1f}s "
+                          f"({cal.iso[0]} .. {cal.iso[-1]}, seed {options['seed']})")
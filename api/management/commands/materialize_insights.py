@@ -0,0 +1,145 @@
+# api/management/commands/materialize_insights.py
+"""
+python manage.py materialize_insights [--workers N]
+
+همه‌ی insightهای api/views_insights.py را برای هر SKU و هر پروفایل متمایز
+SellerSettings از قبل محاسبه می‌کند و در data/insights_materialized.sqlite3
+می‌نویسد. viewها تا وقتی fingerprint دیتاست عوض نشده از همین فایل جواب
+می‌دهند و فقط در صورت نبودن نتیجه زنده محاسبه می‌کنند.
+
+بعد از هر تغییر در فایل‌های data/*.csv دوباره اجرا شود.
+"""
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand
+
+# داده‌ای که handle خوانده؛ workerها با fork همین را (copy-on-write) به ارث می‌برند
+_worker_data = None
+
+
+def _init_worker():
+    global _worker_data
+    if _worker_data is not None:
+        return
+    # بدون fork (spawn روی macOS/Windows) Django و داده در خود worker راه‌اندازی می‌شوند
+    import django
+
+    django.setup()
+
+    from api.views_insights import _load_existing_data
+
+    _worker_data = _load_existing_data()
+
+
+def _materialize_chunk(task):
+    """(insight, skus, profiles) → (سطرهای جدول insights، تعداد خطاها)"""
+    from rest_framework.utils.encoders import JSONEncoder
+
+    from api.views_insights import INSIGHTS, _profile_key
+
+    name, skus, profiles = task
+    spec = INSIGHTS[name]
+    rows, failed = [], 0
+    for sku in skus:
+        for profile in profiles:
+            try:
+                payload, code = spec.compute(_worker_data, sku, profile)
+            except Exception:
+                # ذخیره نمی‌شود؛ view زنده محاسبه می‌کند و همان خطا را می‌دهد
+                failed += 1
+                continue
+            rows.append((
+                name,
+                sku or "",
+                _profile_key(spec, profile),
+                code,
+                json.dumps(payload, cls=JSONEncoder, ensure_ascii=False),
+            ))
+    return rows, failed
+
+
+def _chunks(items, n):
+    size = max(1, -(-len(items) // n))
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+class Command(BaseCommand):
+    help = "Precompute every insight for every SKU and SellerSettings profile."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                            help="Processes to spread the SKUs over (default: CPU count).")
+        parser.add_argument("--output", default=None,
+                            help="SQLite file to write (default: data/insights_materialized.sqlite3).")
+
+    def handle(self, *args, **options):
+        from api.insights_store import write_materialized
+        from api.models import SellerSettings
+        from api.views_insights import (
+            DEFAULT_SELLER_SETTINGS,
+            INSIGHTS,
+            INSIGHTS_MATERIALIZED_PATH,
+            _dataset_fingerprint,
+            _load_existing_data,
+            _profile_key,
+            _settings_profile,
+        )
+
+        t0 = time.perf_counter()
+        workers = max(1, options["workers"])
+        output = options["output"] or INSIGHTS_MATERIALIZED_PATH
+
+        # fingerprint قبل از خواندن داده: اگر وسط کار فایلی عوض شود، نتایج استفاده نمی‌شوند
+        fingerprint = _dataset_fingerprint.compute()
+        data = _load_existing_data()
+        skus = [p["product_id"] for p in data.products if p.get("product_id")]
+
+        fields = sorted({f for spec in INSIGHTS.values() for f in spec.settings_fields})
+        settings_rows = [DEFAULT_SELLER_SETTINGS, *SellerSettings.objects.values(*fields).distinct()]
+        profiles = [_settings_profile(SimpleNamespace(**row)) for row in settings_rows]
+
+        tasks = []
+        for name, spec in INSIGHTS.items():
+            # فقط پروفایل‌هایی که برای این insight واقعاً فرق دارند
+            distinct = list({_profile_key(spec, p): p for p in profiles}.values())
+            if spec.sku is None:
+                insight_skus = [None]
+            elif spec.sku == "optional":
+                insight_skus = [None, *skus]
+            else:
+                insight_skus = skus
+            for chunk in _chunks(insight_skus, workers * 4):
+                tasks.append((name, chunk, distinct))
+
+        failed = 0
+
+        def rows(results):
+            nonlocal failed
+            for chunk_rows, chunk_failed in results:
+                failed += chunk_failed
+                yield from chunk_rows
+
+        global _worker_data
+        _worker_data = data
+        if workers <= 1:
+            count = write_materialized(output, fingerprint, rows(map(_materialize_chunk, tasks)))
+        else:
+            # fork بعد از خواندن داده: workerها دوباره CSVها را parse نمی‌کنند
+            method = "fork" if "fork" in multiprocessing.get_all_start_methods() else None
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method),
+                                     initializer=_init_worker) as pool:
+                count = write_materialized(output, fingerprint, rows(pool.map(_materialize_chunk, tasks)))
+
+        if _dataset_fingerprint.compute() != fingerprint:
+            self.stderr.write("Dataset files changed while materializing; run the command again.")
+        self.stdout.write(
+            f"Materialized {count:,} results ({len(INSIGHTS)} insights, {len(skus):,} SKUs, "
+            f"{len(profiles)} settings profiles) into {output} "
+            f"in {time.perf_counter() - t0:.1f}s with {workers} workers"
+            + (f"; {failed} computations failed and will run live" if failed else "")
+        )
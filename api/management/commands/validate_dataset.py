@@ -0,0 +1,67 @@
+# api/management/commands/validate_dataset.py
+"""
+python manage.py validate_dataset [--json FILE] [--quarantine-dir DIR] [--strict]
+
+همان اعتبارسنجی هنگام بارگذاری (api/ingest.py با TABLE_SCHEMAS) را روی
+همه‌ی CSVهای دیتاست اجرا می‌کند، بدون ساختن جدول‌ها و ایندکس‌ها، و برای هر
+جدول تعداد ردیف‌های کنار گذاشته‌شده، ستون‌های خطادار و چند نمونه را چاپ می‌کند.
+
+- --quarantine-dir: ردیف‌های خراب هر فایل (خام، با همان header) در DIR/<file>.csv
+- --strict: اگر ردیفی کنار گذاشته شد با خطا خارج می‌شود (برای CI یا قبل از deploy)
+"""
+import csv
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "Validate the insights dataset CSVs and report quarantined rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--json", default=None, help="Also write the report to this file.")
+        parser.add_argument("--quarantine-dir", default=None, help="Write the quarantined rows of each file here.")
+        parser.add_argument("--strict", action="store_true", help="Fail if any row was quarantined.")
+
+    def handle(self, *args, **options):
+        from api.ingest import IngestReport, read_csv_chunks
+        from api.views_insights import DATA_DIR, TABLE_SCHEMAS
+
+        reports = {}
+        for name, schema in TABLE_SCHEMAS.items():
+            report = IngestReport(Path(name).stem, keep_rows=options["quarantine_dir"] is not None)
+            for _chunk in read_csv_chunks(DATA_DIR / name, schema, report):
+                pass
+            reports[name] = report
+
+        w = self.stdout.write
+        w(f"{DATA_DIR}")
+        for name, report in reports.items():
+            if not (DATA_DIR / name).exists():
+                w(f"  {name:<16} missing")
+                continue
+            w(f"  {name:<16} {report.rows:>10,} rows  {report.quarantined:>8,} quarantined")
+            for column, n in report.errors.most_common():
+                w(f"    {column:<30} {n:>8,} invalid")
+            for sample in report.samples[:5]:
+                w(f"    row {sample['row']}: {sample['columns']}")
+
+        if options["quarantine_dir"]:
+            out = Path(options["quarantine_dir"])
+            out.mkdir(parents=True, exist_ok=True)
+            for name, report in reports.items():
+                if report.quarantined_rows:
+                    with (out / name).open("w", newline="", encoding="utf-8") as f:
+                        writer = csv.writer(f)
+                        writer.writerow(report.header)
+                        writer.writerows(report.quarantined_rows)
+                    w(f"wrote {len(report.quarantined_rows):,} rows to {out / name}")
+
+        if options["json"]:
+            with open(options["json"], "w", encoding="utf-8") as f:
+                json.dump({name: r.to_dict() for name, r in reports.items()}, f, indent=2, ensure_ascii=False)
+
+        quarantined = sum(r.quarantined for r in reports.values())
+        if options["strict"] and quarantined:
+            raise CommandError(f"{quarantined} rows quarantined")
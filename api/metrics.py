@@ -0,0 +1,247 @@
+# api/metrics.py
+"""
+متریک‌های سرویس با فرمت متنی Prometheus (GET /api/metrics/).
+
+بدون وابستگی به prometheus_client: Counter، Gauge و Histogram ساده با
+label و قفل خودشان. MetricsMiddleware تعداد و latency هر route را ثبت
+می‌کند؛ بقیه جاهایی که ثبت می‌شوند:
+
+- dataset_*               DatasetWatcher (مدت، شکست‌ها) و _load_existing_data (تعداد ردیف‌ها،
+                          ردیف‌های quarantine‌شده و حجم فایل‌ها)
+- insight_cache_*         نتیجه‌ی materialize‌شده پیدا شد یا نه
+- singleflight_*          شمارنده‌های singleflight.stats() هنگام scrape
+- outbound_request_*      فراخوانی‌های دیجی‌کالا و LLM
+- process_*               RSS و CPU همین پروسه هنگام scrape
+
+مقادیر مال همین پروسه‌اند؛ با چند worker در gunicorn هر scrape عدد یکی از
+workerها را می‌بیند (برای جمع همه باید هر worker جدا scrape شود).
+"""
+from __future__ import annotations
+
+import os
+import resource
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+from django.http import HttpResponse
+
+from . import singleflight
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LOAD_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+# متد درخواست را کلاینت تعیین می‌کند؛ بقیه‌ی متدها «other» می‌شوند تا هر متد
+# دلخواه یک سری زمانی تازه (و بی‌پایان) نسازد
+HTTP_METHODS = frozenset({"GET", "POST", "PUT", "PATCH", "DELETE", "HEAD", "OPTIONS"})
+
+_metrics: List["_Metric"] = []
+_collectors: List[Callable[[], Iterable[str]]] = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple, object] = {}
+        _metrics.append(self)
+
+    def _key(self, labels: Dict[str, object]) -> Tuple:
+        return tuple(str(labels[n]) for n in self.label_names)
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield from self._samples(key, value)
+
+    def _samples(self, key, value):
+        yield f"{self.name}{_labels(self.label_names, key)} {_number(value)}"
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        if not self.label_names:
+            self._values[()] = 0
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = REQUEST_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets) + (float("inf"),)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [شمارش هر bucket (غیرتجمعی)، جمع، تعداد]
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def _samples(self, key, state):
+        counts, total, count = state
+        cumulative = 0
+        for bound, n in zip(self.buckets, counts):
+            cumulative += n
+            le = f'le="{_number(bound)}"'
+            yield f"{self.name}_bucket{_labels(self.label_names, key, le)} {cumulative}"
+        yield f"{self.name}_sum{_labels(self.label_names, key)} {_number(total)}"
+        yield f"{self.name}_count{_labels(self.label_names, key)} {count}"
+
+
+# ---------- متریک‌ها ----------
+
+http_requests = Counter(
+    "http_requests_total", "HTTP requests by route, method and status.", ("route", "method", "status"),
+)
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route and method.", ("route", "method"),
+)
+dataset_load_duration = Histogram(
+    "dataset_load_duration_seconds", "Time to load and index the insights dataset.", buckets=LOAD_BUCKETS,
+)
+dataset_load_failures = Counter("dataset_load_failures_total", "Dataset loads that raised.")
+dataset_rows = Gauge("dataset_rows", "Rows in the loaded insights dataset by table.", ("table",))
+dataset_quarantined_rows = Gauge(
+    "dataset_quarantined_rows", "Rows skipped at the last load because a value failed validation.", ("table",),
+)
+dataset_file_bytes = Gauge("dataset_file_bytes", "Size of the dataset CSV files at the last load.", ("file",))
+insight_cache = Counter(
+    "insight_cache_requests_total", "Materialized insight lookups by result (hit/miss).", ("insight", "result"),
+)
+outbound_duration = Histogram(
+    "outbound_request_duration_seconds", "Latency of calls to external services.", ("service",),
+)
+outbound_failures = Counter("outbound_request_failures_total", "Failed calls to external services.", ("service",))
+
+
+class outbound_call:
+    """
+    with outbound_call("llm"):
+        ...
+    مدت را ثبت می‌کند و اگر استثنا رخ دهد شمارنده‌ی شکست را زیاد می‌کند.
+    """
+
+    def __init__(self, service: str):
+        self.service = service
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        outbound_duration.observe(time.perf_counter() - self.t0, service=self.service)
+        if exc_type is not None:
+            outbound_failures.inc(service=self.service)
+        return False
+
+
+def _singleflight_samples() -> Iterable[str]:
+    groups = singleflight.stats()
+    for field, kind, help in (
+        ("calls", "counter", "Calls into a single-flight group."),
+        ("executed", "counter", "Calls that ran the computation (cache misses)."),
+        ("coalesced", "counter", "Calls that joined an in-flight computation (cache hits)."),
+        ("in_flight", "gauge", "Computations currently running."),
+    ):
+        name = f"singleflight_{field}" + ("_total" if kind == "counter" else "")
+        yield f"# HELP {name} {help}"
+        yield f"# TYPE {name} {kind}"
+        for group, stats in groups.items():
+            yield f'{name}{{group="{_escape(group)}"}} {stats[field]}'
+
+
+def _process_samples() -> Iterable[str]:
+    try:
+        with open("/proc/self/statm") as f:
+            rss = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # بیشینه، نه مقدار فعلی
+    times = os.times()
+    yield "# HELP process_resident_memory_bytes Resident memory size in bytes."
+    yield "# TYPE process_resident_memory_bytes gauge"
+    yield f"process_resident_memory_bytes {rss}"
+    yield "# HELP process_cpu_seconds_total User and system CPU time in seconds."
+    yield "# TYPE process_cpu_seconds_total counter"
+    yield f"process_cpu_seconds_total {_number(times.user + times.system)}"
+
+
+_collectors.extend([_singleflight_samples, _process_samples])
+
+
+def render() -> str:
+    lines: List[str] = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    for collect in _collectors:
+        lines.extend(collect())
+    return "\n".join(lines) + "\n"
+
+
+def metrics_view(request):
+    """بدون احراز هویت، مثل ping؛ دسترسی را در reverse proxy محدود کنید."""
+    return HttpResponse(render(), content_type=CONTENT_TYPE)
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        t0 = time.perf_counter()
+        response = self.get_response(request)
+        match = getattr(request, "resolver_match", None)
+        # الگوی route (نه مسیر واقعی) تا تعداد labelها محدود بماند
+        route = match.route if match is not None else "unmatched"
+        method = request.method if request.method in HTTP_METHODS else "other"
+        http_requests.inc(route=route, method=method, status=response.status_code)
+        http_request_duration.observe(time.perf_counter() - t0, route=route, method=method)
+        return response
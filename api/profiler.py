@@ -0,0 +1,247 @@
+# api/profiler.py
+"""
+Profiler نمونه‌برداری (sampling) برای درخواست‌های کند.
+
+یک thread در هر پروسه هر PROFILER_INTERVAL_MS میلی‌ثانیه با
+sys._current_frames() پشته‌ی threadهایی را که در حال اجرای یک درخواست‌اند
+برمی‌دارد و برای همان درخواست می‌شمارد؛ وقتی درخواستی در جریان نیست فقط
+می‌خوابد و هزینه‌ای روی مسیر درخواست ندارد.
+
+ProfilerMiddleware:
+- وقتی profiler روشن است (PROFILER_ENABLED یا POST /api/profiler/) هر
+  درخواستی که از slow_ms طول بکشد خودکار ذخیره می‌شود
+- POST /api/profiler/ وضعیت را در PROFILER_DIR/profiler.json می‌نویسد و هر
+  worker حداکثر هر CONTROL_CHECK_INTERVAL ثانیه mtime آن را چک می‌کند، پس
+  تغییر به همه‌ی workerها می‌رسد. تا وقتی این فایل هست (حتی بعد از restart)
+  بر PROFILER_ENABLED/PROFILER_SLOW_MS مقدم است؛ برای برگشت به settings پاکش کنید.
+- با هدر «X-Profile: 1» (اگر PROFILER_ALLOW_HEADER) همان درخواست در هر
+  حال profile و ذخیره می‌شود و نام فایل در هدر X-Profile-File برمی‌گردد
+
+خروجی با فرمت collapsed stack (هر خط: «frame;frame;... تعداد») در
+PROFILER_DIR است و مستقیم به flamegraph.pl یا speedscope داده می‌شود:
+
+    flamegraph.pl profiles/20250101T120000-1234-GET-insights_golden-times-1520ms.collapsed > fg.svg
+
+فقط PROFILER_MAX_FILES فایل آخر نگه داشته می‌شوند.
+"""
+from __future__ import annotations
+
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional
+
+from django.conf import settings
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+
+PROFILE_SUFFIX = ".collapsed"
+CONTROL_FILE = "profiler.json"
+CONTROL_CHECK_INTERVAL = 1.0  # ثانیه
+
+
+class _State:
+    """
+    تنظیمات زمان اجرا؛ مقدار اولیه از settings و قابل تغییر از /api/profiler/.
+    enabled و slow_ms بین workerها از طریق فایل CONTROL_FILE مشترک‌اند.
+    """
+
+    def __init__(self):
+        self.enabled = getattr(settings, "PROFILER_ENABLED", False)
+        self.slow_ms = float(getattr(settings, "PROFILER_SLOW_MS", 1000))
+        self.interval = getattr(settings, "PROFILER_INTERVAL_MS", 10) / 1000
+        self.allow_header = getattr(settings, "PROFILER_ALLOW_HEADER", False)
+        self.directory = Path(getattr(settings, "PROFILER_DIR", Path(settings.BASE_DIR) / "profiles"))
+        self.max_files = getattr(settings, "PROFILER_MAX_FILES", 50)
+        self._stamp = None
+        self._checked_at = 0.0
+
+    def sync(self):
+        """اگر worker دیگری وضعیت را عوض کرده، همان را بخوان (حداکثر هر CONTROL_CHECK_INTERVAL ثانیه)."""
+        now = time.monotonic()
+        if now - self._checked_at < CONTROL_CHECK_INTERVAL:
+            return
+        self._checked_at = now
+        path = self.directory / CONTROL_FILE
+        try:
+            st = path.stat()
+            if (st.st_mtime_ns, st.st_size) == self._stamp:
+                return
+            values = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        self._stamp = (st.st_mtime_ns, st.st_size)
+        self.enabled = bool(values.get("enabled", self.enabled))
+        self.slow_ms = float(values.get("slow_ms", self.slow_ms))
+
+    def save(self):
+        """وضعیت فعلی را برای همه‌ی workerها می‌نویسد."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / CONTROL_FILE
+        tmp = path.with_name(f"{CONTROL_FILE}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps({"enabled": self.enabled, "slow_ms": self.slow_ms}), encoding="utf-8")
+        os.replace(tmp, path)
+        st = path.stat()
+        self._stamp = (st.st_mtime_ns, st.st_size)
+
+
+state = _State()
+
+
+class StackSampler:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._active: Dict[int, Counter] = {}  # thread id → شمارش پشته‌ها
+        self._labels: Dict[object, str] = {}  # code object → «func (file:line)»
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+
+    def _ensure_running(self):
+        # بعد از fork (gunicorn --preload) thread والد در فرزند وجود ندارد
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def start(self, thread_id: int) -> Counter:
+        counts: Counter = Counter()
+        with self._lock:
+            self._ensure_running()
+            self._active[thread_id] = counts
+        return counts
+
+    def stop(self, thread_id: int):
+        with self._lock:
+            self._active.pop(thread_id, None)
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})"
+        return label
+
+    def _collapse(self, frame) -> str:
+        stack = []
+        while frame is not None:
+            stack.append(self._label(frame.f_code))
+            frame = frame.f_back
+        return ";".join(reversed(stack))
+
+    def _run(self):
+        while True:
+            time.sleep(state.interval)
+            with self._lock:
+                if not self._active:
+                    continue
+                targets = list(self._active.items())
+            frames = sys._current_frames()
+            for thread_id, counts in targets:
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    counts[self._collapse(frame)] += 1
+            del frames
+
+
+sampler = StackSampler()
+
+
+def _short_path(filename: str) -> str:
+    """مسیر نسبت به پروژه یا site-packages تا flamegraph خوانا بماند."""
+    base = str(settings.BASE_DIR) + os.sep
+    if filename.startswith(base):
+        return filename[len(base):]
+    marker = os.sep + "site-packages" + os.sep
+    i = filename.rfind(marker)
+    return filename[i + len(marker):] if i >= 0 else filename
+
+
+def _slug(text: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_-]+", "_", text.strip("/"))[:60] or "root"
+
+
+def write_profile(counts: Counter, request, elapsed_ms: float) -> Optional[str]:
+    if not counts:
+        return None
+    directory = state.directory
+    directory.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%dT%H%M%S")
+    name = f"{stamp}-{os.getpid()}-{request.method}-{_slug(request.path)}-{elapsed_ms:.0f}ms{PROFILE_SUFFIX}"
+    tmp = directory / (name + ".tmp")
+    tmp.write_text("".join(f"{stack} {n}\n" for stack, n in counts.most_common()), encoding="utf-8")
+    os.replace(tmp, directory / name)
+    _prune(directory)
+    return name
+
+
+def _prune(directory: Path):
+    files = sorted(directory.glob(f"*{PROFILE_SUFFIX}"), key=lambda p: p.stat().st_mtime, reverse=True)
+    for old in files[state.max_files:]:
+        try:
+            old.unlink()
+        except OSError:
+            pass
+
+
+class ProfilerMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state.sync()
+        forced = state.allow_header and request.headers.get("X-Profile") == "1"
+        if not (forced or state.enabled):
+            return self.get_response(request)
+
+        thread_id = threading.get_ident()
+        counts = sampler.start(thread_id)
+        t0 = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            sampler.stop(thread_id)
+        elapsed_ms = (time.perf_counter() - t0) * 1000
+
+        if forced or elapsed_ms >= state.slow_ms:
+            name = write_profile(counts, request, elapsed_ms)
+            if forced and name:
+                response["X-Profile-File"] = name
+        return response
+
+
+@api_view(["GET", "POST"])
+@permission_classes([IsAdminUser])
+def profiler_toggle(request):
+    """
+    GET  → وضعیت و فایل‌های اخیر
+    POST {"enabled": true, "slow_ms": 500} → روشن/خاموش کردن در همه‌ی workerها
+    (از طریق PROFILER_DIR/profiler.json، حداکثر با CONTROL_CHECK_INTERVAL ثانیه تأخیر)
+    """
+    state.sync()
+    if request.method == "POST":
+        try:
+            slow_ms = max(0.0, float(request.data.get("slow_ms", state.slow_ms)))
+        except (TypeError, ValueError):
+            return Response({"detail": "slow_ms must be a number."}, status=400)
+        if "enabled" in request.data:
+            state.enabled = bool(request.data["enabled"])
+        state.slow_ms = slow_ms
+        state.save()
+
+    files = []
+    if state.directory.exists():
+        files = sorted((p.name for p in state.directory.glob(f"*{PROFILE_SUFFIX}")), reverse=True)
+    return Response({
+        "enabled": state.enabled,
+        "slow_ms": state.slow_ms,
+        "interval_ms": state.interval * 1000,
+        "directory": str(state.directory),
+        "profiles": files,
+    })
@@ -0,0 +1,184 @@
+# api/record_table.py
+"""
+جدول‌های کوچک دیتاست (products، inventory، pricing، restocks) به‌صورت ستونی.
+
+به‌جای یک dict با رشته‌های جدا برای هر ردیف:
+- ستون‌های عددی در array("d") / array("q")، هشت بایت برای هر مقدار
+- ستون‌های "str" (شناسه‌ها و مقدارهای تکراری مثل category و brand) لیستی
+  از رشته‌های intern‌شده؛ هر مقدار متمایز یک بار در حافظه است و product_id
+  همان شیئی است که کلید ایندکس‌ها هم هست
+- ستون‌های "text" (مقدارهای یکتا مثل title) همه در یک رشته‌ی پیوسته با
+  آرایه‌ی offset؛ هر دسترسی یک برش تازه می‌سازد
+
+هر ردیف یک Record با __slots__ (جدول، شماره‌ی ردیف) است که مثل dict ردیف
+CSV خوانده می‌شود (row["x"]، row.get("x", default)، keys/items)، پس کدی که
+با ردیف‌های dict کار می‌کرد بدون تغییر کار می‌کند. Recordها نگه داشته
+نمی‌شوند و هنگام دسترسی ساخته می‌شوند (فقط خواندنی‌اند). ستون‌هایی که در
+schema نیستند "text" در نظر گرفته می‌شوند و ستون‌های schema که در CSV نیستند
+وجود ندارند (get همان default را برمی‌گرداند).
+
+مقدارها یک بار در api/ingest.py تبدیل و اعتبارسنجی می‌شوند (ردیف‌های با
+مقدار نامعتبر کنار گذاشته می‌شوند).
+
+RecordIndex همان ایندکس product_id → ردیف است، ولی فقط شماره‌ی ردیف را نگه
+می‌دارد؛ جدول‌هایی که product_idهایشان به همان ترتیب و بدون تکرار است یک
+dict مشترک دارند.
+"""
+from __future__ import annotations
+
+from array import array
+from itertools import accumulate, repeat
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from .ingest import IngestReport, read_csv_columns
+
+
+# ستون‌های عددی (خروجی float64/int64 در api/ingest.py) → typecode آرایه
+TYPECODES = {"float": "d", "float?": "d", "int": "q"}
+
+
+class TextColumn:
+    """رشته‌های یک ستون پشت سر هم در یک str؛ مقدار i = text[offsets[i]:offsets[i+1]]."""
+
+    __slots__ = ("text", "offsets")
+
+    def __init__(self, values: List[str]):
+        self.text = "".join(values)
+        self.offsets = array("q", accumulate((len(v) for v in values), initial=0))
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return self.text[self.offsets[i]:self.offsets[i + 1]]
+
+
+class Record:
+    # خود dict ستون‌ها (نه جدول) تا هر دسترسی یک lookup کمتر داشته باشد
+    __slots__ = ("_columns", "_i")
+
+    def __init__(self, columns: Dict[str, Any], i: int):
+        self._columns = columns
+        self._i = i
+
+    def __getitem__(self, key: str) -> Any:
+        return self._columns[key][self._i]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        column = self._columns.get(key)
+        return default if column is None else column[self._i]
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._columns
+
+    def keys(self):
+        return self._columns.keys()
+
+    def items(self):
+        return [(k, col[self._i]) for k, col in self._columns.items()]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._columns)
+
+    def __len__(self) -> int:
+        return len(self._columns)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(self.items())
+
+    def __repr__(self) -> str:
+        return f"Record({self.to_dict()!r})"
+
+
+class RecordTable:
+    """schema: نام ستون → "str"، "text"، "float" یا "int"."""
+
+    def __init__(self, columns: Dict[str, Any], n: int):
+        self.columns = columns
+        self.n = n
+
+    @classmethod
+    def from_columns(cls, columns: Dict[str, Any], n: int, schema: Dict[str, str]) -> "RecordTable":
+        """columns: خروجی api/ingest.py (تبدیل و اعتبارسنجی‌شده)."""
+        table: Dict[str, Any] = {}
+        for name, values in columns.items():
+            kind = schema.get(name, "text")
+            if kind == "text":
+                table[name] = TextColumn(values)
+            elif kind in TYPECODES:
+                table[name] = array(TYPECODES[kind], values.tobytes())
+            else:
+                table[name] = values
+        return cls(table, n)
+
+    @classmethod
+    def read_csv(cls, path: Path, schema: Dict[str, str], report: Optional[IngestReport] = None) -> "RecordTable":
+        report = report if report is not None else IngestReport(path.stem)
+        columns, n = read_csv_columns(path, schema, report)
+        return cls.from_columns(columns, n, schema)
+
+    def __len__(self) -> int:
+        return self.n
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return list(map(Record, repeat(self.columns), range(*i.indices(self.n))))
+        if i < 0:
+            i += self.n
+        if not 0 <= i < self.n:
+            raise IndexError(i)
+        return Record(self.columns, i)
+
+    def __iter__(self) -> Iterator[Record]:
+        return map(Record, repeat(self.columns), range(self.n))
+
+
+class RecordIndex(Mapping):
+    """کلید → Record، با dict کلید → شماره‌ی ردیف."""
+
+    def __init__(self, table: RecordTable, positions: Dict[str, int]):
+        self.table = table
+        self.positions = positions
+
+    @classmethod
+    def build(cls, table: RecordTable, column: str = "product_id", first: bool = True,
+              skip_empty: bool = False, share: Optional["RecordIndex"] = None) -> "RecordIndex":
+        """
+        first=True: اولین ردیف هر کلید (مثل _first_by_product)، وگرنه آخرین
+        (مثل _build_index_by_product_id). skip_empty: کلید خالی ایندکس نمی‌شود.
+        اگر ستون کلید همان ستون share باشد، dict آن دوباره استفاده می‌شود.
+        جدولی که اصلاً ستون کلید ندارد ایندکس خالی می‌گیرد.
+        """
+        keys = table.columns.get(column)
+        if keys is None:
+            return cls(table, {})
+        if share is not None and share.unique and share.table.columns.get(column) == keys:
+            return cls(table, share.positions)
+        positions: Dict[str, int] = {}
+        for i, key in enumerate(keys):
+            if skip_empty and not key:
+                continue
+            if first:
+                positions.setdefault(key, i)
+            else:
+                positions[key] = i
+        return cls(table, positions)
+
+    @property
+    def unique(self) -> bool:
+        """هر ردیف دقیقاً یک کلید دارد (پس first/last و skip_empty فرقی نمی‌کنند)."""
+        return len(self.positions) == self.table.n and "" not in self.positions
+
+    def __getitem__(self, key: str) -> Record:
+        return Record(self.table.columns, self.positions[key])
+
+    def __contains__(self, key) -> bool:
+        return key in self.positions
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.positions)
+
+    def __len__(self) -> int:
+        return len(self.positions)
@@ -0,0 +1,233 @@
+# api/shared_dataset.py
+"""
+فروش‌ها به‌صورت آرایه‌های ستونی روی دیسک (np.load با mmap_mode="r").
+
+با DATASET_MMAP=1 جدول فروش یک بار به data/dataset_cache/sales-<key>/ نوشته
+می‌شود (key از mtime/size فایل sales.csv) و هر پروسه فقط آن را mmap می‌کند؛
+پس workerهای gunicorn/uWSGI همان صفحه‌های page cache را بدون کپی می‌خوانند و
+دیکشنری هر ردیف فقط موقع دسترسی (و موقتاً) ساخته می‌شود.
+
+ستون‌ها:
+- product       int32 کد محصول (product_ids.json)
+- date          int32 ordinal تاریخ (0 یعنی بدون تاریخ)
+- quantity      int64
+- unit_price    float64
+- final_price   float64 (NaN اگر خالی بود)
+- discount_pct  float64
+- by_product    int32 اندیس ردیف‌ها مرتب بر اساس محصول (ترتیب CSV داخل هر محصول)
+- product_offsets int64 ردیف‌های محصول i در by_product[offsets[i]:offsets[i+1]]
+- rollups.npz   به ازای هر محصول: total_qty و daily_avg
+- ingest.json   گزارش اعتبارسنجی sales.csv (api/ingest.py)
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import sys
+from collections.abc import Sequence
+from datetime import date
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List
+
+import numpy as np
+
+from .ingest import IngestReport
+
+SALES_TABLE_FORMAT = 3
+ROW_CHUNK = 65_536
+
+_NUMERIC_COLUMNS = {
+    "product": np.int32,
+    "date": np.int32,
+    "quantity": np.int64,
+    "unit_price": np.float64,
+    "final_price": np.float64,
+    "discount_pct": np.float64,
+}
+
+
+class SalesRows(Sequence):
+    """زیرمجموعه‌ای از ردیف‌های SalesTable (با اندیس)، به شکل همان دیکشنری‌های CSV."""
+
+    def __init__(self, table: "SalesTable", index: np.ndarray):
+        self.table = table
+        self.index = index
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return SalesRows(self.table, self.index[i])
+        return self.table.row(int(self.index[i]))
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for start in range(0, len(self.index), ROW_CHUNK):
+            yield from self.table.rows(self.index[start:start + ROW_CHUNK])
+
+
+class SalesTable(Sequence):
+    """همه‌ی ردیف‌ها به ترتیب CSV؛ هیچ آرایه‌ای به اندازه‌ی تعداد ردیف در حافظه‌ی پروسه ساخته نمی‌شود."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        # intern: همان رشته‌های product_id جدول‌های دیگر و کلید ایندکس‌ها
+        self.product_ids: List[str] = [
+            sys.intern(pid) for pid in json.loads((self.path / "product_ids.json").read_text(encoding="utf-8"))
+        ]
+        self.columns = {name: np.load(self.path / f"{name}.npy", mmap_mode="r") for name in _NUMERIC_COLUMNS}
+        self.by_product = np.load(self.path / "by_product.npy", mmap_mode="r")
+        self.product_offsets = np.load(self.path / "product_offsets.npy", mmap_mode="r")
+        self.ingest = IngestReport.from_dict(json.loads((self.path / "ingest.json").read_text(encoding="utf-8")))
+        # rollupهای هر محصول (کوچک، به اندازه‌ی تعداد محصولات)
+        with np.load(self.path / "rollups.npz") as f:
+            self.rollups = {name: f[name] for name in f.files}
+
+    def __len__(self) -> int:
+        return len(self.columns["product"])
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return SalesRows(self, np.arange(len(self))[i])
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self.row(i)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        n = len(self)
+        for start in range(0, n, ROW_CHUNK):
+            yield from self.rows(slice(start, min(start + ROW_CHUNK, n)))
+
+    def row(self, i: int) -> Dict[str, Any]:
+        return next(self.rows(slice(i, i + 1)))
+
+    def rows(self, index) -> Iterator[Dict[str, Any]]:
+        cols = self.columns
+        product_ids = self.product_ids
+        return sale_dicts(
+            [product_ids[p] for p in cols["product"][index].tolist()],
+            cols["date"][index],
+            cols["quantity"][index],
+            cols["unit_price"][index],
+            cols["final_price"][index],
+            cols["discount_pct"][index],
+        )
+
+    def by_product_rows(self) -> Dict[str, SalesRows]:
+        """product_id → ردیف‌های همان محصول (بدون کپی؛ برش از by_product)."""
+        # برش ndarray معمولی روی همان mmap خیلی ارزان‌تر از برش np.memmap است
+        offsets = self.product_offsets.tolist()
+        by_product = np.asarray(self.by_product)
+        return {
+            pid: SalesRows(self, by_product[offsets[code]:offsets[code + 1]])
+            for code, pid in enumerate(self.product_ids)
+            if offsets[code + 1] > offsets[code]
+        }
+
+    def totals_qty(self) -> Dict[str, int]:
+        """مثل _sales_by_product: جمع quantity، به ترتیب اولین ظهور در CSV، بدون product_id خالی."""
+        totals = self.rollups["total_qty"].tolist()
+        return {pid: totals[code] for code, pid in enumerate(self.product_ids) if pid}
+
+    def daily_sales_avg(self) -> Dict[str, float]:
+        """میانگین فروش روزانه‌ی هر محصول روی روزهایی که فروش (با تاریخ معتبر) دارد."""
+        return dict(zip(self.product_ids, self.rollups["daily_avg"].tolist()))
+
+
+def _rollups(product: np.ndarray, day: np.ndarray, qty: np.ndarray, n_products: int) -> Dict[str, np.ndarray]:
+    product = product.astype(np.int64)
+    total_qty = np.zeros(n_products, dtype=np.int64)
+    np.add.at(total_qty, product, qty)
+
+    dated = day > 0
+    dated_qty = np.zeros(n_products, dtype=np.float64)
+    np.add.at(dated_qty, product[dated], qty[dated].astype(np.float64))
+    days = np.unique(product[dated] * (1 << 32) + day[dated].astype(np.int64))
+    n_days = np.bincount(days >> 32, minlength=n_products)
+    return {"total_qty": total_qty, "daily_avg": dated_qty / np.maximum(n_days, 1)}
+
+
+def sales_table_key(csv_path: Path) -> str:
+    st = csv_path.stat()
+    return hashlib.sha1(f"{SALES_TABLE_FORMAT}|{st.st_mtime_ns}|{st.st_size}".encode()).hexdigest()[:16]
+
+
+def sale_dicts(product_ids, day, quantity, unit_price, final_price, discount_pct) -> Iterator[Dict[str, Any]]:
+    """ستون‌های تایپ‌دار فروش → dict هر ردیف (همان شکل در حالت dict و mmap)."""
+    fromordinal = date.fromordinal
+    for pid, d, q, up, fp, dp in zip(
+        product_ids,
+        day.tolist(),
+        quantity.tolist(),
+        unit_price.tolist(),
+        final_price.tolist(),
+        discount_pct.tolist(),
+    ):
+        yield {
+            "product_id": pid,
+            "date": fromordinal(d) if d else None,
+            "quantity": q,
+            "unit_price": up,
+            "final_price": fp,
+            "discount_pct": dp,
+        }
+
+
+def write_sales_table(out_dir: Path, chunks: Iterable[Dict[str, Any]], report: IngestReport):
+    """
+    chunks: تکه‌های ستونی تایپ‌دار (product_id لیست رشته، بقیه ndarray با نام
+    ستون‌های SalesTable جز product) به‌صورت stream.
+    """
+    codes: Dict[str, int] = {}
+    parts: Dict[str, List[np.ndarray]] = {name: [] for name in _NUMERIC_COLUMNS}
+    for chunk in chunks:
+        parts["product"].append(np.array(
+            [codes.setdefault(pid, len(codes)) for pid in chunk["product_id"]], dtype=np.int32,
+        ))
+        for name in ("date", "quantity", "unit_price", "final_price", "discount_pct"):
+            parts[name].append(chunk[name])
+    cols = {
+        name: np.concatenate(parts[name]).astype(dtype, copy=False) if parts[name] else np.zeros(0, dtype=dtype)
+        for name, dtype in _NUMERIC_COLUMNS.items()
+    }
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for name in _NUMERIC_COLUMNS:
+        np.save(out_dir / f"{name}.npy", cols[name])
+    product = cols["product"]
+    np.save(out_dir / "by_product.npy", np.argsort(product, kind="stable").astype(np.int32))
+    offsets = np.zeros(len(codes) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(product, minlength=len(codes)), out=offsets[1:])
+    np.save(out_dir / "product_offsets.npy", offsets)
+    np.savez(out_dir / "rollups.npz", **_rollups(product, cols["date"], cols["quantity"], len(codes)))
+    # گزارش اعتبارسنجی همان نسخه، برای پروسه‌هایی که فقط mmap می‌کنند
+    (out_dir / "ingest.json").write_text(json.dumps(report.to_dict(), ensure_ascii=False), encoding="utf-8")
+    # آخر از همه: وجود این فایل یعنی جدول کامل است
+    (out_dir / "product_ids.json").write_text(json.dumps(list(codes), ensure_ascii=False), encoding="utf-8")
+
+
+def load_sales_table(csv_path: Path, cache_dir: Path, chunks: Iterable[Dict[str, Any]], report: IngestReport) -> SalesTable:
+    """
+    جدول فروش نسخه‌ی فعلی sales.csv را از cache_dir باز می‌کند و اگر نبود
+    (از روی chunks) می‌سازد. چند پروسه‌ی هم‌زمان در پوشه‌های موقت جدا می‌نویسند
+    و فقط اولین rename برنده می‌شود.
+    """
+    key = sales_table_key(csv_path)
+    target = cache_dir / f"sales-{key}"
+    if not (target / "product_ids.json").exists():
+        tmp = cache_dir / f".sales-{key}.{os.getpid()}.tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        write_sales_table(tmp, chunks, report)
+        try:
+            tmp.rename(target)
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True)  # پروسه‌ی دیگری زودتر ساخت
+        # نسخه‌های قدیمی؛ پروسه‌هایی که هنوز mmap کرده‌اند تا آزاد شدن آن را می‌بینند
+        for old in cache_dir.glob("sales-*"):
+            if old != target:
+                shutil.rmtree(old, ignore_errors=True)
+    return SalesTable(target)
@@ -0,0 +1,93 @@
+# api/singleflight.py
+"""
+Single-flight: اگر چند درخواست هم‌زمان یک محاسبه‌ی یکسان (با کلید یکسان) را
+بخواهند، فقط اولی آن را اجرا می‌کند و بقیه منتظر همان نتیجه (یا همان خطا)
+می‌مانند. بعد از تمام شدن، کلید آزاد می‌شود؛ این کش نیست.
+
+هر گروه شمارنده دارد:
+- calls:     کل درخواست‌ها
+- executed:  دفعاتی که محاسبه واقعاً اجرا شد
+- coalesced: درخواست‌هایی که به نتیجه‌ی یک اجرای در جریان پیوستند
+
+نام گروه‌ها یکتاست: SingleFlight(name) با نام تکراری ValueError می‌دهد؛
+group(name) گروه موجود را برمی‌گرداند (یا می‌سازد).
+"""
+from __future__ import annotations
+
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+_groups: Dict[str, "SingleFlight"] = {}
+_groups_lock = threading.RLock()
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self.calls = 0
+        self.executed = 0
+        self.coalesced = 0
+        with _groups_lock:
+            if name in _groups:
+                raise ValueError(f"SingleFlight group {name!r} already exists; use group({name!r})")
+            _groups[name] = self
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            self.calls += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "executed": self.executed,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._calls),
+            }
+
+
+def group(name: str) -> SingleFlight:
+    """گروه ثبت‌شده با این نام، یا یک گروه تازه."""
+    with _groups_lock:
+        existing = _groups.get(name)
+        return existing if existing is not None else SingleFlight(name)
+
+
+def stats() -> Dict[str, Dict[str, int]]:
+    """شمارنده‌های همه‌ی گروه‌ها، بر اساس نام."""
+    return {name: group.stats() for name, group in sorted(_groups.items())}
@@ -1,3 +1,1747 @@
-from django.test import TestCase
+import asyncio
+import contextlib
+import csv
+import io
+import json
+import math
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+from datetime import date, timedelta
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import comment_search, ingest, metrics, profiler, singleflight, urls, views_insights
+from .dataset_watcher import DatasetUnavailable, DatasetWatcher
+from .insights_store import DatasetFingerprint, MaterializedInsights, write_materialized
+from .record_table import RecordIndex, RecordTable
+
+# ============================================================
+# Latency regression gate
+# ============================================================
+#
+# همه‌ی routeهای api/urls.py با کاربر JWT روی یک دیتاست مصنوعی ثابت
+# (generate_dataset با seed ثابت) اجرا و status و تعداد queryها با
+# api/latency_baseline.json مقایسه می‌شوند. زمان‌ها (p50/p95/p99) به ماشین
+# وابسته‌اند و فقط با LATENCY_GATE=1 اندازه‌گیری و مقایسه می‌شوند.
+#
+#   LATENCY_GATE=1             مقایسه‌ی p50/p95 با baseline (روی ماشین CI ثابت)
+#   LATENCY_TOLERANCE=3.0      حداکثر نسبت p50/p95 به baseline
+#   LATENCY_SLACK_MS=10        حاشیه‌ی مطلق برای endpointهای چند میلی‌ثانیه‌ای
+#   LATENCY_SAMPLES=20         تعداد اجرای اندازه‌گیری‌شده‌ی هر endpoint
+#   LATENCY_UPDATE_BASELINE=1  baseline را از همین اجرا بازنویسی می‌کند (یعنی LATENCY_GATE=1)
+#
+# p99 فقط ثبت می‌شود (با ۲۰ نمونه عملاً بیشینه است و به نویز حساس)؛ تعداد
+# queryها نباید از baseline بیشتر شود.
+
+LATENCY_BASELINE_PATH = Path(__file__).resolve().parent / "latency_baseline.json"
+LATENCY_UPDATE_BASELINE = os.getenv("LATENCY_UPDATE_BASELINE") == "1"
+LATENCY_GATE = os.getenv("LATENCY_GATE") == "1" or LATENCY_UPDATE_BASELINE
+LATENCY_TOLERANCE = float(os.getenv("LATENCY_TOLERANCE", "3.0"))
+LATENCY_SLACK_MS = float(os.getenv("LATENCY_SLACK_MS", "10"))
+LATENCY_SAMPLES = int(os.getenv("LATENCY_SAMPLES", "20"))
+LATENCY_WARMUP = 2
+LATENCY_DATASET = {"products": 60, "days": 180, "seed": 43}
+
+SKU = "P010"
+PASSWORD = "latency-gate"
+
+# (route در urls.py، متد، مسیر با query string، body)؛ هر route حداقل یک مورد دارد
+LATENCY_CASES = [
+    ("auth/seller/login/", "POST", "auth/seller/login/", {"seller_token": "FAKE_SELLER_TOKEN"}),
+    ("auth/login/", "POST", "auth/login/", {"username": "gate", "password": PASSWORD}),
+    ("auth/refresh/", "POST", "auth/refresh/", "refresh"),
+    ("dk/profile/", "GET", "dk/profile/", None),
+    ("settings/", "GET", "settings/", None),
+    ("settings/", "POST", "settings/", {"extra_cost_pct": 3.0}),
+    ("ping/", "GET", "ping/", None),
+    ("stats/singleflight/", "GET", "stats/singleflight/", None),
+    ("metrics/", "GET", "metrics/", None),
+    ("profiler/", "GET", "profiler/", None),
+    ("charts/sales-forecast/", "GET", "charts/sales-forecast/", None),
+    ("charts/optimal-pricing/", "GET", "charts/optimal-pricing/", None),
+    ("charts/inventory/", "GET", "charts/inventory/", None),
+    ("charts/portfolio/", "GET", "charts/portfolio/", None),
+    ("insights/products/", "GET", "insights/products/", None),
+    ("insights/classic-overview/", "GET", "insights/classic-overview/", None),
+    ("insights/profit-margin/", "GET", "insights/profit-margin/", None),
+    ("insights/slow-movers/", "GET", "insights/slow-movers/", None),
+    ("insights/slow-movers/", "GET", f"insights/slow-movers/?sku={SKU}", None),
+    ("insights/breakeven/", "GET", f"insights/breakeven/?sku={SKU}", None),
+    ("insights/golden-times/", "GET", "insights/golden-times/", None),
+    ("insights/golden-times/", "GET", f"insights/golden-times/?sku={SKU}", None),
+    ("insights/revenue-forecast/", "GET", f"insights/revenue-forecast/?sku={SKU}", None),
+    ("insights/discount-competition/", "GET", f"insights/discount-competition/?sku={SKU}", None),
+    ("insights/restock-time/", "GET", f"insights/restock-time/?sku={SKU}", None),
+    ("insights/speed-compare/", "GET", f"insights/speed-compare/?sku={SKU}", None),
+    ("insights/comment-analysis/", "GET", f"insights/comment-analysis/?sku={SKU}", None),
+    ("insights/comments/search/", "GET", f"insights/comments/search/?sku={SKU}&q=کیفیت", None),
+    ("insights/comments/timeseries/", "GET", f"insights/comments/timeseries/?sku={SKU}&weeks=26", None),
+    ("insights/card-analysis/", "POST", "insights/card-analysis/",
+     {"card_id": "golden_times", "product_id": SKU, "card_data": {"best_day": "Saturday", "share": 0.21}}),
+]
+
+
+def _percentile(sorted_ms, p: float) -> float:
+    """nearest-rank"""
+    return sorted_ms[max(0, math.ceil(p / 100 * len(sorted_ms)) - 1)]
+
+
+def _use_scripts():
+    """ماژول‌های scripts/ مثل اجرای خود اسکریپت‌ها (python scripts/x.py) import شوند."""
+    scripts_dir = str(Path(settings.BASE_DIR) / "scripts")
+    if scripts_dir not in sys.path:
+        sys.path.insert(0, scripts_dir)
+
+
+def _build_comment_artifacts(data_dir: Path):
+    """comments_summary.csv، comments_weekly.npz و comment_index مثل analyze/index_comments."""
+    _use_scripts()
+    from analyze_comments import SUMMARY_FIELDS, load_comments, summarize, summary_logic_version, write_csv, write_weekly
+    from index_comments import build_index
+
+    comments_csv = data_dir / "comments_raw.csv"
+    rows, weekly = summarize(load_comments(comments_csv))
+    write_csv(data_dir / "comments_summary.csv", SUMMARY_FIELDS, rows)
+    write_weekly(data_dir / "comments_weekly.npz", summary_logic_version(), weekly)
+    build_index(comments_csv, data_dir / "comment_index")
+
+
+class LatencyRegressionTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls._tmp = tempfile.TemporaryDirectory()
+        data_dir = Path(cls._tmp.name)
+        call_command(
+            "generate_dataset",
+            products=LATENCY_DATASET["products"],
+            days=LATENCY_DATASET["days"],
+            seed=LATENCY_DATASET["seed"],
+            output=data_dir,
+            stdout=io.StringIO(),
+        )
+        _build_comment_artifacts(data_dir)
+
+        vi = views_insights
+        fingerprint = DatasetFingerprint(data_dir, vi.DATASET_FILES, vi.INSIGHTS_VERSION, 0)
+        cls._patches = [
+            mock.patch.object(vi, "DATA_DIR", data_dir),
+            mock.patch.object(vi, "DATASET_CACHE_DIR", data_dir / "dataset_cache"),
+            mock.patch.object(vi, "_dataset_watcher", DatasetWatcher(vi._load_existing_data, fingerprint)),
+            # بدون نتیجه‌ی materialize‌شده: هر درخواست محاسبه‌ی زنده را اندازه می‌گیرد
+            mock.patch.object(vi, "_materialized_insights", MaterializedInsights(data_dir / "none.sqlite3")),
+            mock.patch.object(vi, "COMMENTS_SUMMARY_PATH", data_dir / "comments_summary.csv"),
+            mock.patch.object(vi, "_comments_summary_store",
+                              vi._CommentsSummaryStore(data_dir / "comments_summary.csv")),
+            mock.patch.object(vi, "_comments_weekly_store",
+                              vi._CommentsWeeklyStore(data_dir / "comments_weekly.npz")),
+            mock.patch.object(vi, "_comment_index_store", vi._CommentIndexStore(data_dir / "comment_index")),
+            # بدون شبکه: فقط هزینه‌ی خود endpoint
+            mock.patch.object(vi, "_card_analysis_llm", lambda prompt: "Stub analysis."),
+            # profile درخواست‌های کند هرگز زیر BASE_DIR نوشته نشود
+            mock.patch.object(profiler.state, "enabled", False),
+            mock.patch.object(profiler.state, "directory", data_dir / "profiles"),
+        ]
+        for p in cls._patches:
+            p.start()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        for p in reversed(cls._patches):
+            p.stop()
+        cls._tmp.cleanup()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username="gate", password=PASSWORD)
+
+    def setUp(self):
+        self.client = APIClient()
+        refresh = RefreshToken.for_user(self.user)
+        self.refresh = str(refresh)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+
+    def _measure(self, method: str, path: str, body) -> dict:
+        if body == "refresh":
+            body = {"refresh": self.refresh}
+        send = getattr(self.client, method.lower())
+        kwargs = {"format": "json", "data": body} if method == "POST" else {}
+
+        for _ in range(LATENCY_WARMUP):
+            send(f"/api/{path}", **kwargs)
+        timings, queries, codes = [], 0, set()
+        # بدون LATENCY_GATE یک اجرا برای status و تعداد query کافی است
+        for _ in range(LATENCY_SAMPLES if LATENCY_GATE else 1):
+            with CaptureQueriesContext(connection) as ctx:
+                t0 = time.perf_counter()
+                response = send(f"/api/{path}", **kwargs)
+                timings.append((time.perf_counter() - t0) * 1000)
+            queries = max(queries, len(ctx.captured_queries))
+            codes.add(response.status_code)
+        timings.sort()
+        self.assertEqual(len(codes), 1, f"{method} {path}: status changed between runs {sorted(codes)}")
+        return {
+            "status": codes.pop(),
+            "p50_ms": round(_percentile(timings, 50), 2),
+            "p95_ms": round(_percentile(timings, 95), 2),
+            "p99_ms": round(_percentile(timings, 99), 2),
+            "queries": queries,
+        }
+
+    def test_every_route_has_a_case(self):
+        routes = {str(p.pattern) for p in urls.urlpatterns if isinstance(p, URLPattern)}
+        self.assertEqual(routes - {route for route, *_ in LATENCY_CASES}, set())
+
+    def test_latency_against_baseline(self):
+        results = {f"{method} {path}": self._measure(method, path, body)
+                   for _, method, path, body in LATENCY_CASES}
+
+        if LATENCY_UPDATE_BASELINE:
+            LATENCY_BASELINE_PATH.write_text(json.dumps({
+                "samples": LATENCY_SAMPLES,
+                "dataset": LATENCY_DATASET,
+                "endpoints": results,
+            }, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+            return
+
+        baseline = json.loads(LATENCY_BASELINE_PATH.read_text(encoding="utf-8"))["endpoints"]
+        failures = []
+        for key, got in results.items():
+            base = baseline.get(key)
+            if base is None:
+                failures.append(f"{key}: no baseline (run with LATENCY_UPDATE_BASELINE=1)")
+                continue
+            if got["status"] != base["status"]:
+                failures.append(f"{key}: status {got['status']} (baseline {base['status']})")
+            if got["queries"] > base["queries"]:
+                failures.append(f"{key}: {got['queries']} queries (baseline {base['queries']})")
+            for stat in ("p50_ms", "p95_ms") if LATENCY_GATE else ():
+                limit = base[stat] * LATENCY_TOLERANCE + LATENCY_SLACK_MS
+                if got[stat] > limit:
+                    failures.append(f"{key}: {stat} {got[stat]:.1f} > {limit:.1f} (baseline {base[stat]:.1f})")
+
+        if failures:
+            self.fail("Latency regressions:\n  " + "\n  ".join(failures))
+
+
+# ============================================================
+# Metrics label cardinality
+# ============================================================
+
+
+class MetricsLabelTest(SimpleTestCase):
+    def test_unknown_methods_share_one_label(self):
+        for method in ("BREW", "X-SCAN-1", "X-SCAN-2"):
+            self.client.generic(method, "/no-such-route/")
+        exposition = metrics.render()
+        self.assertIn('route="unmatched",method="other"', exposition)
+        for method in ("BREW", "X-SCAN-1", "X-SCAN-2"):
+            self.assertNotIn(f'method="{method}"', exposition)
+
+
+# ============================================================
+# Dataset without sales
+# ============================================================
+#
+# با quarantine ممکن است هیچ ردیف فروشی از ingest رد نشود؛ همه‌ی insightها
+# باید در هر دو حالت (dict و mmap) باز هم پاسخ بدهند.
+
+
+class EmptySalesTest(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls._tmp = tempfile.TemporaryDirectory()
+        cls.data_dir = Path(cls._tmp.name)
+        call_command("generate_dataset", products=8, days=30, seed=7, output=cls.data_dir, stdout=io.StringIO())
+        with (cls.data_dir / "sales.csv").open(newline="", encoding="utf-8") as f:
+            cls.sales_rows = list(csv.reader(f))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._tmp.cleanup()
+        super().tearDownClass()
+
+    def _load(self, rows, mmap: bool):
+        with (self.data_dir / "sales.csv").open("w", newline="", encoding="utf-8") as f:
+            csv.writer(f).writerows(rows)
+        cache_dir = Path(tempfile.mkdtemp(dir=self.data_dir))
+        vi = views_insights
+        with mock.patch.object(vi, "DATA_DIR", self.data_dir), \
+                mock.patch.object(vi, "DATASET_CACHE_DIR", cache_dir), \
+                mock.patch.object(vi.logger, "warning"), \
+                self.settings(DATASET_MMAP=mmap):
+            return vi._load_existing_data()
+
+    def test_classic_overview_counts_every_sale(self):
+        data = self._load(self.sales_rows, mmap=False)
+        monthly = {}
+        for s in data.sales:
+            if s["date"]:
+                key = (s["date"].year, s["date"].month)
+                monthly[key] = monthly.get(key, 0.0) + s["quantity"] * s["unit_price"]
+        expected = [round(v, 2) for _, v in sorted(monthly.items())[-6:]]
+        payload, _code = views_insights._classic_overview_payload(data, None, {})
+        self.assertEqual(payload["salesData"]["series"], expected)
+
+    def test_insights_without_sales(self):
+        header, first, *_ = self.sales_rows
+        bad = list(first)
+        bad[header.index("quantity")] = "abc"
+        profile = views_insights._settings_profile(None)
+        sku = first[header.index("product_id")]
+        for label, rows in (("empty", [header]), ("quarantined", [header, bad])):
+            for mmap in (False, True):
+                with self.subTest(sales=label, mmap=mmap):
+                    data = self._load(rows, mmap)
+                    self.assertEqual(len(data.sales), 0)
+                    self.assertEqual(data.ingest["sales"].quarantined, len(rows) - 1)
+                    for name, spec in views_insights.INSIGHTS.items():
+                        spec.compute(data, sku if spec.sku == "required" else None, profile)
+                    payload, code = views_insights._classic_overview_payload(data, None, {})
+                    self.assertEqual((code, payload["salesData"]), (200, {"labels": [], "series": []}))
+
+
+# ============================================================
+# Comment keyword matcher
+# ============================================================
+#
+# KeywordMatcher (scripts/persian_text.py) باید همان نتیجه‌ی `keyword in text`
+# جداگانه برای هر کلیدواژه را بدهد (هر دو بعد از normalize_fa و یکی کردن فاصله‌ها).
+
+KEYWORD_GROUPS = {
+    "issue": {"quality": ["کیفیت"], "packaging": ["بسته بندی", "بسته‌بندی"], "price": ["قیمت", "گران"]},
+    "highlight": {"quality": ["کیفیت خوب", "عالی"], "packaging": ["بسته‌بندی عالی"], "price": ["قیمت مناسب"]},
+    # پیشوند و هم‌پوشانی: «کیف» داخل «کیفیت»، «خوب» داخل «کیفیت خوب»
+    "overlap": {"bag": ["کیف"], "good": ["خوب"], "not_good": ["کیفیت خوب نیست"]},
+}
+
+
+class KeywordMatcherTest(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        _use_scripts()
+        from persian_text import KeywordMatcher, normalize_fa
+
+        cls.normalize_fa = staticmethod(normalize_fa)
+        cls.matcher = KeywordMatcher(KEYWORD_GROUPS)
+
+    def naive_mask(self, text) -> int:
+        def squash(t):
+            return " ".join(t.split())
+
+        normalized = squash(self.normalize_fa(text))
+        mask = 0
+        for group, labels in KEYWORD_GROUPS.items():
+            for label, words in labels.items():
+                if any(squash(self.normalize_fa(w)) in normalized for w in words):
+                    mask |= self.matcher.bit(group, label)
+        return mask
+
+    def texts(self):
+        fixed = [
+            "",
+            "کیفیت خوب بود",
+            "کیفیت  خوب",                # دو فاصله
+            "کیفیت\nخوب",
+            "کیفیت\u200cخوب",           # ZWNJ
+            "كيفيت خوب",                 # ی و ک عربی
+            "کیفیت خوب نیست ولی قیمت مناسب",
+            "کیفیتش افتضاح",
+            "کیف پول",
+            "بسته‌بندی عالی",
+            "بسته بندي عالى",
+            "بستهٔ بندی",
+            "قیمــت مناسب",              # کشیده
+            "گرانقیمت",
+        ]
+        pieces = [w for labels in KEYWORD_GROUPS.values() for words in labels.values() for w in words]
+        pieces += ["كيفيت", "بسته‌بندي", " ", "  ", "\n", "\u200c", "\u0640", "ها", "x"]
+        rnd = random.Random(5)
+        fuzzed = []
+        for _ in range(3000):
+            parts = [w[:rnd.randint(1, len(w))] if rnd.random() < 0.3 else w
+                     for w in rnd.choices(pieces, k=rnd.randint(0, 6))]
+            fuzzed.append("".join(parts))
+        return fixed + fuzzed
+
+    def test_mask_matches_naive_containment(self):
+        texts = self.texts()
+        for text in texts + texts:  # دور دوم از _hits_cache
+            self.assertEqual(self.matcher.mask(text), self.naive_mask(text), repr(text))
+
+    def test_mask_column_matches_naive_containment(self):
+        import pandas as pd
+
+        texts = self.texts()
+        masks = self.matcher.mask_column(pd.Series(texts + [None], dtype=object)).tolist()
+        self.assertEqual(masks, [self.naive_mask(t) for t in texts] + [0])
+
+    def test_overlapping_keywords_set_every_label(self):
+        mask = self.matcher.mask("کیفیت خوب نیست")
+        for group, label in [("issue", "quality"), ("highlight", "quality"), ("overlap", "bag"),
+                             ("overlap", "good"), ("overlap", "not_good")]:
+            self.assertTrue(mask & self.matcher.bit(group, label), (group, label))
+        self.assertEqual(self.matcher.labels(self.matcher.mask("کیف"), "issue"), set())
+
+
+# ============================================================
+# Jalali dates
+# ============================================================
+
+
+class JalaliTest(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        _use_scripts()
+        import jalali
+
+        cls.jalali = jalali
+
+    def test_known_dates(self):
+        cases = {
+            "26 آبان 1404": "2025-11-17",
+            "۲۶ آبان ۱۴۰۴": "2025-11-17",
+            "1404/08/26": "2025-11-17",
+            "30 اسفند 1403": "2025-03-20",  # 1403 کبیسه است
+            "1 فروردین 1404": "2025-03-21",
+            "1 فروردین 1403": "2024-03-20",
+            "31 شهریور 1404": "2025-09-22",
+            "1 مهر 1404": "2025-09-23",
+            "2025-11-17": "2025-11-17",     # سال میلادی همان‌طور می‌ماند
+        }
+        for text, iso in cases.items():
+            with self.subTest(text=text):
+                self.assertEqual(self.jalali.jalali_text_to_iso(text), iso)
+
+    def test_leap_year_boundary(self):
+        j = self.jalali
+        self.assertTrue(j.is_leap_year(1403))
+        self.assertFalse(j.is_leap_year(1404))
+        self.assertEqual(j.jalali_to_gregorian(1404, 12, 29), date(2026, 3, 20))
+        self.assertIsNone(j.jalali_to_gregorian(1404, 12, 30))
+        self.assertEqual(j.gregorian_to_jalali(date(2025, 3, 20)), (1403, 12, 30))
+        self.assertEqual(j.gregorian_to_jalali(date(2025, 3, 21)), (1404, 1, 1))
+
+    def test_round_trip_every_day(self):
+        j = self.jalali
+        day = date.fromordinal(j.FARVARDIN_FIRST[0])
+        last = date.fromordinal(j.FARVARDIN_FIRST[-1])
+        while day < last:
+            jy, jm, jd = j.gregorian_to_jalali(day)
+            self.assertLessEqual(jd, j.month_length(jy, jm))
+            self.assertEqual(j.jalali_to_gregorian(jy, jm, jd), day)
+            day += timedelta(days=1)
+
+    def test_invalid_input(self):
+        invalid = [
+            "31 مهر 1404", "31 اسفند 1403", "30 اسفند 1404", "0 آبان 1404", "32 فروردین 1404",
+            "1404/13/01", "1404/07/31", "26 بهار 1404", "دیروز", "", None, float("nan"),
+            "2025-02-30",
+        ]
+        for text in invalid:
+            with self.subTest(text=text):
+                self.assertIsNone(self.jalali.jalali_text_to_iso(text))
+        self.assertIsNone(self.jalali.jalali_to_gregorian(1600, 1, 1))
+
+        dates = self.jalali.parse_jalali_dates(["26 آبان 1404", "31 مهر 1404", None, "26 آبان 1404"])
+        self.assertEqual(dates.isna().tolist(), [False, True, True, False])
+        self.assertEqual(str(dates[0].date()), "2025-11-17")
+
+
+# ============================================================
+# Incremental / parallel comment summaries
+# ============================================================
+#
+# analyze_comments.py: بازسازی افزایشی باید بایت‌به‌بایت همان --full باشد و
+# خروجی --workers 4 همان اجرای سریال. npz فقط در زمان‌های zip فرق می‌کند، پس
+# محتوای هر آرایه‌ی آن مقایسه می‌شود.
+
+SUMMARY_OUTPUTS = ("comments_summary.csv", "comments_duplicates.csv", "comments_summary_state.json")
+
+
+class CommentSummaryRebuildTest(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        _use_scripts()
+        cls._tmp = tempfile.TemporaryDirectory()
+        cls.root = Path(cls._tmp.name)
+        call_command("generate_dataset", products=60, days=365, seed=11, output=cls.root / "source",
+                     stdout=io.StringIO())
+        cls.comments = (cls.root / "source" / "comments_raw.csv").read_text(encoding="utf-8")
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._tmp.cleanup()
+        super().tearDownClass()
+
+    def _data_dir(self, name: str, comments: str) -> Path:
+        data_dir = self.root / name
+        data_dir.mkdir()
+        (data_dir / "comments_raw.csv").write_text(comments, encoding="utf-8")
+        return data_dir
+
+    def _analyze(self, data_dir: Path, *args) -> str:
+        from analyze_comments import main
+
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            main(["--data-dir", str(data_dir), *args])
+        return out.getvalue()
+
+    def assertSameOutputs(self, a: Path, b: Path):
+        for name in SUMMARY_OUTPUTS:
+            self.assertEqual((a / name).read_bytes(), (b / name).read_bytes(), name)
+        with zipfile.ZipFile(a / "comments_weekly.npz") as za, zipfile.ZipFile(b / "comments_weekly.npz") as zb:
+            self.assertEqual(za.namelist(), zb.namelist())
+            for member in za.namelist():
+                self.assertEqual(za.read(member), zb.read(member), member)
+
+    def test_incremental_equals_full(self):
+        header, first, *_ = self.comments.splitlines()
+        row = next(csv.reader([first]))
+        columns = header.split(",")
+        row[columns.index("comment_id")] = "99999999"
+        row[columns.index("body")] = "بسته بندی خوب بود ولی ارسال با تاخیر"
+        line = io.StringIO()
+        csv.writer(line, lineterminator="\n").writerow(row)
+        appended = self.comments + line.getvalue()
+
+        incremental = self._data_dir("incremental", self.comments)
+        self._analyze(incremental)
+        (incremental / "comments_raw.csv").write_text(appended, encoding="utf-8")
+        self.assertIn("(1 recomputed", self._analyze(incremental))
+
+        full = self._data_dir("full", appended)
+        self._analyze(full, "--full")
+        self.assertSameOutputs(incremental, full)
+
+    def test_workers_equal_serial(self):
+        serial = self._data_dir("serial", self.comments)
+        parallel = self._data_dir("parallel", self.comments)
+        self._analyze(serial, "--full", "--workers", "1")
+        self._analyze(parallel, "--full", "--workers", "4")
+        self.assertSameOutputs(serial, parallel)
+
+
+# ============================================================
+# Comment crawler
+# ============================================================
+#
+# scripts/crawl_comments.py با یک session.get جعلی (بدون شبکه) اجرا می‌شود.
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, payload=None, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self._payload = payload
+
+    def json(self):
+        return self._payload
+
+
+class FakeCommentsAPI:
+    """
+    جایگزین session: pages[digikala id] فهرست صفحه‌هاست (هر صفحه فهرست comment id)؛
+    صفحه‌های بعد از آخر خالی‌اند. responses[(id, page)] پاسخ‌هایی است که قبل از
+    پاسخ عادی به ترتیب برگردانده می‌شوند.
+    """
+
+    def __init__(self, pages, responses=None):
+        self.pages = pages
+        self.responses = {key: list(queue) for key, queue in (responses or {}).items()}
+        self.requests = []
+        self.on_get = None
+
+    def get(self, url, timeout=None):
+        pid, page = re.search(r"product/(\d+)/comments/\?page=(\d+)", url).groups()
+        page = int(page)
+        self.requests.append((pid, page))
+        if self.on_get is not None:
+            self.on_get(pid, page)
+        queued = self.responses.get((pid, page))
+        if queued:
+            return queued.pop(0)
+        ids = self.pages.get(pid, [])[page - 1] if page <= len(self.pages.get(pid, [])) else []
+        comments = [{"id": cid, "rate": 4, "body": f"نظر {cid}", "created_at": "26 آبان 1404"} for cid in ids]
+        return FakeResponse(payload={"data": {"comments": comments}})
+
+    def close(self):
+        pass
+
+
+class CrawlCommentsTest(SimpleTestCase):
+    PRODUCTS = [("P1", "https://www.digikala.com/product/dkp-111/a"),
+                ("P2", "https://www.digikala.com/product/dkp-222/b")]
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        _use_scripts()
+        import crawl_comments
+
+        cls.cc = crawl_comments
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.out = Path(tmp.name) / "comments_raw.csv"
+        self.checkpoint = Path(tmp.name) / "crawl_checkpoint.json"
+
+    def crawl(self, api, **kwargs) -> int:
+        with mock.patch.object(self.cc, "make_session", lambda pool_size: api), \
+                contextlib.redirect_stdout(io.StringIO()):
+            return asyncio.run(self.cc.crawl(
+                self.PRODUCTS, out_path=self.out, checkpoint_path=self.checkpoint,
+                concurrency=2, rate=1000, burst=1000, **kwargs,
+            ))
+
+    def stored_ids(self) -> list:
+        with self.out.open(newline="", encoding="utf-8") as f:
+            return [int(row["comment_id"]) for row in csv.DictReader(f)]
+
+    def write_stored(self, rows):
+        with self.out.open("w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=self.cc.FIELDNAMES)
+            writer.writeheader()
+            for product_id, cid in rows:
+                writer.writerow({"product_id": product_id, "comment_id": cid, "body": f"نظر {cid}"})
+
+    def test_resume_from_checkpoint(self):
+        pages = {"111": [[1, 2], [3, 4], [5]], "222": [[6]]}
+        failing = FakeCommentsAPI(pages, responses={("111", 2): [FakeResponse(404)]})
+        self.assertEqual(self.crawl(failing), 3)
+        state = json.loads(self.checkpoint.read_text(encoding="utf-8"))
+        self.assertEqual(state["products"]["P1"], {"last_page": 1, "done": False})
+        self.assertTrue(state["products"]["P2"]["done"])
+
+        api = FakeCommentsAPI(pages)
+        self.assertEqual(self.crawl(api), 3)
+        self.assertEqual(api.requests, [("111", 2), ("111", 3), ("111", 4)])
+        self.assertEqual(sorted(self.stored_ids()), [1, 2, 3, 4, 5, 6])
+        self.assertFalse(self.checkpoint.exists())
+
+    def test_append_skips_stored_comment_ids(self):
+        self.write_stored([("P1", 1), ("P1", 2)])
+        api = FakeCommentsAPI({"111": [[1, 2, 3]], "222": [[2, 7]]})
+        self.assertEqual(self.crawl(api), 2)
+        self.assertEqual(self.stored_ids(), [1, 2, 3, 7])
+
+    def test_append_migrates_old_header(self):
+        old_fields = [name for name in self.cc.FIELDNAMES if name != "created_date"]
+        with self.out.open("w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=old_fields)
+            writer.writeheader()
+            writer.writerow({"product_id": "P1", "comment_id": 1, "body": "قدیمی", "created_at": "26 آبان 1404"})
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertEqual(self.crawl(FakeCommentsAPI({"111": [[1, 2]], "222": []})), 1)
+        with self.out.open(newline="", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            rows = list(reader)
+        self.assertEqual(reader.fieldnames, old_fields + ["created_date"])
+        self.assertEqual([(r["comment_id"], r["body"], r["created_date"]) for r in rows],
+                         [("1", "قدیمی", "2025-11-17"), ("2", "نظر 2", "2025-11-17")])
+
+        # دفعه‌ی بعد فایل دوباره نوشته نمی‌شود
+        before = self.out.read_bytes()
+        self.assertEqual(self.crawl(FakeCommentsAPI({"111": [[1, 2]], "222": []})), 0)
+        self.assertEqual(self.out.read_bytes(), before)
+
+    def test_incremental_stops_at_first_page_without_new_comments(self):
+        self.write_stored([("P1", 10), ("P1", 11), ("P1", 12), ("P1", 13)])
+        # ۵ دیر تأیید شده: id کوچک‌تر، بین نظرهای قبلی
+        api = FakeCommentsAPI({"111": [[20, 12, 5], [11, 10], [3]], "222": []})
+        self.assertEqual(self.crawl(api, incremental=True), 2)
+        self.assertEqual(self.stored_ids(), [10, 11, 12, 13, 20, 5])
+        self.assertNotIn(("111", 3), api.requests)
+
+    def test_resumed_incremental_run_does_not_stop_at_its_own_rows(self):
+        self.write_stored([("P1", 10)])
+        pages = {"111": [[30, 31], [29], [10], [1]], "222": []}
+        failing = FakeCommentsAPI(pages, responses={("111", 2): [FakeResponse(404)]})
+        self.crawl(failing, incremental=True)
+        # crash قبل از flush شدن checkpoint: صفحه‌ی ۱ دوباره خوانده می‌شود
+        state = json.loads(self.checkpoint.read_text(encoding="utf-8"))
+        state["products"]["P1"]["last_page"] = 0
+        self.checkpoint.write_text(json.dumps(state), encoding="utf-8")
+
+        api = FakeCommentsAPI(pages)
+        self.assertEqual(self.crawl(api, incremental=True), 1)
+        self.assertEqual(api.requests, [("111", 1), ("111", 2), ("111", 3)])
+        self.assertEqual(self.stored_ids(), [10, 30, 31, 29])
+
+    def test_token_bucket_stays_within_rate(self):
+        rate, burst, n = 50.0, 2, 12
+
+        async def acquire_all(limiter, url):
+            times = []
+            for _ in range(n):
+                await limiter.acquire(url)
+                times.append(time.monotonic())
+            return times
+
+        async def run():
+            limiter = self.cc.HostRateLimiter(rate, burst)
+            # هر host سطل خودش را دارد و دو host هم‌زمان جلو می‌روند
+            return await asyncio.gather(acquire_all(limiter, "https://a.example/x"),
+                                        acquire_all(limiter, "https://b.example/y"))
+
+        t0 = time.monotonic()
+        for times in asyncio.run(run()):
+            for i, t in enumerate(times):
+                # بعد از burst اولیه حداکثر rate درخواست در ثانیه
+                self.assertGreaterEqual(t - t0, (i + 1 - burst) / rate - 0.005, i)
+        self.assertLess(time.monotonic() - t0, 2 * (n - burst) / rate + 0.5)
+
+    def test_retries_429_and_5xx_with_retry_after(self):
+        delays = []
+        real_sleep = asyncio.sleep
+
+        async def fake_sleep(seconds):
+            delays.append(seconds)
+            await real_sleep(0)
+
+        url = self.cc.DIGIKALA_COMMENT_API.format(pid="111", page=1)
+        limiter = self.cc.HostRateLimiter(1000, 1000)
+        api = FakeCommentsAPI({"111": [[1]]}, responses={("111", 1): [
+            FakeResponse(429, headers={"Retry-After": "7"}),
+            FakeResponse(503),
+        ]})
+        with mock.patch.object(self.cc.asyncio, "sleep", fake_sleep):
+            payload = asyncio.run(self.cc.fetch_page(api, limiter, url))
+        self.assertEqual([c["id"] for c in payload["data"]["comments"]], [1])
+        self.assertEqual(delays, [7.0, 2])  # Retry-After، بعد پیش‌فرض attempt ثانیه
+
+        delays.clear()
+        api = FakeCommentsAPI({}, responses={("111", 1): [FakeResponse(500)] * self.cc.MAX_RETRIES})
+        with mock.patch.object(self.cc.asyncio, "sleep", fake_sleep), contextlib.redirect_stdout(io.StringIO()):
+            self.assertIsNone(asyncio.run(self.cc.fetch_page(api, limiter, url)))
+        self.assertEqual(len(api.requests), self.cc.MAX_RETRIES)
+        self.assertEqual(delays, [1, 2])
+
+        api = FakeCommentsAPI({}, responses={("111", 1): [FakeResponse(404)]})
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertIsNone(asyncio.run(self.cc.fetch_page(api, limiter, url)))
+        self.assertEqual(len(api.requests), 1)  # 4xx دیگر تکرار نمی‌شود
+
+    def test_rows_are_written_page_by_page(self):
+        api = FakeCommentsAPI({"111": [[1, 2], [3], [4, 5]], "222": []})
+        rows_before = {}
+
+        def on_get(pid, page):
+            if pid == "111":
+                rows_before[page] = len(self.stored_ids()) if self.out.exists() else 0
+
+        api.on_get = on_get
+        self.crawl(api)
+        # وقتی صفحه‌ی k درخواست می‌شود ردیف‌های صفحه‌های قبلی در فایل‌اند
+        self.assertEqual(rows_before, {1: 0, 2: 2, 3: 3, 4: 5})
+
+
+# ============================================================
+# Comment endpoints
+# ============================================================
+#
+# comment-analysis، comments/timeseries و comments/search روی یک
+# comments_raw.csv کوچک و دست‌ساز؛ خروجی‌ها مثل محیط واقعی با
+# analyze_comments.py و index_comments.py ساخته می‌شوند.
+
+# (product_id, comment_id, rating, body, created_date)
+COMMENT_FIXTURE = [
+    ("P1", 101, 5, "بسته بندی خوب بود و ارسال سریع", "2025-11-10"),
+    ("P1", 102, 2, "کیفیت پایین و قیمت گران", "2025-11-03"),
+    ("P1", 103, 4, "بسته‌بندی عالی، کیفیت خوب", "2025-10-27"),
+    ("P1", 104, 1, "ارسال با تاخیر و جعبه پاره", "2025-10-20"),
+    ("P1", 105, 5, "کیفیتش عالیه، بسته بندی محکم", "2025-10-13"),
+    ("P1", 106, 3, "معمولی بود", "2025-10-06"),
+    # نظرهای پراکنده: هفته‌های خالی زیاد بینشان
+    ("P2", 201, 4, "قیمت مناسب و کیفیت خوب", "2025-11-12"),
+    ("P2", 202, 2, "بسته بندی ضعیف", "2023-06-05"),
+    ("P2", 203, 5, "عالی", "2022-01-10"),
+]
+
+
+def _write_comment_fixture(data_dir: Path, rows=COMMENT_FIXTURE):
+    _use_scripts()
+    from crawl_comments import FIELDNAMES
+
+    with (data_dir / "comments_raw.csv").open("w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
+        writer.writeheader()
+        for product_id, cid, rating, body, created in rows:
+            writer.writerow({"product_id": product_id, "comment_id": cid, "rating": rating,
+                             "body": body, "created_date": created})
+
+
+class CommentEndpointTestCase(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls._tmp = tempfile.TemporaryDirectory()
+        cls.data_dir = data_dir = Path(cls._tmp.name)
+        _write_comment_fixture(data_dir)
+        from analyze_comments import main as analyze_main
+        from index_comments import build_index
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            analyze_main(["--data-dir", str(data_dir), "--rating-sentiment"])
+        build_index(data_dir / "comments_raw.csv", data_dir / "comment_index")
+
+        vi = views_insights
+        cls._patches = [
+            mock.patch.object(vi, "_comments_summary_store",
+                              vi._CommentsSummaryStore(data_dir / "comments_summary.csv")),
+            mock.patch.object(vi, "_comments_weekly_store",
+                              vi._CommentsWeeklyStore(data_dir / "comments_weekly.npz")),
+            mock.patch.object(vi, "_comment_index_store", vi._CommentIndexStore(data_dir / "comment_index")),
+        ]
+        for p in cls._patches:
+            p.start()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        for p in reversed(cls._patches):
+            p.stop()
+        cls._tmp.cleanup()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username="comments", password=PASSWORD)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, path: str, **params):
+        response = self.client.get(f"/api/insights/{path}", params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+
+class CommentAnalysisTest(CommentEndpointTestCase):
+    def test_single_sku(self):
+        p1 = self.get("comment-analysis/", sku="P1")
+        self.assertEqual(p1["total_reviews"], 6)
+        self.assertEqual(set(p1), set(views_insights.EMPTY_COMMENT_ANALYSIS))
+        self.assertEqual(self.get("comment-analysis/", sku="NOPE"), views_insights.EMPTY_COMMENT_ANALYSIS)
+        self.assertEqual(self.client.get("/api/insights/comment-analysis/").status_code, 400)
+        self.assertEqual(self.client.get("/api/insights/comment-analysis/", {"sku": " , "}).status_code, 400)
+
+    def test_multiple_skus(self):
+        results = self.get("comment-analysis/", sku="P1, P2,NOPE")["results"]
+        self.assertEqual(list(results), ["P1", "P2", "NOPE"])
+        self.assertEqual(results["P1"], self.get("comment-analysis/", sku="P1"))
+        self.assertEqual(results["P2"], self.get("comment-analysis/", sku="P2"))
+        self.assertEqual(results["P2"]["total_reviews"], 3)
+        self.assertEqual(results["NOPE"], views_insights.EMPTY_COMMENT_ANALYSIS)
+
+    def test_reload_after_rewrite(self):
+        # کپی جدا تا بقیه‌ی testها فایل و store دست‌نخورده را ببینند
+        path = self.data_dir / "comments_summary_reload.csv"
+        shutil.copyfile(self.data_dir / "comments_summary.csv", path)
+        self.addCleanup(path.unlink)
+        store = views_insights._CommentsSummaryStore(path)
+        self.enterContext(mock.patch.object(views_insights, "_comments_summary_store", store))
+        self.assertEqual(self.get("comment-analysis/", sku="P1")["total_reviews"], 6)
+
+        with path.open(newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+        rows[0]["total_reviews"] = "60"
+        with path.open("w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+        # تا COMMENTS_SUMMARY_CHECK_INTERVAL نگذشته نسخه‌ی قبلی می‌ماند
+        self.assertEqual(self.get("comment-analysis/", sku="P1")["total_reviews"], 6)
+        with mock.patch.object(views_insights, "COMMENTS_SUMMARY_CHECK_INTERVAL", 0):
+            self.assertEqual(self.get("comment-analysis/", sku="P1")["total_reviews"], 60)
+
+
+class CommentSearchTest(CommentEndpointTestCase):
+    def search(self, **params):
+        return self.get("comments/search/", **params)
+
+    def ids(self, **params):
+        return [hit["comment_id"] for hit in self.search(**params)["results"]]
+
+    def test_all_words_must_match(self):
+        # 101 «بسته» دارد و 201 «کیفیت»؛ فقط نظرهایی که هر دو را دارند
+        self.assertEqual(self.ids(q="بسته کیفیت"), [103, 105])
+        self.assertEqual(self.ids(q="بسته کیفیت تاخیر"), [])
+
+    def test_prefix_match(self):
+        # «کیفیت» پیشوند «کیفیتش» (105) هم هست
+        self.assertEqual(self.ids(q="کیفیت", sku="P1"), [102, 103, 105])
+        # کلمه‌ی یک‌حرفی پیشوند حساب نمی‌شود
+        self.assertEqual(self.ids(q="ک", sku="P1"), [])
+
+    def test_sku_filter(self):
+        self.assertEqual(self.ids(q="بسته"), [101, 103, 105, 202])
+        self.assertEqual(self.ids(q="بسته", sku="P2"), [202])
+        self.assertEqual(self.ids(q="بسته", sku="NOPE"), [])
+        self.assertEqual(self.client.get("/api/insights/comments/search/", {"sku": "P1"}).status_code, 400)
+
+    def test_highlight_offsets(self):
+        from scripts.persian_text import normalize_fa
+
+        results = self.search(q="بسته کیفیت", sku="P1")["results"]
+        self.assertEqual(len(results), 2)
+        for hit in results:
+            words = [normalize_fa(hit["body"][start:end]) for start, end in hit["highlights"]]
+            self.assertEqual(len(words), 2, hit)
+            self.assertTrue(any(w.startswith("بسته") for w in words), words)
+            self.assertTrue(any(w.startswith("کیفیت") for w in words), words)
+        self.assertEqual(results[1]["body"][slice(*results[1]["highlights"][0])], "کیفیتش")
+
+    def test_paging_is_clamped(self):
+        everything = self.ids(q="بسته")
+        page = self.search(q="بسته", page=2, page_size=3)
+        self.assertEqual((page["total"], page["page"], page["page_size"]), (4, 2, 3))
+        self.assertEqual([hit["comment_id"] for hit in page["results"]], everything[3:])
+
+        page = self.search(q="بسته", page=0, page_size=0)
+        self.assertEqual((page["page"], page["page_size"]), (1, 1))
+        self.assertEqual([hit["comment_id"] for hit in page["results"]], everything[:1])
+
+        page = self.search(q="بسته", page="x", page_size=10_000)
+        self.assertEqual((page["page"], page["page_size"]), (1, views_insights.COMMENT_SEARCH_MAX_PAGE_SIZE))
+        self.assertEqual(self.search(q="بسته", page=5)["results"], [])
+
+    def test_rebuild_swaps_symlink(self):
+        from index_comments import build_index, index_versions
+
+        index_dir = self.data_dir / "comment_index"
+        store = views_insights._CommentIndexStore(index_dir)
+        self.enterContext(mock.patch.object(views_insights, "_comment_index_store", store))
+        self.enterContext(mock.patch.object(comment_search, "INDEX_CHECK_INTERVAL", 0))
+        before = self.ids(q="بسته")
+        index = store.get()
+
+        for _ in range(2):
+            build_index(self.data_dir / "comments_raw.csv", index_dir)
+            self.assertTrue(index_dir.is_symlink())
+            # فقط build فعلی و قبلی می‌مانند
+            versions = index_versions(index_dir)
+            self.assertEqual(len(versions), 2)
+            self.assertEqual(index_dir.resolve(), versions[-1].resolve())
+            self.assertEqual(self.ids(q="بسته"), before)
+            self.assertIsNot(store.get(), index)
+            index = store.get()
+
+
+class CommentTimeseriesTest(CommentEndpointTestCase):
+    def weeks(self, sku, weeks=None):
+        params = {"sku": sku} if weeks is None else {"sku": sku, "weeks": weeks}
+        return self.get("comments/timeseries/", **params)["week_start"]
+
+    def test_dense_weeks(self):
+        self.assertEqual(len(self.weeks("P1")), 6)
+        self.assertEqual(len(self.weeks("P1", 3)), 3)
+        self.assertEqual(self.weeks("P1", 100), self.weeks("P1"))
+
+    def test_weeks_are_calendar_weeks(self):
+        # هفته‌ها از شنبه‌اند؛ 2025-11-12 در هفته‌ی 2025-11-08 است
+        self.assertEqual(self.weeks("P2"), ["2022-01-08", "2023-06-03", "2025-11-08"])
+        # دو هفته‌ی آخر فقط یک هفته‌ی دارای نظر دارند، نه دو سطر آخر
+        self.assertEqual(self.weeks("P2", 2), ["2025-11-08"])
+        self.assertEqual(self.weeks("P2", 150), ["2023-06-03", "2025-11-08"])
+        self.assertEqual(self.weeks("P2", 0), self.weeks("P2"))
+
+    def test_unknown_sku(self):
+        series = self.get("comments/timeseries/", sku="NOPE", weeks=4)
+        self.assertEqual((series["week_start"], series["issues"]), ([], {}))
+
+
+# ============================================================
+# Sentiment model
+# ============================================================
+#
+# scripts/sentiment_model.py: hash هر کلمه فقط به بایت‌های خودش بستگی دارد،
+# پس امتیاز یک نظر نباید به batch یا جای آن در batch وابسته باشد.
+
+SENTIMENT_CORPUS = [
+    (5, "عالی بود، کیفیت خوب و ارسال سریع"),
+    (4, "خیلی خوب و راضی هستم"),
+    (5, "عالیه، پیشنهاد می‌کنم"),
+    (4, "کیفیت خوب، قیمت مناسب"),
+    (1, "خیلی بد بود، پاره رسید"),
+    (2, "کیفیت پایین و گران"),
+    (1, "افتضاح، اصلا نخرید"),
+    (2, "بد بود و دیر رسید"),
+    (3, "معمولی"),
+]
+
+
+class SentimentModelTest(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        _use_scripts()
+        import sentiment_model
+
+        cls.sm = sentiment_model
+
+    def train_corpus(self, tmp: Path):
+        path = tmp / "comments_raw.csv"
+        with path.open("w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["product_id", "rating", "body"])
+            writer.writerows(("P1", rating, body) for rating, body in SENTIMENT_CORPUS)
+        texts, labels = self.sm.rated_examples(path)
+        return texts, labels, self.sm.train(texts, labels, hash_bits=12)
+
+    def test_token_hashes_do_not_depend_on_position(self):
+        docs, hashes = self.sm.token_hashes(["خوب", "خیلی خوب", None, "بد\x00خوب"])
+        self.assertEqual(docs.tolist(), [0, 1, 1, 3, 3])
+        alone = self.sm.token_hashes(["خوب"])[1][0]
+        self.assertEqual({hashes[0], hashes[2], hashes[4]}, {alone})
+        self.assertEqual(len(set(hashes.tolist())), 3)
+        # حروف عربی و ZWNJ همان کلمه‌ی فارسی‌اند
+        self.assertEqual(self.sm.token_hashes(["كيفيت"])[1].tolist(), self.sm.token_hashes(["کیفیت"])[1].tolist())
+
+    def test_batch_scores_match_single(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            _, _, model = self.train_corpus(Path(tmp))
+        texts = [body for _, body in SENTIMENT_CORPUS] + ["", None, "کیفیت خوب ولی دیر رسید"]
+        batch = model.predict_proba(texts)
+        single = np.array([model.predict_proba([t])[0] for t in texts])
+        np.testing.assert_allclose(batch, single, rtol=1e-6)
+        chunked = self.sm._sigmoid(self.sm.featurize(texts, model.hash_bits, chunk_size=2).dot(model.weights) + model.bias)
+        np.testing.assert_allclose(batch, chunked, rtol=1e-6)
+
+    def test_train_predict_round_trip(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            texts, labels, model = self.train_corpus(Path(tmp))
+            # نظر 3 ستاره در آموزش نیست
+            self.assertEqual(labels.tolist(), [1, 1, 1, 1, 0, 0, 0, 0])
+            self.assertEqual(self.sm._accuracy(model, texts, labels), 1.0)
+            self.assertEqual(model.codes(["عالی بود", "خیلی بد بود"]).tolist(), [1, -1])
+
+            path = Path(tmp) / "sentiment_model.npz"
+            model.save(path)
+            loaded = self.sm.SentimentModel.load(path)
+        self.assertEqual(loaded.digest(), model.digest())
+        self.assertEqual(loaded.hash_bits, 12)
+        np.testing.assert_array_equal(loaded.predict_proba(texts), model.predict_proba(texts))
+        self.assertIsNone(self.sm.SentimentModel.load(Path(tmp) / "missing.npz"))
+
+
+# ============================================================
+# Near-duplicate comments
+# ============================================================
+#
+# scripts/near_duplicates.py: کپی‌ها و ویرایش‌های کوچک یک نظر یک cluster
+# می‌شوند و فقط اولینشان (به ترتیب ورودی) نگه داشته می‌شود.
+
+NEAR_DUP_VOCAB = (
+    "کیفیت خوب بد عالی ارسال سریع قیمت مناسب گران بسته بندی جعبه رنگ اندازه "
+    "باتری صدا صفحه دوربین شارژر گوشی لپتاپ هدفون کابل پارچه دوخت بو طعم"
+).split()
+
+
+class NearDuplicatesTest(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        _use_scripts()
+        import near_duplicates
+
+        cls.nd = near_duplicates
+
+    def random_comments(self, n, seed=0, words=40):
+        rng = random.Random(seed)
+        return [" ".join(rng.choices(NEAR_DUP_VOCAB, k=words)) for _ in range(n)]
+
+    def test_planted_edits_cluster(self):
+        others = self.random_comments(10)
+        base = self.random_comments(1, seed=1)[0]
+        words = base.split()
+        edited = " ".join(words[:20] + ["تغییر"] + words[21:])
+        texts = others[:3] + [edited, base, base + " ممنون"] + others[3:] + [base]
+        planted = [3, 4, 5, len(texts) - 1]
+
+        cluster, duplicate = self.nd.find_near_duplicates(["P1"] * len(texts), texts)
+        self.assertEqual(cluster[planted].tolist(), [3] * 4)
+        self.assertEqual(np.flatnonzero(duplicate).tolist(), planted[1:])
+        self.assertEqual(np.delete(cluster, planted).tolist(), [-1] * len(others))
+
+        report = self.nd.cluster_report(["P1"] * len(texts), cluster)
+        self.assertEqual(report["P1"], {"product_id": "P1", "comments": len(texts), "duplicates": 3,
+                                        "clusters": 1, "cluster_sizes": "4"})
+
+    def test_short_comments_never_flagged(self):
+        short = " ".join(NEAR_DUP_VOCAB[:self.nd.MIN_TOKENS - 1])
+        cluster, duplicate = self.nd.find_near_duplicates(["P1"] * 4, [short] * 4)
+        self.assertEqual(cluster.tolist(), [-1] * 4)
+        self.assertFalse(duplicate.any())
+
+        # از MIN_TOKENS کلمه به بالا تکرار عینی flag می‌شود
+        long_enough = " ".join(NEAR_DUP_VOCAB[:self.nd.MIN_TOKENS])
+        cluster, duplicate = self.nd.find_near_duplicates(["P1"] * 3, ["عالی بود", long_enough, long_enough])
+        self.assertEqual(cluster.tolist(), [-1, 1, 1])
+        self.assertEqual(duplicate.tolist(), [False, False, True])
+
+    def test_clusters_stay_within_product(self):
+        base = self.random_comments(1, seed=2)[0]
+        products = ["P1", "P2", "P2", "P3", "P1"]
+        cluster, duplicate = self.nd.find_near_duplicates(products, [base] * 5)
+        # P3 فقط یک نظر دارد؛ P1 و P2 هر کدام cluster خودشان را دارند
+        self.assertEqual(cluster.tolist(), [0, 1, 1, -1, 0])
+        self.assertEqual(duplicate.tolist(), [False, False, True, False, True])
+
+        report = self.nd.cluster_report(products, cluster)
+        self.assertEqual({pid: r["cluster_sizes"] for pid, r in report.items()}, {"P1": "2", "P2": "2", "P3": ""})
+        self.assertEqual(report["P3"]["duplicates"], 0)
+
+
+# ============================================================
+# Materialized insights
+# ============================================================
+#
+# _insight_response فقط وقتی از فایل materialize‌شده جواب می‌دهد که
+# (insight, sku, پروفایل تنظیمات) آنجا باشد و fingerprint دیتاست یکی باشد؛
+# وگرنه زنده محاسبه می‌کند.
+
+class InsightDatasetTestCase(TestCase):
+    """دیتاست کوچک generate_dataset به‌جای data/، بدون نتیجه‌ی materialize‌شده."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls._tmp = tempfile.TemporaryDirectory()
+        cls.data_dir = data_dir = Path(cls._tmp.name)
+        call_command("generate_dataset", products=4, days=30, seed=7, output=data_dir, stdout=io.StringIO())
+
+        vi = views_insights
+        cls.fingerprint = DatasetFingerprint(data_dir, vi.DATASET_FILES, vi.INSIGHTS_VERSION, 0)
+        cls._patches = [
+            mock.patch.object(vi, "DATA_DIR", data_dir),
+            mock.patch.object(vi, "DATASET_CACHE_DIR", data_dir / "dataset_cache"),
+            mock.patch.object(vi, "_dataset_fingerprint", cls.fingerprint),
+            mock.patch.object(vi, "_dataset_watcher", DatasetWatcher(vi._load_existing_data, cls.fingerprint)),
+            mock.patch.object(vi, "_materialized_insights", MaterializedInsights(data_dir / "none.sqlite3")),
+            mock.patch.object(profiler.state, "enabled", False),
+            mock.patch.object(profiler.state, "directory", data_dir / "profiles"),
+        ]
+        for p in cls._patches:
+            p.start()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        for p in reversed(cls._patches):
+            p.stop()
+        cls._tmp.cleanup()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username="materialized", password=PASSWORD)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.skus = [p["product_id"] for p in views_insights._current_dataset().products]
+
+    def get(self, path, client=None, **params):
+        response = (client or self.client).get(f"/api/insights/{path}", params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+
+class MaterializedInsightsTest(InsightDatasetTestCase):
+    def materialize(self, rows, fingerprint=None):
+        path = self.data_dir / f"{self._testMethodName}.sqlite3"
+        write_materialized(path, fingerprint or self.fingerprint.compute(), [
+            (name, sku, profile, 200, json.dumps(payload)) for name, sku, profile, payload in rows
+        ])
+        self.enterContext(mock.patch.object(views_insights, "_materialized_insights", MaterializedInsights(path)))
+
+    def profile_key(self, name, **settings_values):
+        profile = views_insights._settings_profile(
+            mock.Mock(**{**views_insights.DEFAULT_SELLER_SETTINGS, **settings_values}))
+        return views_insights._profile_key(views_insights.INSIGHTS[name], profile)
+
+    def test_hit_and_miss(self):
+        sku, other = self.skus[:2]
+        live = self.get("breakeven/", sku=sku)
+        self.materialize([
+            ("breakeven", sku, self.profile_key("breakeven"), {"planted": sku}),
+            ("products_list", "", "", {"planted": "products"}),
+        ])
+        self.assertEqual(self.get("breakeven/", sku=sku), {"planted": sku})
+        self.assertEqual(self.get("products/"), {"planted": "products"})
+        # sku یا insight دیگر در فایل نیست: محاسبه‌ی زنده
+        self.assertNotIn("planted", self.get("breakeven/", sku=other))
+        self.assertNotIn("planted", self.get("breakeven/"))
+        self.assertNotIn("planted", self.get("golden-times/", sku=sku))
+
+        self.enterContext(mock.patch.object(views_insights, "_materialized_insights",
+                                            MaterializedInsights(self.data_dir / "none.sqlite3")))
+        self.assertEqual(self.get("breakeven/", sku=sku), live)
+
+    def test_fingerprint_mismatch_computes_live(self):
+        sku = self.skus[0]
+        live = self.get("breakeven/", sku=sku)
+        self.materialize([("breakeven", sku, self.profile_key("breakeven"), {"planted": sku})], fingerprint="stale")
+        self.assertEqual(self.get("breakeven/", sku=sku), live)
+
+    def test_per_profile_keys(self):
+        from .models import SellerSettings
+
+        other_user = get_user_model().objects.create_user(username="materialized2", password=PASSWORD)
+        SellerSettings.objects.create(user=other_user, **{**views_insights.DEFAULT_SELLER_SETTINGS, "extra_cost_pct": 7.5})
+        other_client = APIClient()
+        other_client.force_authenticate(other_user)
+
+        default_key = self.profile_key("profit_margin")
+        other_key = self.profile_key("profit_margin", extra_cost_pct=7.5)
+        self.assertNotEqual(default_key, other_key)
+        # slow_mover_* در کلید profit_margin نیست
+        self.assertEqual(self.profile_key("profit_margin", slow_mover_min_speed=9), default_key)
+
+        self.materialize([
+            ("profit_margin", "", default_key, {"planted": "default"}),
+            ("profit_margin", "", other_key, {"planted": "other"}),
+        ])
+        self.assertEqual(self.get("profit-margin/"), {"planted": "default"})
+        self.assertEqual(self.get("profit-margin/", client=other_client), {"planted": "other"})
+
+    def test_command_matches_live(self):
+        import sqlite3
+
+        real_load = views_insights._load_existing_data
+        loads = []
+
+        def load_once():
+            # workerها نباید دوباره CSVها را بخوانند؛ داده را از handle به ارث می‌برند
+            loads.append(os.getpid())
+            if len(loads) > 1:
+                raise AssertionError(f"dataset loaded again in process {os.getpid()}")
+            return real_load()
+
+        outputs = {}
+        for workers in (1, 2):
+            path = self.data_dir / f"materialized_{workers}.sqlite3"
+            loads.clear()
+            with mock.patch.object(views_insights, "_load_existing_data", load_once):
+                call_command("materialize_insights", workers=workers, output=str(path), stdout=io.StringIO())
+            with contextlib.closing(sqlite3.connect(path)) as conn:
+                outputs[workers] = conn.execute("SELECT * FROM insights ORDER BY insight, sku, profile").fetchall()
+        self.assertEqual(outputs[2], outputs[1])
+
+        sku = self.skus[0]
+        live = {path: self.get(path, sku=sku) for path in ("breakeven/", "restock-time/")}
+        self.enterContext(mock.patch.object(views_insights, "_materialized_insights",
+                                            MaterializedInsights(self.data_dir / "materialized_2.sqlite3")))
+        with mock.patch.object(views_insights._insight_flight, "do", side_effect=AssertionError("computed live")):
+            for path, payload in live.items():
+                self.assertEqual(self.get(path, sku=sku), payload)
+
+
+# ============================================================
+# Dataset watcher
+# ============================================================
+#
+# DatasetWatcher با load و fingerprint ساختگی: snapshot فقط وقتی عوض می‌شود
+# که fingerprint جدید دو دور پشت هم یکی باشد، و بارگذاری ناموفق snapshot
+# قبلی را دست نمی‌زند.
+
+class FakeFingerprint:
+    def __init__(self, value: str):
+        self.value = value
+
+    def compute(self) -> str:
+        return self.value
+
+    current = compute
+
+
+def _wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not reached")
+        time.sleep(0.005)
+
+
+class DatasetWatcherTest(SimpleTestCase):
+    def watcher(self, fail=(), **kwargs):
+        self.fingerprint = FakeFingerprint("a")
+        self.loads = []
+
+        def load():
+            version = self.fingerprint.value
+            self.loads.append(version)
+            if version in fail:
+                raise OSError(f"half-written {version}")
+            return {"version": version}
+
+        watcher = DatasetWatcher(load, self.fingerprint, **kwargs)
+        self.addCleanup(watcher.stop)
+        return watcher
+
+    def test_swaps_after_two_equal_fingerprints(self):
+        watcher = self.watcher(interval=60)
+        first = watcher.current()
+        self.assertEqual((first.fingerprint, self.loads), ("a", ["a"]))
+        self.assertFalse(watcher.refresh())
+
+        # هنوز در حال کپی: هر fingerprint تازه یک دور صبر می‌کند
+        self.fingerprint.value = "b"
+        self.assertFalse(watcher.refresh())
+        self.fingerprint.value = "c"
+        self.assertFalse(watcher.refresh())
+        self.assertIs(watcher._snapshot, first)
+
+        self.assertTrue(watcher.refresh())
+        self.assertEqual(self.loads, ["a", "c"])
+        self.assertEqual(watcher._snapshot.data, {"version": "c"})
+        self.assertFalse(watcher.refresh())
+
+    def test_hot_swap_keeps_old_snapshot(self):
+        watcher = self.watcher(fail={"b"}, interval=0.01)
+        watcher.start()
+        held = watcher.current()
+        self.assertEqual(held.data, {"version": "a"})
+
+        with self.assertLogs("api.dataset_watcher", "ERROR"):
+            self.fingerprint.value = "b"
+            _wait_until(lambda: "b" in self.loads)
+        self.assertIs(watcher.current(), held)
+
+        self.fingerprint.value = "c"
+        _wait_until(lambda: watcher.current().fingerprint == "c")
+        self.assertEqual(watcher.current().data, {"version": "c"})
+        # درخواستی که snapshot قبلی را گرفته همان را تا آخر می‌بیند
+        self.assertEqual((held.fingerprint, held.data), ("a", {"version": "a"}))
+
+    def test_first_load_wait_is_bounded(self):
+        release = threading.Event()
+        watcher = self.watcher(interval=60, first_load_wait=0.05)
+        load = watcher.load
+        watcher.load = lambda: (release.wait(5), load())[1]
+        watcher.start()
+
+        started = time.monotonic()
+        with self.assertRaises(DatasetUnavailable):
+            watcher.current()
+        self.assertLess(time.monotonic() - started, 2)
+
+        release.set()
+        watcher.first_load_wait = 5
+        self.assertEqual(watcher.current().data, {"version": "a"})
+        self.assertEqual(self.loads, ["a"])
+
+
+# ============================================================
+# Single-flight
+# ============================================================
+#
+# N thread هم‌زمان با یک کلید: محاسبه یک بار اجرا می‌شود و نتیجه (یا خطای)
+# همان یک اجرا به همه می‌رسد.
+
+class SingleFlightTest(SimpleTestCase):
+    THREADS = 8
+
+    def flight(self):
+        name = f"test_{self._testMethodName}"
+        self.addCleanup(singleflight._groups.pop, name, None)
+        return singleflight.SingleFlight(name)
+
+    def run_together(self, flight, fn):
+        barrier = threading.Barrier(self.THREADS)
+        outcomes = [None] * self.THREADS
+
+        def leader_fn():
+            # تا همه‌ی threadها به do نرسیده‌اند، اجرا تمام نمی‌شود
+            _wait_until(lambda: flight.stats()["calls"] == self.THREADS)
+            return fn()
+
+        def worker(i):
+            barrier.wait()
+            try:
+                outcomes[i] = ("ok", flight.do("key", leader_fn))
+            except Exception as exc:
+                outcomes[i] = ("error", exc)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(self.THREADS)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(10)
+        return outcomes
+
+    def test_concurrent_calls_coalesce(self):
+        flight = self.flight()
+        result = object()
+        outcomes = self.run_together(flight, lambda: result)
+        self.assertEqual(outcomes, [("ok", result)] * self.THREADS)
+        self.assertEqual(flight.stats(), {"calls": self.THREADS, "executed": 1,
+                                          "coalesced": self.THREADS - 1, "in_flight": 0})
+
+    def test_error_reaches_every_waiter(self):
+        flight = self.flight()
+        error = ValueError("boom")
+
+        def fail():
+            raise error
+
+        outcomes = self.run_together(flight, fail)
+        self.assertEqual(outcomes, [("error", error)] * self.THREADS)
+        self.assertEqual((flight.stats()["executed"], flight.stats()["in_flight"]), (1, 0))
+        # کلید آزاد شده؛ فراخوانی بعدی دوباره اجرا می‌شود
+        self.assertEqual(flight.do("key", lambda: 1), 1)
+        self.assertEqual(flight.stats()["executed"], 2)
+
+    def test_names_are_unique(self):
+        flight = self.flight()
+        with self.assertRaises(ValueError):
+            singleflight.SingleFlight(flight.name)
+        self.assertIs(singleflight.group(flight.name), flight)
+        # watcherها گروه dataset_load را تکرار نمی‌کنند
+        watchers = [DatasetWatcher(dict, FakeFingerprint("a")) for _ in range(2)]
+        self.assertIs(watchers[0]._loads, watchers[1]._loads)
+        self.assertIs(watchers[0]._loads, singleflight._groups["dataset_load"])
+
+
+# ============================================================
+# Server-Timing
+# ============================================================
+
+
+class ServerTimingTest(InsightDatasetTestCase):
+    def setUp(self):
+        super().setUp()
+        # JWT واقعی تا span «auth» هم اندازه گرفته شود
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.user).access_token}")
+
+    def timing(self, path, **params):
+        response = self.client.get(f"/api/insights/{path}", params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.get("Server-Timing")
+
+    @override_settings(SERVER_TIMING=True)
+    def test_insight_spans(self):
+        header = self.timing("breakeven/", sku=self.skus[0])
+        spans = dict(re.fullmatch(r'(\w+);dur=([\d.]+)(?:;desc="\d+ queries")?', part.strip()).groups()
+                     for part in header.split(","))
+        self.assertEqual(set(spans), {"auth", "db", "settings", "dataset", "materialized", "compute", "render", "total"})
+        self.assertEqual(list(spans)[-1], "total")
+        self.assertRegex(header, r'db;dur=[\d.]+;desc="[1-9]\d* queries"')
+        self.assertGreaterEqual(float(spans["total"]), max(float(v) for k, v in spans.items() if k != "total"))
+
+    @override_settings(SERVER_TIMING=False)
+    def test_disabled(self):
+        self.assertIsNone(self.timing("breakeven/", sku=self.skus[0]))
+
+
+# ============================================================
+# Profiler
+# ============================================================
+#
+# ProfilerMiddleware با یک view کند ساختگی: X-Profile فایل collapsed می‌نویسد،
+# فقط PROFILER_MAX_FILES فایل آخر می‌مانند و toggle از طریق profiler.json به
+# workerهای دیگر (اینجا یک _State دیگر) می‌رسد.
+
+class ProfilerTest(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.directory = Path(tmp.name) / "profiles"
+        for name, value in {"directory": self.directory, "enabled": False, "allow_header": True,
+                            "interval": 0.001, "slow_ms": 1000.0, "max_files": 3, "_stamp": None}.items():
+            self.enterContext(mock.patch.object(profiler.state, name, value))
+        self.enterContext(mock.patch.object(profiler, "CONTROL_CHECK_INTERVAL", 0))
+        self.factory = RequestFactory()
+
+    def slow_view(self, request):
+        time.sleep(0.03)
+        return HttpResponse("ok")
+
+    def request(self, path="/api/insights/slow/", **headers):
+        return profiler.ProfilerMiddleware(self.slow_view)(self.factory.get(path, **headers))
+
+    def profiles(self):
+        return sorted(p.name for p in self.directory.glob(f"*{profiler.PROFILE_SUFFIX}"))
+
+    def test_forced_profile_is_written(self):
+        response = self.request()
+        self.assertNotIn("X-Profile-File", response)
+        self.assertEqual(self.profiles(), [])
+
+        response = self.request(HTTP_X_PROFILE="1")
+        name = response["X-Profile-File"]
+        self.assertEqual(self.profiles(), [name])
+        self.assertRegex(name, r"-GET-api_insights_slow-\d+ms\.collapsed$")
+        lines = (self.directory / name).read_text(encoding="utf-8").splitlines()
+        self.assertTrue(lines)
+        for line in lines:
+            self.assertRegex(line, r"^\S.* \d+$")
+        self.assertTrue(any("slow_view (api/tests.py:" in line for line in lines), lines)
+
+        # بدون PROFILER_ALLOW_HEADER هدر نادیده گرفته می‌شود
+        with mock.patch.object(profiler.state, "allow_header", False):
+            self.assertNotIn("X-Profile-File", self.request(HTTP_X_PROFILE="1"))
+
+    def test_only_newest_files_are_kept(self):
+        names = []
+        for i in range(5):
+            names.append(self.request(f"/api/slow/{i}/", HTTP_X_PROFILE="1")["X-Profile-File"])
+        self.assertEqual(self.profiles(), sorted(names[-3:]))
+
+    def test_slow_requests_when_enabled(self):
+        with mock.patch.object(profiler.state, "enabled", True):
+            self.request()
+            self.assertEqual(len(self.profiles()), 0)
+            with mock.patch.object(profiler.state, "slow_ms", 10.0):
+                self.request()
+        self.assertEqual(len(self.profiles()), 1)
+
+    def test_toggle_reaches_other_workers(self):
+        admin = get_user_model().objects.create_user(username="profiler", password=PASSWORD, is_staff=True)
+        client = APIClient()
+        client.force_authenticate(admin)
+        response = client.post("/api/profiler/", {"enabled": True, "slow_ms": 250}, format="json")
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual((response.json()["enabled"], response.json()["slow_ms"]), (True, 250.0))
+
+        # worker دیگر: state جدا با همان PROFILER_DIR
+        other = profiler._State()
+        other.directory = self.directory
+        self.assertFalse(other.enabled)
+        other.sync()
+        self.assertEqual((other.enabled, other.slow_ms), (True, 250.0))
+
+        self.assertEqual(client.post("/api/profiler/", {"slow_ms": "x"}, format="json").status_code, 400)
+        client.post("/api/profiler/", {"enabled": False}, format="json")
+        other.sync()
+        self.assertEqual((other.enabled, other.slow_ms), (False, 250.0))
+
+
+# ============================================================
+# Record tables
+# ============================================================
+#
+# Record و RecordIndex (api/record_table.py) جای ردیف‌های dict و ایندکس‌های
+# product_id → ردیف را گرفته‌اند و باید همان رفتار را داشته باشند.
+
+class RecordTableTest(SimpleTestCase):
+    def table(self, header, rows, name="inventory.csv"):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / name
+            with path.open("w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                writer.writerow(header)
+                writer.writerows(rows)
+            table = RecordTable.read_csv(path, views_insights.TABLE_SCHEMAS[name])
+            with path.open(newline="", encoding="utf-8") as f:
+                dict_rows = list(csv.DictReader(f))
+        return table, dict_rows
+
+    def test_record_reads_like_a_dict_row(self):
+        table, dict_rows = self.table(["product_id", "current_stock", "note"],
+                                      [["P1", "5", "first"], ["P2", "", "دوم"]])
+        self.assertEqual(len(table), 2)
+        row = table[1]
+        self.assertEqual(row["product_id"], "P2")
+        self.assertEqual(row["note"], dict_rows[1]["note"])
+        # current_stock عدد شده؛ سلول خالی مقدار پیش‌فرض ingest را دارد
+        self.assertEqual(table[0]["current_stock"], 5)
+        self.assertIsInstance(row["current_stock"], int)
+        # ستون schema که در CSV نیست مثل کلید نبودن dict رفتار می‌کند
+        self.assertNotIn("restock_quantity", row)
+        self.assertIsNone(row.get("restock_quantity"))
+        self.assertEqual(row.get("restock_quantity", 7), 7)
+        with self.assertRaises(KeyError):
+            row["restock_quantity"]
+        self.assertEqual(list(row), list(dict_rows[1]))
+        self.assertEqual(list(row.keys()), list(dict_rows[1].keys()))
+        self.assertEqual(row.to_dict(), dict(row.items()))
+        self.assertEqual(table[-1].to_dict(), row.to_dict())
+        self.assertEqual([r["product_id"] for r in table[:5]], ["P1", "P2"])
+        with self.assertRaises(IndexError):
+            table[2]
+
+    def test_first_and_last_key(self):
+        table, dict_rows = self.table(["product_id", "current_stock"],
+                                      [["P1", "1"], ["P2", "2"], ["P1", "3"], ["", "4"]])
+        first = RecordIndex.build(table)
+        last = RecordIndex.build(table, first=False, skip_empty=True)
+        self.assertEqual({k: r["current_stock"] for k, r in first.items()}, {"P1": 1, "P2": 2, "": 4})
+        self.assertEqual({k: r["current_stock"] for k, r in last.items()}, {"P1": 3, "P2": 2})
+        # همان نتیجه‌ی _build_index_by_product_id روی ردیف‌های dict
+        expected = views_insights._build_index_by_product_id(dict_rows)
+        self.assertEqual(set(last), set(expected))
+        self.assertEqual({k: str(r["current_stock"]) for k, r in last.items()},
+                         {k: r["current_stock"] for k, r in expected.items()})
+        self.assertNotIn("P9", last)
+        self.assertIsNone(last.get("P9"))
+        self.assertFalse(first.unique)
+
+    def test_missing_key_column_gives_empty_index(self):
+        table, _ = self.table(["current_stock"], [["1"], ["2"]])
+        for kwargs in ({}, {"first": False}, {"skip_empty": True}):
+            index = RecordIndex.build(table, **kwargs)
+            self.assertEqual(len(index), 0)
+            self.assertNotIn("None", index)
+
+    def test_share_only_when_keys_match(self):
+        products, _ = self.table(["product_id", "title"], [["P1", "a"], ["P2", "b"], ["P3", "c"]], "products.csv")
+        by_id = RecordIndex.build(products, first=False, skip_empty=True)
+        self.assertTrue(by_id.unique)
+
+        same, _ = self.table(["product_id", "current_stock"], [["P1", "1"], ["P2", "2"], ["P3", "3"]])
+        shared = RecordIndex.build(same, share=by_id)
+        self.assertIs(shared.positions, by_id.positions)
+        self.assertEqual(shared["P3"]["current_stock"], 3)
+
+        for rows in ([["P2", "2"], ["P1", "1"], ["P3", "3"]],   # ترتیب دیگر
+                     [["P1", "1"], ["P2", "2"]],                # ردیف کمتر
+                     [["P1", "1"], ["P2", "2"], ["P1", "3"]]):  # کلید تکراری
+            other, _ = self.table(["product_id", "current_stock"], rows)
+            index = RecordIndex.build(other, share=by_id)
+            self.assertIsNot(index.positions, by_id.positions)
+            self.assertEqual(dict(index.positions), RecordIndex.build(other).positions)
+
+        # share غیر یکتا هیچ‌وقت دوباره استفاده نمی‌شود
+        dup, _ = self.table(["product_id", "current_stock"], [["P1", "1"], ["P1", "2"]])
+        dup_index = RecordIndex.build(dup)
+        self.assertIsNot(RecordIndex.build(dup, share=dup_index).positions, dup_index.positions)
+
+
+# ============================================================
+# Dataset ingest
+# ============================================================
+#
+# api/ingest.py روی یک CSV کثیف: ردیف‌های خراب با errors/samples درست کنار
+# گذاشته می‌شوند، سلول خالی مقدار پیش‌فرض می‌گیرد و اندازه‌ی تکه‌ها در
+# نتیجه اثری ندارد.
+
+INGEST_SCHEMA = {"product_id": "str", "date": "date", "quantity": "int", "price": "float", "discount": "float?"}
+DIRTY_CSV = """product_id,date,quantity,price,discount,note
+P1,2024-01-05,3,10.5,5,ok
+P2,2024/01/06,abc,1,,bad int
+P3,2024-13-01,1,1,,bad date
+P4,2024-01-07,2
+
+product_id,date,quantity,price,discount,note
+P5,,,,,
+P6,2024-01-08 10:00:00,4.9,2,1.5,"a, b"
+"""
+
+
+class IngestTest(SimpleTestCase):
+    def read(self, chunk_rows=ingest.ROW_CHUNK, keep_rows=False):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "dirty.csv"
+            path.write_text(DIRTY_CSV, encoding="utf-8")
+            report = ingest.IngestReport("dirty", keep_rows=keep_rows)
+            chunks = list(ingest.read_csv_chunks(path, INGEST_SCHEMA, report, chunk_rows=chunk_rows))
+        columns = {
+            name: np.concatenate([c[name] for c, _ in chunks]).tolist() if isinstance(chunks[0][0][name], np.ndarray)
+            else [v for c, _ in chunks for v in c[name]]
+            for name in chunks[0][0]
+        }
+        self.assertEqual(sum(n for _, n in chunks), report.loaded)
+        return columns, report
+
+    def test_bad_rows_are_quarantined(self):
+        columns, report = self.read(keep_rows=True)
+        self.assertEqual((report.rows, report.quarantined, report.loaded), (7, 4, 3))
+        self.assertEqual(dict(report.errors), {
+            "quantity": 2, "date": 2, "price": 1, "discount": 1, ingest.SHORT_ROW: 1,
+        })
+        self.assertEqual(report.samples, [
+            {"row": 2, "columns": {"quantity": "abc"}},
+            {"row": 3, "columns": {"date": "2024-13-01"}},
+            {"row": 4, "columns": {ingest.SHORT_ROW: "P4,2024-01-07,2"}},
+            {"row": 5, "columns": {"date": "date", "quantity": "quantity", "price": "price", "discount": "discount"}},
+        ])
+        self.assertEqual([row[0] for row in report.quarantined_rows], ["P2", "P3", "P4", "product_id"])
+        self.assertEqual(report.missing_columns, [])
+        self.assertEqual(columns["product_id"], ["P1", "P5", "P6"])
+
+    def test_empty_cells_keep_defaults(self):
+        columns, _ = self.read()
+        self.assertEqual(columns["date"], [date(2024, 1, 5).toordinal(), 0, date(2024, 1, 8).toordinal()])
+        # int اعشاری بریده می‌شود؛ float خالی 0.0 و float? خالی NaN
+        self.assertEqual(columns["quantity"], [3, 0, 4])
+        self.assertEqual(columns["price"], [10.5, 0.0, 2.0])
+        self.assertEqual(columns["discount"][0], 5.0)
+        self.assertTrue(math.isnan(columns["discount"][1]))
+        self.assertEqual(columns["note"], ["ok", "", "a, b"])
+
+    def test_chunk_boundaries_do_not_matter(self):
+        expected_columns, expected_report = self.read()
+        for chunk_rows in (1, 2, 3, 5):
+            columns, report = self.read(chunk_rows=chunk_rows)
+            self.assertEqual(report.to_dict(), expected_report.to_dict(), chunk_rows)
+            # NaN != NaN؛ با repr مقایسه می‌شود
+            self.assertEqual(repr(columns), repr(expected_columns), chunk_rows)
+
+    def test_parse_column(self):
+        values, bad = ingest.parse_column(["1", "2.7", "", "1e3", "inf", "x"], "int")
+        self.assertEqual(bad.tolist(), [False, False, False, False, True, True])
+        self.assertEqual(values.tolist()[:4], [1, 2, 0, 1000])
+        values, bad = ingest.parse_column(["2024-02-29", "2023-02-29", "2024/03/01", "today", ""], "date")
+        self.assertEqual(bad.tolist(), [False, True, False, True, False])
+        self.assertEqual(values.tolist()[2], date(2024, 3, 1).toordinal())
+        with self.assertRaises(ValueError):
+            ingest.parse_column(["1"], "decimal")
+
+
+# ============================================================
+# Startup import budget
+# ============================================================
+#
+# کاری که هر worker قبل از اولین درخواست می‌کند (django.setup() و import
+# api/urls.py، یعنی همه‌ی viewها) در پروسه‌ی تازه با python -X importtime
+# اندازه گرفته می‌شود (scripts/bench_startup.py):
+#
+#   STARTUP_BUDGET_MS=1000   سقف مجموع زمان importها (بهترین از سه اجرا)
+#
+# وابستگی‌های سنگین (HEAVY_MODULES: openai، pandas) اصلاً نباید در startup
+# import شوند؛ فقط داخل تابعی که لازمشان دارد.
+
+STARTUP_BUDGET_MS = float(os.getenv("STARTUP_BUDGET_MS", "1000"))
+
+
+class StartupImportTest(SimpleTestCase):
+    def test_startup_import_budget(self):
+        _use_scripts()
+        from bench_startup import measure
+
+        result = measure("api.urls", runs=3)
+        self.assertEqual(result["heavy_imported"], [], "heavy modules imported at startup")
+        slowest = sorted(result["modules"].items(), key=lambda kv: -kv[1])[:10]
+        self.assertLessEqual(
+            result["total_ms"], STARTUP_BUDGET_MS,
+            "startup imports over budget; slowest:\n  " + "\n  ".join(f"{m}: {ms:.0f} ms" for m, ms in slowest),
+        )
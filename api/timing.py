@@ -0,0 +1,138 @@
+# api/timing.py
+"""
+زمان‌بندی فازهای هر درخواست و هدر Server-Timing.
+
+ServerTimingMiddleware برای هر درخواست یک RequestTiming در contextvar
+می‌گذارد و کدها با span("name") فازهایشان را اندازه می‌گیرند:
+
+    with span("compute"):
+        payload = spec.compute(...)
+
+خارج از درخواست (مثلاً thread پس‌زمینه‌ی DatasetWatcher) span کاری نمی‌کند.
+میدل‌ور این‌ها را هم خودش اضافه می‌کند:
+- db:     جمع زمان queryهای connection پیش‌فرض (و تعدادشان)
+- render: رندر JSON پاسخ DRF
+- total:  کل درخواست از دید این میدل‌ور
+
+خروجی در هدر، به ترتیب اولین اجرای هر span:
+
+    Server-Timing: auth;dur=0.41, settings;dur=0.92, compute;dur=11.3, render;dur=1.8, db;dur=0.7;desc="2 queries", total;dur=16.2
+
+اگر یک span چند بار اجرا شود (مثلاً هر بار یک query) زمان‌ها جمع می‌شوند.
+با settings.SERVER_TIMING_LOG همین اعداد به‌صورت یک خط JSON در لاگر
+api.timing هم نوشته می‌شوند.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.db import connection
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+logger = logging.getLogger("api.timing")
+
+_current: ContextVar[Optional["RequestTiming"]] = ContextVar("request_timing", default=None)
+
+
+class RequestTiming:
+    __slots__ = ("spans", "queries")
+
+    def __init__(self):
+        self.spans: Dict[str, float] = {}  # نام → ثانیه
+        self.queries = 0
+
+    def add(self, name: str, seconds: float):
+        self.spans[name] = self.spans.get(name, 0.0) + seconds
+
+    def header(self) -> str:
+        parts = []
+        for name, seconds in self.spans.items():
+            part = f"{name};dur={seconds * 1000:.2f}"
+            if name == "db":
+                part += f';desc="{self.queries} queries"'
+            parts.append(part)
+        return ", ".join(parts)
+
+
+def current() -> Optional[RequestTiming]:
+    return _current.get()
+
+
+@contextmanager
+def span(name: str):
+    timing = _current.get()
+    if timing is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing.add(name, time.perf_counter() - t0)
+
+
+class TimedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication با span «auth» (DRF احراز هویت را lazily داخل view انجام می‌دهد)."""
+
+    def authenticate(self, request):
+        with span("auth"):
+            return super().authenticate(request)
+
+
+class ServerTimingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, "SERVER_TIMING", False)
+        self.log = getattr(settings, "SERVER_TIMING_LOG", False)
+
+    def __call__(self, request):
+        if not (self.enabled or self.log):
+            return self.get_response(request)
+
+        timing = RequestTiming()
+        token = _current.set(timing)
+        t0 = time.perf_counter()
+        try:
+            with connection.execute_wrapper(self._time_query):
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        timing.add("total", time.perf_counter() - t0)
+
+        if self.enabled:
+            response["Server-Timing"] = timing.header()
+        if self.log:
+            logger.info(json.dumps({
+                "method": request.method,
+                "path": request.path,
+                "status": response.status_code,
+                "queries": timing.queries,
+                "spans_ms": {name: round(s * 1000, 3) for name, s in timing.spans.items()},
+            }))
+        return response
+
+    def process_template_response(self, request, response):
+        # Response در DRF بعد از برگشتن view و بعد از این hook رندر می‌شود
+        timing = _current.get()
+        if timing is not None:
+            t0 = time.perf_counter()
+            response.add_post_render_callback(lambda r: timing.add("render", time.perf_counter() - t0))
+        return response
+
+    @staticmethod
+    def _time_query(execute, sql, params, many, context):
+        timing = _current.get()
+        if timing is None:
+            return execute(sql, params, many, context)
+        timing.queries += 1
+        t0 = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            timing.add("db", time.perf_counter() - t0)
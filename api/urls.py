@@ -1,5 +1,5 @@
 from django.urls import path
-from .views import ping, sales_forecast, optimal_pricing, inventory_analysis, portfolio
+from .views import ping, singleflight_stats, sales_forecast, optimal_pricing, inventory_analysis, portfolio
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from .views_auth_seller import login_with_seller_token
 from .views_dk import seller_profile
@@ -15,10 +15,14 @@ from .views_insights import (
     restock_time,
     speed_comparison,
     comment_analysis,
+    comment_search,
+    comment_timeseries,
     classic_overview,
     card_analysis,
 )
 from .views_settings import seller_settings
+from .metrics import metrics_view
+from .profiler import profiler_toggle
 
 
 
@@ -33,6 +37,9 @@ urlpatterns = [
     path("settings/", seller_settings, name="seller_settings"),
     path("insights/card-analysis/",card_analysis,name="insights-card-analysis",),
     path('ping/', ping),
+    path('stats/singleflight/', singleflight_stats),
+    path('metrics/', metrics_view),
+    path('profiler/', profiler_toggle),
     path('charts/sales-forecast/', sales_forecast),
     path('charts/optimal-pricing/', optimal_pricing),
     path('charts/inventory/', inventory_analysis),
@@ -47,6 +54,8 @@ urlpatterns = [
     path("insights/restock-time/", restock_time, name="insights_restock_time"),
     path("insights/speed-compare/", speed_comparison, name="insights_speed_compare"),
     path("insights/comment-analysis/", comment_analysis, name="insights_comment_analysis"),
+    path("insights/comments/search/", comment_search, name="insights_comment_search"),
+    path("insights/comments/timeseries/", comment_timeseries, name="insights_comment_timeseries"),
 
 ]
 
@@ -4,11 +4,19 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 
+from . import singleflight
+
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def ping(request):
     return Response({"status": "ok"})
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def singleflight_stats(request):
+    # چند درخواست به یک محاسبه‌ی در جریان پیوستند (dataset load / insight / LLM)
+    return Response(singleflight.stats())
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def sales_forecast(request):
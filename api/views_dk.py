@@ -3,13 +3,14 @@ from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
 # api/views_dk.py
 from datetime import date, timedelta
-from .views_insights import _load_existing_data, _build_index_by_product_id
+from .views_insights import _current_dataset, _build_index_by_product_id
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
 from .models import SellerCredential
+from .timing import span
 from .digikala import (
     get_profile_with_user_token,
     DigikalaAPIError,
@@ -26,7 +27,8 @@ def _build_demo_profile():
     - monthly_orders  : جمع quantity در ۳۰ روز اخیر
     - monthly_revenue : جمع (quantity * unit_price) در ۳۰ روز اخیر
     """
-    data = _load_existing_data()
+    with span("dataset"):
+        data = _current_dataset()
 
     # 1) تعداد کل محصولات
     product_ids = {p.get("product_id") for p in data.products if p.get("product_id")}
@@ -41,16 +43,15 @@ def _build_demo_profile():
     active_products = set()
 
     for s in data.sales:
-        d = s.get("date")
+        d = s["date"]
         if not d or d < window_start:
             continue
 
-        pid = s.get("product_id")
-        qty = s.get("quantity") or 0
-        price = s.get("unit_price") or 0.0
+        pid = s["product_id"]
+        qty = s["quantity"]
 
-        monthly_orders += int(qty)
-        monthly_revenue += float(qty) * float(price)
+        monthly_orders += qty
+        monthly_revenue += qty * s["unit_price"]
         if pid:
             active_products.add(pid)
 
@@ -101,7 +102,8 @@ def seller_profile(request):
     token = cred.token
 
     try:
-        profile = get_profile_with_user_token(token)
+        with span("digikala"):
+            profile = get_profile_with_user_token(token)
     except AuthFailedError:
         return Response(
             {"detail": "Authentication with Digikala failed. Please re-connect your seller account."},
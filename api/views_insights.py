@@ -3,18 +3,19 @@ from __future__ import annotations
 from calendar import monthrange
 
 import csv
+import logging
 import math
+import threading
+import time
 from collections import defaultdict
-from dataclasses import dataclass
-from datetime import datetime, date
+from dataclasses import dataclass, field
+from datetime import date
 from pathlib import Path
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Mapping, Optional
 
 from django.conf import settings
 
 import json
-from openai import OpenAI
-
 
 from django.conf import settings
 
@@ -23,13 +24,30 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
+import numpy as np
+
+from . import metrics
+from .comment_search import _CommentIndexStore
+from .dataset_watcher import DatasetWatcher
+from .ingest import IngestReport, read_csv_chunks, read_csv_columns
+from .insights_store import DatasetFingerprint, MaterializedInsights
+from .record_table import Record, RecordIndex, RecordTable
+from .shared_dataset import SalesTable, load_sales_table, sale_dicts
+from .singleflight import SingleFlight
+from .timing import span
 from .models import SellerSettings
 
 
 # ---------- helpers: reading CSV & settings ----------
 
 
-DATA_DIR = Path(settings.BASE_DIR) / "data"
+logger = logging.getLogger(__name__)
+
+DATA_DIR = Path(getattr(settings, "INSIGHTS_DATA_DIR", Path(settings.BASE_DIR) / "data"))
+DATASET_TABLES = ("products", "sales", "inventory", "pricing", "reviews", "restocks")
+
+# با DATASET_MMAP جدول فروش به‌صورت ستونی در این پوشه ساخته و mmap می‌شود
+DATASET_CACHE_DIR = DATA_DIR / "dataset_cache"
 
 
 def _safe_int(value: Any, default: int = 0) -> int:
@@ -117,116 +135,204 @@ def _safe_float(value: Any, default: float = 0.0) -> float:
         return default
 
 
-def _parse_date(s: str) -> Optional[date]:
-    if not s:
-        return None
-    for fmt in ("%Y-%m-%d", "%Y/%m/%d", "%Y-%m-%d %H:%M:%S"):
-        try:
-            return datetime.strptime(s, fmt).date()
-        except ValueError:
-            continue
-    return None
+def _read_csv(name: str) -> List[Dict[str, Any]]:
+    return list(_iter_csv(name))
 
 
-def _read_csv(name: str) -> List[Dict[str, Any]]:
+def _iter_csv(name: str):
     path = DATA_DIR / name
     if not path.exists():
-        return []
+        return
     with path.open(newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        return [dict(row) for row in reader]
-
-
-@dataclass
-class ExistingData:
-    products: List[Dict[str, Any]]
-    sales: List[Dict[str, Any]]
-    inventory: List[Dict[str, Any]]
-    pricing: List[Dict[str, Any]]
-    reviews: List[Dict[str, Any]]
-    restocks: List[Dict[str, Any]]  
-
-
-def _load_existing_data() -> ExistingData:
-    products = _read_csv("products.csv")
-    sales = _read_csv("sales.csv")
-    inventory = _read_csv("inventory.csv")
-    pricing = _read_csv("pricing.csv")
-    reviews = _read_csv("reviews.csv")
-    restocks = _read_csv("restocks.csv") 
-
-    # نرمال‌سازی ساده‌ی انواع
-    for r in restocks:
-        r["typical_restock_delay_days"] = _safe_int(
-            r.get("typical_restock_delay_days")
-        )
-        r["supplier_lead_time_days"] = _safe_int(
-            r.get("supplier_lead_time_days")
-        )
-    for p in products:
-        p["cost_price"] = _safe_float(p.get("cost_price"))
-        p["selling_price"] = _safe_float(p.get("selling_price"))
+        for row in csv.DictReader(f):
+            yield dict(row)
+
+
+# schema هر CSV برای api/ingest.py: هر ستون یک بار هنگام بارگذاری تبدیل و
+# اعتبارسنجی می‌شود و ردیف‌های با مقدار نامعتبر کنار گذاشته می‌شوند
+TABLE_SCHEMAS = {
+    # جدول‌های یک ردیف به ازای هر محصول، ستونی (api/record_table.py)
+    "products.csv": {
+        "product_id": "str", "title": "text", "category": "str", "brand": "str",
+        "cost_price": "float", "selling_price": "float", "stock": "float",
+    },
+    "inventory.csv": {
+        "product_id": "str", "current_stock": "int", "last_restock_date": "str", "restock_quantity": "int",
+    },
+    "pricing.csv": {
+        "product_id": "str", "your_price": "float", "your_discount_pct": "float",
+        "competitor_min_price": "float", "competitor_avg_price": "float", "competitor_max_price": "float",
+    },
+    "restocks.csv": {
+        "product_id": "str", "typical_restock_delay_days": "float", "supplier_lead_time_days": "float",
+    },
+    # فروش‌ها: sale_date یا date، و unit_price یا (اگر خالی بود) final_price
+    "sales.csv": {
+        "product_id": "str", "sale_date": "date", "date": "date", "quantity": "int",
+        "unit_price": "float?", "final_price": "float?", "discount_pct": "float",
+    },
+    "reviews.csv": {"product_id": "str", "rating": "int"},
+}
+
+
+def _read_table(name: str, report: IngestReport) -> RecordTable:
+    return RecordTable.read_csv(DATA_DIR / name, TABLE_SCHEMAS[name], report)
+
+
+def _sales_chunks(report: IngestReport):
+    """تکه‌های ستونی sales.csv با ستون‌های SalesTable (بدون dict برای هر ردیف)."""
+    for cols, n in read_csv_chunks(DATA_DIR / "sales.csv", TABLE_SCHEMAS["sales.csv"], report):
+        def column(name, fill, dtype):
+            return cols[name] if name in cols else np.full(n, fill, dtype=dtype)
+
+        day = column("sale_date", 0, np.int32)
+        day = np.where(day > 0, day, column("date", 0, np.int32))
+        final_price = column("final_price", np.nan, np.float64)
+        unit_price = column("unit_price", np.nan, np.float64)
+        unit_price = np.where(np.isnan(unit_price), final_price, unit_price)  # مثل unit_price or final_price
+        yield {
+            "product_id": cols.get("product_id", [""] * n),
+            "date": day,
+            "quantity": column("quantity", 0, np.int64),
+            "unit_price": np.where(np.isnan(unit_price), 0.0, unit_price),
+            "final_price": final_price,
+            "discount_pct": column("discount_pct", 0.0, np.float64),
+        }
 
-    for s in sales:
-        s["quantity"] = _safe_int(s.get("quantity"))
-        s["unit_price"] = _safe_float(
-            s.get("unit_price") or s.get("final_price")
-        )
-        s["discount_pct"] = _safe_float(s.get("discount_pct"))
-        s["date"] = _parse_date(s.get("sale_date") or s.get("date"))
 
+def _read_sales(report: IngestReport) -> List[Dict[str, Any]]:
+    rows: List[Dict[str, Any]] = []
+    for chunk in _sales_chunks(report):
+        rows.extend(sale_dicts(
+            chunk["product_id"], chunk["date"], chunk["quantity"],
+            chunk["unit_price"], chunk["final_price"], chunk["discount_pct"],
+        ))
+    return rows
 
 
+def _load_sales_table(report: IngestReport) -> SalesTable:
+    """فروش‌ها به‌صورت جدول ستونی mmap (مشترک بین workerها)."""
+    return load_sales_table(DATA_DIR / "sales.csv", DATASET_CACHE_DIR, _sales_chunks(report), report)
 
-    for pr in pricing:
-        pr["your_price"] = _safe_float(pr.get("your_price"))
-        pr["your_discount_pct"] = _safe_float(pr.get("your_discount_pct"))
-        pr["competitor_min_price"] = _safe_float(pr.get("competitor_min_price"))
-        pr["competitor_max_price"] = _safe_float(pr.get("competitor_max_price"))
-        pr["competitor_avg_price"] = _safe_float(pr.get("competitor_avg_price"))
 
-    # load inventory.csv
-    inventory_path = settings.BASE_DIR / "data" / "inventory.csv"
-    inventory = []
-    try:
-        with open(inventory_path, "r", encoding="utf-8") as f:
-            inventory = list(csv.DictReader(f))
-    except:
-        inventory = []
+def _read_reviews(report: IngestReport) -> List[Dict[str, Any]]:
+    columns, n = read_csv_columns(DATA_DIR / "reviews.csv", TABLE_SCHEMAS["reviews.csv"], report)
+    values = [v.tolist() if isinstance(v, np.ndarray) else v for v in columns.values()]
+    return [dict(zip(columns, row)) for row in zip(*values)]
 
-    # normalize inventory
-    for inv in inventory:
-        inv["current_stock"] = _safe_int(inv.get("current_stock"))
 
+@dataclass
+class ExistingData:
+    products: RecordTable
+    sales: List[Dict[str, Any]]
+    inventory: RecordTable
+    pricing: RecordTable
+    reviews: List[Dict[str, Any]]
+    restocks: RecordTable
 
-    # load restocks.csv
-    restocks_path = settings.BASE_DIR / "data" / "restocks.csv"
-    restocks = []
-    try:
-        with open(restocks_path, "r", encoding="utf-8") as f:
-            restocks = list(csv.DictReader(f))
-    except:
-        restocks = []
+    # گزارش اعتبارسنجی هر جدول (api/ingest.py)
+    ingest: Dict[str, IngestReport] = field(default_factory=dict)
 
-    # normalize restocks
-    for r in restocks:
-        r["typical_restock_delay_days"] = _safe_float(r.get("typical_restock_delay_days"))
-        r["supplier_lead_time_days"] = _safe_float(r.get("supplier_lead_time_days"))
+    # ایندکس‌ها و rollupها بر اساس product_id (در _index_existing_data پر می‌شوند)
+    products_by_id: Mapping[str, Record] = field(default_factory=dict)
+    sales_by_product: Dict[str, List[Dict[str, Any]]] = field(default_factory=dict)
+    inventory_by_product: Mapping[str, Record] = field(default_factory=dict)
+    pricing_by_product: Mapping[str, Record] = field(default_factory=dict)
+    restocks_by_product: Mapping[str, Record] = field(default_factory=dict)
+    totals_qty: Dict[str, int] = field(default_factory=dict)
+    daily_sales_avg: Dict[str, float] = field(default_factory=dict)
 
 
+def _index_existing_data(data: ExistingData) -> ExistingData:
+    """
+    ایندکس‌هایی که insightها به‌جای پیمایش کل فروش‌ها برای هر SKU استفاده می‌کنند.
+    ترتیب ردیف‌ها همان ترتیب CSV است، پس نتیجه با پیمایش خطی یکی است.
+    """
+    # products: آخرین ردیف هر product_id غیرخالی (مثل _build_index_by_product_id)؛
+    # بقیه: اولین ردیف؛ جدول‌های هم‌ترتیب dict موقعیت‌ها را مشترک دارند
+    products_by_id = RecordIndex.build(data.products, first=False, skip_empty=True)
+    data.products_by_id = products_by_id
+    data.inventory_by_product = RecordIndex.build(data.inventory, share=products_by_id)
+    data.pricing_by_product = RecordIndex.build(data.pricing, share=products_by_id)
+    data.restocks_by_product = RecordIndex.build(data.restocks, share=products_by_id)
+
+    if isinstance(data.sales, SalesTable):
+        # rollupها هنگام ساخت جدول حساب شده‌اند؛ ردیف‌ها برش‌هایی از mmap هستند
+        data.sales_by_product = data.sales.by_product_rows()
+        data.daily_sales_avg = data.sales.daily_sales_avg()
+        data.totals_qty = data.sales.totals_qty()
+        return data
+
+    sales_by_product: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    daily_qty: Dict[str, Dict[date, float]] = defaultdict(lambda: defaultdict(float))
+    for s in data.sales:
+        pid = s.get("product_id")
+        sales_by_product[pid].append(s)
+        day_map = daily_qty[pid]
+        if s.get("date"):
+            day_map[s["date"]] += s["quantity"]
+    data.sales_by_product = dict(sales_by_product)
+
+    # میانگین فروش روزانه (فقط روزهایی که فروش ثبت شده)
+    data.daily_sales_avg = {
+        pid: sum(day_map.values()) / max(len(day_map), 1)
+        for pid, day_map in daily_qty.items()
+    }
+    data.totals_qty = _sales_by_product(data.sales)[0]
+    return data
 
-    for r in reviews:
-        r["rating"] = _safe_int(r.get("rating"))
-        # sentiment: "positive" / "neutral" / "negative" (همان رشته‌ی CSV)
 
-    return ExistingData(
-        products=products,
-        sales=sales,
-        inventory=inventory,
-        pricing=pricing,
-        reviews=reviews,
-        restocks=restocks, 
-    )
+def _load_existing_data() -> ExistingData:
+    ingest = {table: IngestReport(table) for table in DATASET_TABLES}
+    with span("load.products"):
+        products = _read_table("products.csv", ingest["products"])
+    with span("load.sales"):
+        if getattr(settings, "DATASET_MMAP", False) and (DATA_DIR / "sales.csv").exists():
+            sales = _load_sales_table(ingest["sales"])
+            ingest["sales"] = sales.ingest  # اگر جدول از قبل ساخته شده بود، گزارش همان نسخه
+        else:
+            sales = _read_sales(ingest["sales"])
+    with span("load.other"):
+        inventory = _read_table("inventory.csv", ingest["inventory"])
+        pricing = _read_table("pricing.csv", ingest["pricing"])
+        reviews = _read_reviews(ingest["reviews"])
+        restocks = _read_table("restocks.csv", ingest["restocks"])
+
+    for report in ingest.values():
+        if report.quarantined:
+            logger.warning("Dataset rows quarantined: %s", report.summary())
+
+    with span("load.index"):
+        data = _index_existing_data(ExistingData(
+            products=products,
+            sales=sales,
+            inventory=inventory,
+            pricing=pricing,
+            reviews=reviews,
+            restocks=restocks,
+            ingest=ingest,
+        ))
+    _record_dataset_size(data)
+    return data
+
+
+def _record_dataset_size(data: ExistingData):
+    for table in DATASET_TABLES:
+        metrics.dataset_rows.set(len(getattr(data, table)), table=table)
+        report = data.ingest.get(table)
+        metrics.dataset_quarantined_rows.set(report.quarantined if report else 0, table=table)
+    for name in DATASET_FILES:
+        path = DATA_DIR / name
+        if path.exists():
+            metrics.dataset_file_bytes.set(path.stat().st_size, file=name)
+
+
+DEFAULT_SELLER_SETTINGS = {
+    "extra_cost_pct": 3.0,
+    "slow_mover_min_speed": 3,
+    "slow_mover_min_margin": 10.0,
+    "lead_time_days": 12,
+}
 
 
 def _get_seller_settings(user) -> SellerSettings:
@@ -235,16 +341,20 @@ def _get_seller_settings(user) -> SellerSettings:
     """
     obj, _created = SellerSettings.objects.get_or_create(
         user=user,
-        defaults={
-            "extra_cost_pct": 3.0,
-            "slow_mover_min_speed": 3,
-            "slow_mover_min_margin": 10.0,
-            "lead_time_days": 12,
-        },
+        defaults=DEFAULT_SELLER_SETTINGS,
     )
     return obj
 
 
+def _settings_profile(settings_obj) -> Dict[str, Any]:
+    """مقدارهای SellerSettings همان‌طور که insightها استفاده می‌کنند (با پیش‌فرض‌ها)."""
+    return {
+        "extra_cost_pct": float(getattr(settings_obj, "extra_cost_pct", 0) or 0),
+        "slow_mover_min_speed": int(getattr(settings_obj, "slow_mover_min_speed", 3) or 3),
+        "slow_mover_min_margin": float(getattr(settings_obj, "slow_mover_min_margin", 10.0) or 10.0),
+    }
+
+
 # ---------- helpers: basic aggregates ----------
 
 
@@ -262,11 +372,10 @@ def _sales_by_product(sales: List[Dict[str, Any]]):
         pid = s.get("product_id")
         if not pid:
             continue
-        qty = _safe_int(s.get("quantity"))
-        price = _safe_float(s.get("unit_price"))
-        d = s.get("date")
+        qty = s["quantity"]
+        d = s["date"]
         totals_qty[pid] += qty
-        totals_revenue[pid] += qty * price
+        totals_revenue[pid] += qty * s["unit_price"]
         if d:
             if pid not in min_date or d < min_date[pid]:
                 min_date[pid] = d
@@ -277,8 +386,8 @@ def _sales_by_product(sales: List[Dict[str, Any]]):
 
 
 def _margin_for_product(product: Dict[str, Any], extra_cost_pct: float, commission_pct: float = 19.0):
-    price = _safe_float(product.get("selling_price"))
-    cost = _safe_float(product.get("cost_price"))
+    price = product.get("selling_price", 0.0)
+    cost = product.get("cost_price", 0.0)
     other_costs = price * (extra_cost_pct / 100.0)
     commission_fee = price * (commission_pct / 100.0)
     net_profit = price - cost - other_costs - commission_fee
@@ -298,26 +407,13 @@ def _margin_for_product(product: Dict[str, Any], extra_cost_pct: float, commissi
 # ============================================================
 
 
-@api_view(["GET"])
-@permission_classes([IsAuthenticated])
-def profit_margin(request):
-    if not getattr(settings, "USE_FAKE_SELLER", False):
-        return Response(
-            {"detail": "Real Digikala insights are not implemented yet."},
-            status=status.HTTP_501_NOT_IMPLEMENTED,
-        )
-
-    data = _load_existing_data()
+def _profit_margin_payload(data: ExistingData, sku: Optional[str], profile: Dict[str, Any]):
     if not data.products:
-        return Response(
-            {"detail": "No existing products data found."},
-            status=status.HTTP_400_BAD_REQUEST,
-        )
+        return {"detail": "No existing products data found."}, status.HTTP_400_BAD_REQUEST
 
-    settings_obj = _get_seller_settings(request.user)
-    extra_cost_pct = float(settings_obj.extra_cost_pct or 0)
+    extra_cost_pct = profile["extra_cost_pct"]
 
-    totals_qty, _, _, _ = _sales_by_product(data.sales)
+    totals_qty = data.totals_qty
 
     # اگر هیچ فروشی نباشد، اولین محصول را به عنوان نمونه نشان می‌دهیم
     focus_pid = None
@@ -326,8 +422,7 @@ def profit_margin(request):
     else:
         focus_pid = data.products[0]["product_id"]
 
-    products_index = _build_index_by_product_id(data.products)
-    product = products_index.get(focus_pid, data.products[0])
+    product = data.products_by_id.get(focus_pid, data.products[0])
 
     margin = _margin_for_product(product, extra_cost_pct)
 
@@ -345,7 +440,19 @@ def profit_margin(request):
         "sold_units": totals_qty.get(product.get("product_id"), 0),
     }
 
-    return Response(response)
+    return response, status.HTTP_200_OK
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def profit_margin(request):
+    if not getattr(settings, "USE_FAKE_SELLER", False):
+        return Response(
+            {"detail": "Real Digikala insights are not implemented yet."},
+            status=status.HTTP_501_NOT_IMPLEMENTED,
+        )
+
+    return _insight_response("profit_margin", request)
 
 
 # ============================================================
@@ -388,12 +495,11 @@ def _compute_slow_movers(
         if sku_filter and pid != sku_filter:
             continue
 
-        d = s.get("date") or s.get("sale_date")
-        if isinstance(d, str):
-            d = date.fromisoformat(d)
+        totals_qty[pid] += s["quantity"]
 
-        qty = int(s.get("quantity", 0) or 0)
-        totals_qty[pid] += qty
+        d = s["date"]
+        if d is None:
+            continue
 
         if pid not in first_date or d < first_date[pid]:
             first_date[pid] = d
@@ -431,15 +537,15 @@ def _compute_slow_movers(
             extra_cost_pct=extra_cost_pct,
             commission_pct=19.0,  # فعلاً ثابت برای داده فیک
         )
-        margin_pct = float(margin_info.get("margin_pct") or 0.0)
+        margin_pct = margin_info["margin_pct"]
 
         # شاخص سودآوری بر اساس فرمول:
         # profitability_index = (میانگین فروش هفتگی × حاشیه سود واحد) ÷ میانگین موجودی
-        selling_price = float(product.get("selling_price") or 0) or 1.0
+        selling_price = product.get("selling_price", 0.0) or 1.0
         # حاشیه سود واحد به تومان
         profit_per_unit = (margin_pct / 100.0) * selling_price
 
-        stock = float(product.get("stock", 0) or 0.0)
+        stock = product.get("stock", 0.0)
         avg_inventory = max(stock, 1.0)  # برای جلوگیری از تقسیم بر صفر
 
         profitability_index = (weekly_sales * profit_per_unit) / avg_inventory
@@ -499,27 +605,21 @@ def slow_movers(request: Request):
             status=status.HTTP_501_NOT_IMPLEMENTED,
         )
 
-    data = _load_existing_data()
-    settings_obj = _get_seller_settings(request.user)
-
-    # از تنظیمات کاربر بخوان
-    extra_cost_pct = float(getattr(settings_obj, "extra_cost_pct", 0) or 0)
-    min_weekly_sales = int(getattr(settings_obj, "slow_mover_min_speed", 3) or 3)
-    min_margin_pct = float(getattr(settings_obj, "slow_mover_min_margin", 10.0) or 10.0)
+    return _insight_response("slow_movers", request)
 
-    sku_filter = request.GET.get("sku") or None
 
+def _slow_movers_payload(data: ExistingData, sku: Optional[str], profile: Dict[str, Any]):
+    # آستانه‌ها از تنظیمات کاربر (profile) می‌آیند
     result = _compute_slow_movers(
         data.products,
-        data.sales,
-        extra_cost_pct=extra_cost_pct,
-        min_weekly_sales=min_weekly_sales,
-        min_margin_pct=min_margin_pct,
+        data.sales_by_product.get(sku, []) if sku else data.sales,
+        extra_cost_pct=profile["extra_cost_pct"],
+        min_weekly_sales=profile["slow_mover_min_speed"],
+        min_margin_pct=profile["slow_mover_min_margin"],
         min_days_active=14,  # اگر خواستی می‌تونیم این رو هم بعداً قابل تنظیم کنیم
-        sku_filter=sku_filter,
+        sku_filter=sku,
     )
-
-    return Response(result)
+    return result, status.HTTP_200_OK
 
 
 # ============================================================
@@ -542,20 +642,17 @@ def breakeven(request):
             status=status.HTTP_501_NOT_IMPLEMENTED,
         )
 
-    data = _load_existing_data()
-    if not data.products:
-        return Response(
-            {"detail": "No products data."},
-            status=status.HTTP_400_BAD_REQUEST,
-        )
+    return _insight_response("breakeven", request)
 
-    settings_obj = _get_seller_settings(request.user)
-    extra_cost_pct = float(getattr(settings_obj, "extra_cost_pct", 0) or 0)
 
-    sku = request.GET.get("sku") or None
+def _breakeven_payload(data: ExistingData, sku: Optional[str], profile: Dict[str, Any]):
+    if not data.products:
+        return {"detail": "No products data."}, status.HTTP_400_BAD_REQUEST
+
+    extra_cost_pct = profile["extra_cost_pct"]
 
-    products_index = _build_index_by_product_id(data.products)
-    totals_qty, _, _, _ = _sales_by_product(data.sales)
+    products_index = data.products_by_id
+    totals_qty = data.totals_qty
 
     # انتخاب product_id
     if sku and sku in products_index:
@@ -567,10 +664,7 @@ def breakeven(request):
 
     product = products_index.get(pid)
     if not product:
-        return Response(
-            {"detail": "Product not found for breakeven."},
-            status=status.HTTP_404_NOT_FOUND,
-        )
+        return {"detail": "Product not found for breakeven."}, status.HTTP_404_NOT_FOUND
 
     margin = _margin_for_product(product, extra_cost_pct)
     price = margin["price"]
@@ -600,7 +694,7 @@ def breakeven(request):
         "current_sold_units": int(current_sold_units),
         "progress_pct": round(progress_pct, 1),
     }
-    return Response(payload)
+    return payload, status.HTTP_200_OK
 
 
 
@@ -619,24 +713,23 @@ def golden_times(request):
     - peak_points: top calendar dates by revenue
     - upcoming_best_dates: next dates that fall on the best weekdays
     """
-    sku = request.GET.get("sku")
-    data = _load_existing_data()
+    return _insight_response("golden_times", request)
 
+
+def _golden_times_payload(data: ExistingData, sku: Optional[str], profile: Dict[str, Any]):
     # filter sales for this product (or all if sku is None)
     sales_rows = data.sales
     if sku:
-        sales_rows = [s for s in sales_rows if s.get("product_id") == sku]
+        sales_rows = data.sales_by_product.get(sku, [])
 
     if not sales_rows:
-        return Response(
-            {
-                "product_id": sku,
-                "best_days": [],
-                "suggested_hours": [],
-                "peak_points": [],
-                "upcoming_best_dates": [],
-            }
-        )
+        return {
+            "product_id": sku,
+            "best_days": [],
+            "suggested_hours": [],
+            "peak_points": [],
+            "upcoming_best_dates": [],
+        }, status.HTTP_200_OK
 
     import pandas as pd
 
@@ -644,8 +737,7 @@ def golden_times(request):
 
     # ensure date is datetime
     df["date"] = pd.to_datetime(df["date"])
-    df["quantity"] = pd.to_numeric(df["quantity"], errors="coerce").fillna(0)
-    df["final_price"] = pd.to_numeric(df["final_price"], errors="coerce").fillna(0)
+    df["final_price"] = df["final_price"].fillna(0)  # NaN = خالی در CSV
     df["revenue"] = df["quantity"] * df["final_price"]
 
     # 1) best weekdays by revenue
@@ -707,15 +799,13 @@ def golden_times(request):
     # 4) suggested hours (generic – no time column in CSV)
     suggested_hours = ["10:00–12:00", "18:00–21:00"]
 
-    return Response(
-        {
-            "product_id": sku,
-            "best_days": best_days,
-            "suggested_hours": suggested_hours,
-            "peak_points": peak_points,
-            "upcoming_best_dates": upcoming,
-        }
-    )
+    return {
+        "product_id": sku,
+        "best_days": best_days,
+        "suggested_hours": suggested_hours,
+        "peak_points": peak_points,
+        "upcoming_best_dates": upcoming,
+    }, status.HTTP_200_OK
 
 
 # @api_view(["GET"])
@@ -787,43 +877,34 @@ def revenue_forecast(request):
             status=status.HTTP_501_NOT_IMPLEMENTED,
         )
 
-    sku = request.GET.get("sku")
+    return _insight_response("revenue_forecast", request)
+
+
+def _revenue_forecast_payload(data: ExistingData, sku: Optional[str], profile: Dict[str, Any]):
     if not sku:
-        return Response(
-            {"detail": "sku query param is required."},
-            status=status.HTTP_400_BAD_REQUEST,
-        )
+        return {"detail": "sku query param is required."}, status.HTTP_400_BAD_REQUEST
 
-    data = _load_existing_data()
     # فقط فروش‌های همین محصول
-    sales_sku = [s for s in data.sales if s.get("product_id") == sku]
+    sales_sku = data.sales_by_product.get(sku, [])
 
     if not sales_sku:
-        return Response(
-            {"detail": "No sales data for given sku."},
-            status=status.HTTP_400_BAD_REQUEST,
-        )
+        return {"detail": "No sales data for given sku."}, status.HTTP_400_BAD_REQUEST
 
     # جمع درآمد روزانه
     daily_rev = defaultdict(float)
     min_d, max_d = None, None
     for s in sales_sku:
-        d = s.get("date")
-        qty = _safe_int(s.get("quantity"))
-        price = _safe_float(s.get("unit_price"))
+        d = s["date"]
         if not d:
             continue
-        daily_rev[d] += qty * price
+        daily_rev[d] += s["quantity"] * s["unit_price"]
         if not min_d or d < min_d:
             min_d = d
         if not max_d or d > max_d:
             max_d = d
 
     if not min_d or not max_d:
-        return Response(
-            {"detail": "No valid dates in sales for this sku."},
-            status=status.HTTP_400_BAD_REQUEST,
-        )
+        return {"detail": "No valid dates in sales for this sku."}, status.HTTP_400_BAD_REQUEST
 
     # ماه جاری را از روی آخرین تاریخ فروش فرض می‌کنیم
     cur_year, cur_month = max_d.year, max_d.month
@@ -893,7 +974,7 @@ def revenue_forecast(request):
         "trend": trend,
         "confidence": round(confidence, 2),
     }
-    return Response(payload)
+    return payload, status.HTTP_200_OK
 
 
 # ============================================================
@@ -913,51 +994,36 @@ def discount_competition(request):
             status=status.HTTP_501_NOT_IMPLEMENTED,
         )
 
-    sku = request.GET.get("sku")
-    if not sku:
-        return Response(
-            {"detail": "sku query param is required."},
-            status=status.HTTP_400_BAD_REQUEST,
-        )
+    return _insight_response("discount_competition", request)
 
-    data = _load_existing_data()
-    products_index = _build_index_by_product_id(data.products)
 
-    product = products_index.get(sku)
+def _discount_competition_payload(data: ExistingData, sku: Optional[str], profile: Dict[str, Any]):
+    if not sku:
+        return {"detail": "sku query param is required."}, status.HTTP_400_BAD_REQUEST
+
+    product = data.products_by_id.get(sku)
     if not product:
-        return Response(
-            {"detail": "Product not found for given sku."},
-            status=status.HTTP_404_NOT_FOUND,
-        )
+        return {"detail": "Product not found for given sku."}, status.HTTP_404_NOT_FOUND
 
     # match row in pricing.csv
-    pricing_row = next(
-        (pr for pr in data.pricing if str(pr.get("product_id")) == str(sku)),
-        None,
-    )
+    pricing_row = data.pricing_by_product.get(str(sku))
 
-    your_price = _safe_float(
-        pricing_row.get("your_price") if pricing_row else product.get("selling_price")
-    )
-    your_discount_pct = _safe_float(
-        pricing_row.get("your_discount_pct") if pricing_row else 0.0
-    )
+    your_price = pricing_row.get("your_price", 0.0) if pricing_row else product.get("selling_price", 0.0)
+    your_discount_pct = pricing_row.get("your_discount_pct", 0.0) if pricing_row else 0.0
     effective_price = your_price * (1 - your_discount_pct / 100.0)
 
-    comp_min = _safe_float(pricing_row.get("competitor_min_price")) if pricing_row else 0.0
-    comp_avg = _safe_float(pricing_row.get("competitor_avg_price")) if pricing_row else 0.0
+    comp_min = pricing_row.get("competitor_min_price", 0.0) if pricing_row else 0.0
+    comp_avg = pricing_row.get("competitor_avg_price", 0.0) if pricing_row else 0.0
 
     if comp_min <= 0 and comp_avg <= 0:
-        return Response(
-            {
-                "your_price": round(your_price, 2),
-                "your_discount_pct": your_discount_pct,
-                "effective_price": round(effective_price, 2),
-                "effective_discount_vs_cheapest_pct": None,
-                "position": "no_competitor",
-                "competitors": [],
-            }
-        )
+        return {
+            "your_price": round(your_price, 2),
+            "your_discount_pct": your_discount_pct,
+            "effective_price": round(effective_price, 2),
+            "effective_discount_vs_cheapest_pct": None,
+            "position": "no_competitor",
+            "competitors": [],
+        }, status.HTTP_200_OK
 
     if comp_min > 0:
         eff_discount_vs_cheapest_pct = ((comp_min - effective_price) / comp_min) * 100.0
@@ -983,18 +1049,16 @@ def discount_competition(request):
             {"name": "avg_competitor_price", "price": round(comp_avg, 2)}
         )
 
-    return Response(
-        {
-            "your_price": round(your_price, 2),
-            "your_discount_pct": your_discount_pct,
-            "effective_price": round(effective_price, 2),
-            "effective_discount_vs_cheapest_pct": round(eff_discount_vs_cheapest_pct, 2)
-            if eff_discount_vs_cheapest_pct is not None
-            else None,
-            "position": position,
-            "competitors": competitors_payload,
-        }
-    )
+    return {
+        "your_price": round(your_price, 2),
+        "your_discount_pct": your_discount_pct,
+        "effective_price": round(effective_price, 2),
+        "effective_discount_vs_cheapest_pct": round(eff_discount_vs_cheapest_pct, 2)
+        if eff_discount_vs_cheapest_pct is not None
+        else None,
+        "position": position,
+        "competitors": competitors_payload,
+    }, status.HTTP_200_OK
 
 
 
@@ -1011,36 +1075,28 @@ def restock_time(request):
             status=501,
         )
 
-    sku = request.GET.get("sku")
-    if not sku:
-        return Response({"detail": "sku is required"}, status=400)
+    return _insight_response("restock_time", request)
 
-    data = _load_existing_data()
-    products_index = _build_index_by_product_id(data.products)
 
-    product = products_index.get(sku)
+def _restock_time_payload(data: ExistingData, sku: Optional[str], profile: Dict[str, Any]):
+    if not sku:
+        return {"detail": "sku is required"}, 400
+
+    product = data.products_by_id.get(sku)
     if not product:
-        return Response({"detail": "product not found"}, status=404)
+        return {"detail": "product not found"}, 404
 
     # 1) read inventory
-    inv_row = next((i for i in data.inventory if i["product_id"] == sku), None)
+    inv_row = data.inventory_by_product.get(sku)
     current_stock = inv_row["current_stock"] if inv_row else 0
 
     # 2) read restock stats
-    r_row = next((r for r in data.restocks if r["product_id"] == sku), None)
+    r_row = data.restocks_by_product.get(sku)
     typical_delay = r_row["typical_restock_delay_days"] if r_row else 0
     lead_time = r_row["supplier_lead_time_days"] if r_row else 0
 
     # 3) calculate daily sales avg from last 30 days
-    sales_sku = [s for s in data.sales if s["product_id"] == sku]
-    if sales_sku:
-        daily = defaultdict(float)
-        for s in sales_sku:
-            if s["date"]:
-                daily[s["date"]] += s["quantity"]
-        daily_sales_avg = sum(daily.values()) / max(len(daily), 1)
-    else:
-        daily_sales_avg = 0
+    daily_sales_avg = data.daily_sales_avg.get(sku, 0)
 
     # 4) calculate stockout time
     if daily_sales_avg > 0:
@@ -1079,7 +1135,7 @@ def restock_time(request):
         )
     }
 
-    return Response(payload)
+    return payload, 200
 
 
 
@@ -1093,30 +1149,24 @@ def speed_comparison(request):
     if not getattr(settings, "USE_FAKE_SELLER", False):
         return Response({"detail": "Not implemented"}, status=501)
 
-    sku = request.GET.get("sku")
+    return _insight_response("speed_comparison", request)
+
+
+def _speed_comparison_payload(data: ExistingData, sku: Optional[str], profile: Dict[str, Any]):
     if not sku:
-        return Response({"detail": "sku is required"}, status=400)
+        return {"detail": "sku is required"}, 400
 
-    data = _load_existing_data()
-    products_index = _build_index_by_product_id(data.products)
+    products_index = data.products_by_id
 
     product = products_index.get(sku)
     if not product:
-        return Response({"detail": "product not found"}, status=404)
+        return {"detail": "product not found"}, 404
 
     # --- 1) compute sales speed of selected product ---
-    sales_sku = [s for s in data.sales if s["product_id"] == sku]
-    if sales_sku:
-        daily = defaultdict(float)
-        for s in sales_sku:
-            if s["date"]:
-                daily[s["date"]] += s["quantity"]
-        new_speed = sum(daily.values()) / max(len(daily), 1)
-    else:
-        new_speed = 0
+    new_speed = data.daily_sales_avg.get(sku, 0)
 
     # --- 2) find replacement product (if exists) ---
-    replacements = _read_csv("replacements.csv") if os.path.exists(settings.BASE_DIR / "data" / "replacements.csv") else []
+    replacements = _read_csv("replacements.csv") if os.path.exists(DATA_DIR / "replacements.csv") else []
     old_product_id = None
     for r in replacements:
         if r["new_product_id"] == sku:
@@ -1124,32 +1174,18 @@ def speed_comparison(request):
 
     # if no explicit replacement → compare against category average
     if old_product_id:
-        old_sales = [s for s in data.sales if s["product_id"] == old_product_id]
-        if old_sales:
-            daily_old = defaultdict(float)
-            for s in old_sales:
-                if s["date"]:
-                    daily_old[s["date"]] += s["quantity"]
-            old_speed = sum(daily_old.values()) / max(len(daily_old), 1)
-        else:
-            old_speed = 0
+        old_speed = data.daily_sales_avg.get(old_product_id, 0)
         old_title = products_index[old_product_id]["title"]
     else:
         # fallback to category average
         category = product.get("category")
         cat_products = [p for p in data.products if p.get("category") == category]
 
-        speeds = []
-        for p in cat_products:
-            sales_p = [s for s in data.sales if s["product_id"] == p["product_id"]]
-            if not sales_p:
-                continue
-            daily_p = defaultdict(float)
-            for s in sales_p:
-                if s["date"]:
-                    daily_p[s["date"]] += s["quantity"]
-            speed = sum(daily_p.values()) / max(len(daily_p), 1)
-            speeds.append(speed)
+        speeds = [
+            data.daily_sales_avg[p["product_id"]]
+            for p in cat_products
+            if p["product_id"] in data.daily_sales_avg
+        ]
 
         old_speed = sum(speeds) / max(len(speeds), 1) if speeds else 0
         old_title = f"Category average ({category})"
@@ -1168,14 +1204,14 @@ def speed_comparison(request):
     else:
         conclusion = "No meaningful change."
 
-    return Response({
+    return {
         "old_product_title": old_title,
         "old_speed": round(old_speed, 2),
         "new_product_title": product["title"],
         "new_speed": round(new_speed, 2),
         "speed_change_pct": round(change_pct, 2),
         "conclusion": conclusion,
-    })
+    }, 200
 
 
 # # ============================================================
@@ -1190,84 +1226,281 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from pathlib import Path
 
-COMMENTS_SUMMARY_PATH = settings.BASE_DIR / "data" / "comments_summary.csv"
+COMMENTS_SUMMARY_PATH = DATA_DIR / "comments_summary.csv"
+
+# حداکثر هر چند ثانیه یک بار تغییر فایل خلاصه‌ی نظرات چک می‌شود
+COMMENTS_SUMMARY_CHECK_INTERVAL = 1.0
+
+EMPTY_COMMENT_ANALYSIS = {
+    "positive_ratio": 0.0,
+    "negative_ratio": 0.0,
+    "sentiment_score": 0.0,
+    "avg_rating": 0.0,
+    "total_reviews": 0,
+    "summary_en": "",
+    "top_issues_en": [],
+    "top_highlights_en": [],
+    "sample_comments_fa": [],
+}
 
-def _load_comments_summary():
+
+def _load_comments_summary(path: Path = COMMENTS_SUMMARY_PATH):
     rows = []
-    if COMMENTS_SUMMARY_PATH.exists():
-        with open(COMMENTS_SUMMARY_PATH, newline="", encoding="utf-8") as f:
+    if path.exists():
+        with open(path, newline="", encoding="utf-8") as f:
             reader = csv.DictReader(f)
             rows = list(reader)
     return rows
 
-def _find_comment_row(sku: str):
-    for row in _load_comments_summary():
-        if row.get("product_id") == sku:
-            return row
-    return None
+
+def _parse_ratio(row, ratio_key, share_key):
+    raw = (row.get(ratio_key) or row.get(share_key) or "0").strip()
+    try:
+        value = float(raw)
+    except ValueError:
+        return 0.0
+    # اگر مقدار به صورت درصد (۰–۱۰۰) باشد، تبدیل به ۰–۱ کن
+    return value / 100.0 if value > 1 else value
+
+
+def _parse_list(row, field_name: str):
+    raw = (row.get(field_name) or "").strip()
+    if not raw:
+        return []
+
+    # برای کامنت‌های فارسی، جداکننده "||" است
+    if field_name == "sample_comments_fa":
+        parts = raw.split("||")
+    else:
+        # برای بقیه معمولا با کاما جدا شده‌اند
+        # مثل: "quality, price, packaging"
+        parts = raw.split(",")
+
+    return [p.strip() for p in parts if p.strip()]
+
+
+def _comment_payload(row) -> Dict[str, Any]:
+    """یک ردیف comments_summary.csv → خروجی آماده‌ی comment_analysis"""
+    return {
+        "positive_ratio": _parse_ratio(row, "positive_ratio", "positive_share"),
+        "negative_ratio": _parse_ratio(row, "negative_ratio", "negative_share"),
+        "sentiment_score": _safe_float(row.get("sentiment_score")),
+        "avg_rating": _safe_float(row.get("avg_rating")),
+        "total_reviews": _safe_int(row.get("total_reviews")),
+        "summary_en": (row.get("summary_en") or "").strip(),
+        "top_issues_en": _parse_list(row, "top_issues_en"),
+        "top_highlights_en": _parse_list(row, "top_highlights_en"),
+        "sample_comments_fa": _parse_list(row, "sample_comments_fa"),
+    }
+
+
+class _CommentsSummaryStore:
+    """
+    comments_summary.csv یک بار خوانده و بر اساس product_id ایندکس می‌شود
+    (لیست‌ها و نسبت‌ها از قبل parse شده‌اند).
+    اگر فایل عوض شود (mtime/size)، دوباره بارگذاری می‌شود.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._index: Dict[str, Dict[str, Any]] = {}
+        self._stamp = None
+        self._checked_at = 0.0
+
+    def _file_stamp(self):
+        try:
+            st = self.path.stat()
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _load(self):
+        return {
+            row["product_id"]: _comment_payload(row)
+            for row in _load_comments_summary(self.path)
+            if row.get("product_id")
+        }
+
+    def index(self):
+        now = time.monotonic()
+        if now - self._checked_at < COMMENTS_SUMMARY_CHECK_INTERVAL:
+            return self._index
+
+        with self._lock:
+            stamp = self._file_stamp()
+            if stamp != self._stamp:
+                self._index = self._load()
+                self._stamp = stamp
+            self._checked_at = now
+        return self._index
+
+    def get(self, sku: str) -> Optional[Dict[str, Any]]:
+        return self.index().get(sku)
+
+
+_comments_summary_store = _CommentsSummaryStore(COMMENTS_SUMMARY_PATH)
+
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def comment_analysis(request):
-    sku = request.GET.get("sku")
-    if not sku:
+    """
+    خلاصه‌ی نظرات مشتری برای یک SKU.
+
+    - ?sku=P003          → همان خروجی قبلی برای یک محصول
+    - ?sku=P003,P004,... → {"results": {sku: ...}} برای چند محصول با یک درخواست
+    """
+    raw_sku = request.GET.get("sku")
+    if not raw_sku:
         return Response({"detail": "Missing sku"}, status=400)
 
-    row = _find_comment_row(sku)
+    skus = [s.strip() for s in raw_sku.split(",") if s.strip()]
+    if not skus:
+        return Response({"detail": "Missing sku"}, status=400)
+
+    with span("comments"):
+        index = _comments_summary_store.index()
 
-    if not row:
-        # مقدارهای پیش‌فرض اگر برای این SKU ردیفی در CSV نبود
+    if len(skus) > 1:
         return Response({
-            "positive_ratio": 0.0,
-            "negative_ratio": 0.0,
-            "sentiment_score": 0.0,
-            "avg_rating": 0.0,
-            "total_reviews": 0,
-            "summary_en": "",
-            "top_issues_en": [],
-            "top_highlights_en": [],
-            "sample_comments_fa": [],
+            "results": {sku: index.get(sku, EMPTY_COMMENT_ANALYSIS) for sku in skus}
         })
 
-    def parse_ratio(row, ratio_key, share_key):
-        raw = (row.get(ratio_key) or row.get(share_key) or "0").strip()
-        try:
-            value = float(raw)
-        except ValueError:
-            return 0.0
-        # اگر مقدار به صورت درصد (۰–۱۰۰) باشد، تبدیل به ۰–۱ کن
-        return value / 100.0 if value > 1 else value
-    
-    def parse_list(field_name: str):
-        raw = (row.get(field_name) or "").strip()
-        if not raw:
-            return []
-
-        # برای کامنت‌های فارسی، جداکننده "||" است
-        if field_name == "sample_comments_fa":
-            parts = raw.split("||")
-        else:
-            # برای بقیه معمولا با کاما جدا شده‌اند
-            # مثل: "quality, price, packaging"
-            parts = raw.split(",")
+    # مقدارهای پیش‌فرض اگر برای این SKU ردیفی در CSV نبود
+    return Response(index.get(skus[0], EMPTY_COMMENT_ANALYSIS))
+
+
+COMMENTS_WEEKLY_PATH = DATA_DIR / "comments_weekly.npz"
+
+
+class _CommentsWeeklyStore(_CommentsSummaryStore):
+    """
+    comments_weekly.npz (خروجی analyze_comments.py) در حافظه نگه داشته می‌شود:
+    ستون‌ها آرایه‌های numpy هستند و هر محصول یک بازه‌ی [start, end) از آن‌هاست.
+    """
+
+    def _load(self):
+        if not self.path.exists():
+            return {}
+        with np.load(self.path) as data:
+            columns = {name: data[name] for name in data.files}
+        offsets = columns["offsets"]
+        return {
+            "columns": columns,
+            "issue_labels": columns["issue_labels"].tolist(),
+            "products": {
+                pid: (int(offsets[i]), int(offsets[i + 1]))
+                for i, pid in enumerate(columns["product_ids"].tolist())
+            },
+        }
+
+    def series(self, sku: str, weeks: int = 0) -> Optional[Dict[str, Any]]:
+        index = self.index()
+        if sku not in index.get("products", {}):
+            return None
+        start, end = index["products"][sku]
+        if weeks > 0 and end > start:
+            # N هفته‌ی تقویمی تا آخرین هفته‌ی دارای نظر، نه N سطر آخر
+            week = index["columns"]["week"]
+            first_week = week[end - 1] - 7 * (weeks - 1)
+            start += int(np.searchsorted(week[start:end], first_week))
+
+        col = {
+            name: index["columns"][name][start:end]
+            for name in ("week", "positive", "neutral", "negative", "rated", "rating_sum", "issues")
+        }
+        issues = col["issues"]
+        rated = col["rated"]
+        avg_rating = np.divide(
+            col["rating_sum"], rated, out=np.full(len(rated), np.nan, dtype="float64"), where=rated > 0
+        )
+        epoch = np.datetime64("1970-01-01", "D")
+        return {
+            "week_start": [str(d) for d in epoch + col["week"].astype("timedelta64[D]")],
+            "positive": col["positive"].tolist(),
+            "neutral": col["neutral"].tolist(),
+            "negative": col["negative"].tolist(),
+            "avg_rating": [None if math.isnan(r) else round(r, 2) for r in avg_rating.tolist()],
+            "issues": {
+                label: issues[:, i].tolist() for i, label in enumerate(index["issue_labels"])
+            },
+        }
+
+
+_comments_weekly_store = _CommentsWeeklyStore(COMMENTS_WEEKLY_PATH)
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def comment_timeseries(request):
+    """
+    روند هفتگی نظرات یک SKU برای نمودار: /insights/comments/timeseries/?sku=P003&weeks=26
+
+    خروجی ستونی است (هر کلید یک لیست هم‌طول با week_start)؛ هفته‌ها از شنبه
+    شروع می‌شوند و هفته‌های بدون نظر در خروجی نیستند. weeks=N یعنی N هفته‌ی
+    تقویمی که به آخرین هفته‌ی دارای نظر ختم می‌شوند (پس ممکن است کمتر از N سطر برگردد).
+    """
+    sku = (request.GET.get("sku") or "").strip()
+    if not sku:
+        return Response({"detail": "Missing sku"}, status=400)
+    weeks = max(0, _safe_int(request.GET.get("weeks"), 0))
+
+    with span("comments"):
+        series = _comments_weekly_store.series(sku, weeks)
+    if series is None:
+        series = {
+            "week_start": [], "positive": [], "neutral": [], "negative": [],
+            "avg_rating": [], "issues": {},
+        }
+    return Response({"sku": sku, **series})
 
-        return [p.strip() for p in parts if p.strip()]
 
+COMMENT_INDEX_DIR = DATA_DIR / "comment_index"
+COMMENT_SEARCH_PAGE_SIZE = 20
+COMMENT_SEARCH_MAX_PAGE_SIZE = 100
 
-    pos_ratio = parse_ratio(row, "positive_ratio", "positive_share")
-    neg_ratio = parse_ratio(row, "negative_ratio", "negative_share")
+_comment_index_store = _CommentIndexStore(COMMENT_INDEX_DIR)
 
 
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def comment_search(request):
+    """
+    جستجو در متن نظرات: /insights/comments/search/?sku=P003&q=بسته بندی&page=1
+
+    - sku اختیاری است (بدون آن در همه‌ی محصولات جستجو می‌شود)
+    - نتایج جدیدترین اول هستند
+    - highlights بازه‌های [start, end) کلمات پیدا شده در body است
+    """
+    q = (request.GET.get("q") or "").strip()
+    if not q:
+        return Response({"detail": "Missing q"}, status=400)
+    sku = (request.GET.get("sku") or "").strip() or None
+
+    page = max(1, _safe_int(request.GET.get("page"), 1))
+    page_size = _safe_int(request.GET.get("page_size"), COMMENT_SEARCH_PAGE_SIZE)
+    page_size = min(max(1, page_size), COMMENT_SEARCH_MAX_PAGE_SIZE)
+
+    with span("index"):
+        index = _comment_index_store.get()
+    if index is None:
+        return Response({"detail": "Comment search index not built."}, status=503)
+
+    started = time.perf_counter()
+    with span("search"):
+        docs, query = index.search(q, sku)
+        start = (page - 1) * page_size
+        results = [index.hit(int(doc), query) for doc in docs[start:start + page_size]]
+
     return Response({
-        "positive_ratio": parse_ratio(row, "positive_ratio", "positive_share"),
-        "negative_ratio": parse_ratio(row, "negative_ratio", "negative_share"),
-        "sentiment_score": float(row.get("sentiment_score", 0) or 0),
-        "avg_rating": float(row.get("avg_rating", 0) or 0),
-        "total_reviews": int(row.get("total_reviews", 0) or 0),
-        "summary_en": (row.get("summary_en") or "").strip(),
-        "top_issues_en": parse_list("top_issues_en"),
-        "top_highlights_en": parse_list("top_highlights_en"),
-        "sample_comments_fa": parse_list("sample_comments_fa"),
+        "sku": sku,
+        "q": q,
+        "total": int(len(docs)),
+        "page": page,
+        "page_size": page_size,
+        "results": results,
+        "took_ms": round((time.perf_counter() - started) * 1000, 2),
     })
 
 
@@ -1291,7 +1524,10 @@ def products_list(request):
             status=501,
         )
 
-    data = _load_existing_data()
+    return _insight_response("products_list", request)
+
+
+def _products_list_payload(data: ExistingData, sku: Optional[str], profile: Dict[str, Any]):
     items = [
         {
             "product_id": p.get("product_id"),
@@ -1302,7 +1538,7 @@ def products_list(request):
         for p in data.products
         if p.get("product_id")
     ]
-    return Response(items)
+    return items, 200
 
 
 
@@ -1341,30 +1577,20 @@ def classic_overview(request):
             status=501,
         )
 
-    data = _load_existing_data()
-    products_index = _build_index_by_product_id(data.products)
+    return _insight_response("classic_overview", request)
+
+
+def _classic_overview_payload(data: ExistingData, sku: Optional[str], profile: Dict[str, Any]):
+    products_index = data.products_by_id
 
     # ---------- 1) Sales trend (global) ----------
     monthly_rev = defaultdict(float)
 
     for s in data.sales:
-        d = s.get("date") or s.get("sale_date")
+        d = s["date"]
         if not d:
             continue
-
-        if isinstance(d, str):
-            # skip header / invalid strings like "sale_date", "date", ...
-            if d.lower() in {"date", "sale_date"}:
-                continue
-            try:
-                d = date.fromisoformat(d)
-            except ValueError:
-                # اگر فرمت تاریخ درست نبود، آن ردیف را رد کن
-                continue
-
-    qty = _safe_int(s.get("quantity"))
-    price = _safe_float(s.get("unit_price"))
-    monthly_rev[(d.year, d.month)] += qty * price
+        monthly_rev[(d.year, d.month)] += s["quantity"] * s["unit_price"]
 
 
     # مرتب‌سازی و گرفتن ۶ ماه آخر
@@ -1385,9 +1611,7 @@ def classic_overview(request):
     # ---------- 2) Simple pricing curve (pick top-selling SKU) ----------
     totals_qty = defaultdict(int)
     for s in data.sales:
-        pid = s.get("product_id")
-        qty = _safe_int(s.get("quantity"))
-        totals_qty[pid] += qty
+        totals_qty[s["product_id"]] += s["quantity"]
 
     sample_pid = None
     if totals_qty:
@@ -1397,7 +1621,7 @@ def classic_overview(request):
 
     base_price = 0.0
     if sample_pid and sample_pid in products_index:
-        base_price = _safe_float(products_index[sample_pid].get("selling_price"))
+        base_price = products_index[sample_pid].get("selling_price", 0.0)
 
     if base_price <= 0:
         base_price = 100.0  # fallback
@@ -1434,26 +1658,13 @@ def classic_overview(request):
     }
 
     # ---------- 3) Inventory health (top low-cover SKUs) ----------
-    # محاسبه avg daily sales برای هر محصول
-    daily_by_pid = defaultdict(lambda: defaultdict(float))
-    for s in data.sales:
-        pid = s.get("product_id")
-        d = s.get("date")
-        if not d or not pid:
-            continue
-        qty = _safe_int(s.get("quantity"))
-        daily_by_pid[pid][d] += qty
-
-    avg_daily_sales = {}
-    for pid, day_map in daily_by_pid.items():
-        if not day_map:
-            continue
-        avg_daily_sales[pid] = sum(day_map.values()) / max(len(day_map), 1)
+    # avg daily sales برای هر محصول
+    avg_daily_sales = data.daily_sales_avg
 
     items = []
     for inv in data.inventory:
         pid = inv.get("product_id")
-        stock = _safe_int(inv.get("current_stock"))
+        stock = inv.get("current_stock", 0)
         if not pid:
             continue
         avg = avg_daily_sales.get(pid, 0.0)
@@ -1491,9 +1702,7 @@ def classic_overview(request):
         if not prod:
             continue
         cat = prod.get("category") or "Other"
-        qty = _safe_int(s.get("quantity"))
-        price = _safe_float(s.get("unit_price"))
-        revenue_by_cat[cat] += qty * price
+        revenue_by_cat[cat] += s["quantity"] * s["unit_price"]
 
     total_rev = sum(revenue_by_cat.values()) or 1.0
     allocation = [
@@ -1517,15 +1726,144 @@ def classic_overview(request):
 
     portfolioData = {"allocation": allocation}
 
-    return Response(
-        {
-            "salesData": salesData,
-            "pricingData": pricingData,
-            "inventoryData": inventoryData,
-            "portfolioData": portfolioData,
-        }
-    )
+    return {
+        "salesData": salesData,
+        "pricingData": pricingData,
+        "inventoryData": inventoryData,
+        "portfolioData": portfolioData,
+    }, 200
+
+
+# ============================================================
+# Materialized insights (manage.py materialize_insights)
+# ============================================================
+
+# هر insight: تابع محاسبه، فیلدهای SellerSettings که لازم دارد،
+# و اینکه ?sku= دارد ("optional" / "required") یا نه (None)
+@dataclass(frozen=True)
+class InsightSpec:
+    compute: Any
+    settings_fields: tuple = ()
+    sku: Optional[str] = "optional"
+
+
+INSIGHTS: Dict[str, InsightSpec] = {
+    "profit_margin": InsightSpec(_profit_margin_payload, ("extra_cost_pct",), sku=None),
+    "slow_movers": InsightSpec(
+        _slow_movers_payload,
+        ("extra_cost_pct", "slow_mover_min_speed", "slow_mover_min_margin"),
+    ),
+    "breakeven": InsightSpec(_breakeven_payload, ("extra_cost_pct",)),
+    "golden_times": InsightSpec(_golden_times_payload),
+    "revenue_forecast": InsightSpec(_revenue_forecast_payload, sku="required"),
+    "discount_competition": InsightSpec(_discount_competition_payload, sku="required"),
+    "restock_time": InsightSpec(_restock_time_payload, sku="required"),
+    "speed_comparison": InsightSpec(_speed_comparison_payload, sku="required"),
+    "products_list": InsightSpec(_products_list_payload, sku=None),
+    "classic_overview": InsightSpec(_classic_overview_payload, sku=None),
+}
+
+# با تغییر منطق هر کدام از توابع بالا این عدد را زیاد کن تا نتایج قدیمی استفاده نشوند
+INSIGHTS_VERSION = 3
+
+INSIGHTS_MATERIALIZED_PATH = DATA_DIR / "insights_materialized.sqlite3"
+
+# فایل‌هایی که insightها از آن‌ها خوانده می‌شوند
+DATASET_FILES = (
+    "products.csv",
+    "sales.csv",
+    "inventory.csv",
+    "pricing.csv",
+    "reviews.csv",
+    "restocks.csv",
+    "replacements.csv",
+)
+
+_dataset_fingerprint = DatasetFingerprint(
+    DATA_DIR, DATASET_FILES, INSIGHTS_VERSION, COMMENTS_SUMMARY_CHECK_INTERVAL
+)
+_materialized_insights = MaterializedInsights(INSIGHTS_MATERIALIZED_PATH)
+
+# snapshot دیتاست؛ thread آن از ApiConfig.ready شروع می‌شود
+_dataset_watcher = DatasetWatcher(
+    _load_existing_data,
+    _dataset_fingerprint,
+    getattr(settings, "DATASET_WATCH_INTERVAL", 2.0),
+    getattr(settings, "DATASET_FIRST_LOAD_WAIT", 10.0),
+)
+
+
+# محاسبه‌ی زنده‌ی یکسان (insight, sku, تنظیمات, دیتاست) برای درخواست‌های هم‌زمان یک بار اجرا می‌شود
+_insight_flight = SingleFlight("insight_compute")
+
+
+def _current_dataset() -> ExistingData:
+    return _dataset_watcher.current().data
+
+
+def _profile_key(spec: InsightSpec, profile: Dict[str, Any]) -> str:
+    if not spec.settings_fields:
+        return ""
+    return json.dumps({f: profile[f] for f in spec.settings_fields}, sort_keys=True)
+
+
+def _insight_response(name: str, request) -> Response:
+    """
+    اگر نتیجه‌ی همین (insight, sku, تنظیمات) برای دیتاست فعلی materialize شده
+    باشد همان را برمی‌گرداند، وگرنه زنده محاسبه می‌کند.
+    """
+    spec = INSIGHTS[name]
+    sku = (request.GET.get("sku") or None) if spec.sku else None
+    profile = {}
+    if spec.settings_fields:
+        with span("settings"):
+            profile = _settings_profile(_get_seller_settings(request.user))
+
+    # یک snapshot برای کل درخواست؛ نتیجه‌ی materialize‌شده باید مال همان دیتاست باشد
+    with span("dataset"):
+        snapshot = _dataset_watcher.current()
+    profile_key = _profile_key(spec, profile)
+    with span("materialized"):
+        hit = _materialized_insights.get(name, sku or "", profile_key, snapshot.fingerprint)
+    metrics.insight_cache.inc(insight=name, result="miss" if hit is None else "hit")
+    if hit is not None:
+        payload, code = hit
+    else:
+        with span("compute"):
+            payload, code = _insight_flight.do(
+                (name, sku, profile_key, snapshot.fingerprint),
+                lambda: spec.compute(snapshot.data, sku, profile),
+            )
+    return Response(payload, status=code)
+
+
+CARD_ANALYSIS_MODEL = "gpt-4.1-mini"  # یا هر مدلی که استفاده می‌کنی
+CARD_ANALYSIS_SYSTEM_PROMPT = (
+    "You are EDA, an economic decision assistant for Digikala sellers. "
+    "Always answer in short, practical English, without markdown formatting."
+)
+CARD_ANALYSIS_MAX_OUTPUT_TOKENS = 220
+
+# چند کارت یکسان که هم‌زمان باز می‌شوند فقط یک درخواست به LLM می‌فرستند
+_llm_flight = SingleFlight("llm_card_analysis")
+
+
+def _card_analysis_llm(prompt: str) -> str:
+    # openai فقط اینجا import می‌شود (نیم ثانیه در هر بار بالا آمدن worker و هر manage.py)
+    from openai import OpenAI
 
+    with metrics.outbound_call("llm"):
+        client = OpenAI(api_key=settings.OPENAI_API_KEY)
+
+        chat = client.responses.create(
+            model=CARD_ANALYSIS_MODEL,
+            input=[
+                {"role": "system", "content": CARD_ANALYSIS_SYSTEM_PROMPT},
+                {"role": "user", "content": prompt},
+            ],
+            max_output_tokens=CARD_ANALYSIS_MAX_OUTPUT_TOKENS,
+        )
+        return chat.output[0].content[0].text
 
 
 def _format_card_data_for_prompt(card_data: dict) -> str:
@@ -1573,25 +1911,11 @@ def card_analysis(request):
 
     # فراخوانی GPT – اینجا از OpenAI جدید استفاده می‌کنم، مدل را خودت تنظیم کن
     try:
-
-        client = OpenAI(api_key=settings.OPENAI_API_KEY)
-
-        chat = client.responses.create(
-            model="gpt-4.1-mini",  # یا هر مدلی که استفاده می‌کنی
-            input=[
-                {
-                    "role": "system",
-                    "content": (
-                        "You are EDA, an economic decision assistant for Digikala sellers. "
-                        "Always answer in short, practical English, without markdown formatting."
-                    ),
-                },
-                {"role": "user", "content": prompt},
-            ],
-            max_output_tokens=220,
-        )
-
-        analysis_text = chat.output[0].content[0].text
+        with span("llm"):
+            analysis_text = _llm_flight.do(
+                (CARD_ANALYSIS_MODEL, CARD_ANALYSIS_MAX_OUTPUT_TOKENS, prompt),
+                lambda: _card_analysis_llm(prompt),
+            )
     except Exception as exc:
         # در MVP فقط خطا را لاگ کن و پیام کوتاه بده
         print("card_analysis error:", exc)
@@ -50,6 +50,9 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
+    'api.timing.ServerTimingMiddleware',
+    'api.metrics.MetricsMiddleware',
+    'api.profiler.ProfilerMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -78,6 +81,44 @@ TEMPLATES = [
 
 USE_FAKE_SELLER = True
 
+# پوشه‌ی CSVهای دیتاست insightها
+INSIGHTS_DATA_DIR = Path(os.getenv("INSIGHTS_DATA_DIR", BASE_DIR / "data"))
+
+# فروش‌ها به‌صورت آرایه‌های ستونی mmap (data/dataset_cache/) تا workerهای
+# gunicorn/uWSGI یک نسخه را بدون کپی بخوانند؛ gunicorn.conf.py روشنش می‌کند
+DATASET_MMAP = os.getenv("DATASET_MMAP", "0") == "1"
+
+# thread پس‌زمینه‌ای که data/ را می‌پاید و snapshot دیتاست را از قبل می‌سازد؛
+# فقط برای پروسه‌ای که سرو می‌کند: gunicorn.conf.py روشنش می‌کند (runserver و
+# uWSGI با DATASET_WATCHER=1). بدون آن دیتاست با اولین درخواست خوانده می‌شود.
+DATASET_WATCHER = os.getenv("DATASET_WATCHER", "0") == "1"
+DATASET_WATCH_INTERVAL = 2.0  # ثانیه
+# حداکثر انتظار درخواست‌ها برای اولین بارگذاری thread؛ بعد از آن 503
+DATASET_FIRST_LOAD_WAIT = 10.0  # ثانیه
+
+# هدر Server-Timing با زمان فازهای هر درخواست (auth، settings، dataset، compute، render، db)؛
+# در production خاموش، چون زمان‌بندی داخلی را به هر کلاینتی نشان می‌دهد
+SERVER_TIMING = os.getenv("SERVER_TIMING", "1" if DEBUG else "0") == "1"
+# همان زمان‌ها برای هر درخواست به‌صورت یک خط JSON در لاگر api.timing
+SERVER_TIMING_LOG = os.getenv("SERVER_TIMING_LOG", "0") == "1"
+
+# profiler نمونه‌برداری (api/profiler.py): درخواست‌های کندتر از PROFILER_SLOW_MS
+# به‌صورت collapsed stack در PROFILER_DIR ذخیره می‌شوند. پیش‌فرض خاموش است و
+# فقط با هدر X-Profile یا POST /api/profiler/ (فقط staff، برای همه‌ی workerها) روشن می‌شود
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "0") == "1"
+PROFILER_SLOW_MS = float(os.getenv("PROFILER_SLOW_MS", "1000"))
+PROFILER_INTERVAL_MS = 10
+PROFILER_ALLOW_HEADER = DEBUG  # هدر X-Profile: 1
+PROFILER_DIR = BASE_DIR / "profiles"
+PROFILER_MAX_FILES = 50
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {"console": {"class": "logging.StreamHandler"}},
+    "loggers": {"api.timing": {"handlers": ["console"], "level": "INFO", "propagate": False}},
+}
+
 WSGI_APPLICATION = 'backend.wsgi.application'
 
 CORS_ALLOW_ALL_ORIGINS = True
@@ -148,7 +189,7 @@ from datetime import timedelta
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "api.timing.TimedJWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.IsAuthenticated",
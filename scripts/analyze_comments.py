@@ -1,15 +1,53 @@
 #!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
 import csv
-from collections import Counter, defaultdict
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+if TYPE_CHECKING:
+    import pandas as pd
 
-import pandas as pd
+from jalali import parse_jalali_dates
+from near_duplicates import cluster_report, find_near_duplicates
+from persian_text import KeywordMatcher
+from sentiment_model import SENTIMENT_MODEL_NPZ, SentimentModel
 
 BASE_DIR = Path(__file__).resolve().parent.parent
-DATA_DIR = BASE_DIR / "data"
+# the directory the API serves (settings.INSIGHTS_DATA_DIR); --data-dir overrides it
+DATA_DIR = Path(os.getenv("INSIGHTS_DATA_DIR", BASE_DIR / "data"))
 
 COMMENTS_CSV = DATA_DIR / "comments_raw.csv"
 OUT_SUMMARY_CSV = DATA_DIR / "comments_summary.csv"
+# per-product content hashes of the comments behind comments_summary.csv
+SUMMARY_STATE_JSON = DATA_DIR / "comments_summary_state.json"
+# per-product weekly sentiment buckets, see WeeklySeries
+OUT_WEEKLY_NPZ = DATA_DIR / "comments_weekly.npz"
+# per-product near-duplicate clusters left out of the summaries
+OUT_DUPLICATES_CSV = DATA_DIR / "comments_duplicates.csv"
+
+DUPLICATE_FIELDS = ["product_id", "comments", "duplicates", "clusters", "cluster_sizes"]
+
+SUMMARY_FIELDS = [
+    "product_id",
+    "total_reviews",
+    "avg_rating",
+    "positive_share",
+    "negative_share",
+    "sentiment_score",
+    "summary_en",
+    "top_issues_en",
+    "top_highlights_en",
+    "sample_comments_fa",
+]
 
 
 ISSUE_KEYWORDS = {
@@ -27,22 +65,34 @@ POSITIVE_KEYWORDS = {
 }
 
 
+# Built once: a single regex pass per comment finds every issue and highlight label.
+KEYWORD_MATCHER = KeywordMatcher({"issue": ISSUE_KEYWORDS, "highlight": POSITIVE_KEYWORDS})
+
+
 def detect_issues(text: str) -> set[str]:
-    text = text or ""
-    found = set()
-    for label, words in ISSUE_KEYWORDS.items():
-        if any(w in text for w in words):
-            found.add(label)
-    return found
+    return KEYWORD_MATCHER.labels(KEYWORD_MATCHER.mask(text), "issue")
 
 
 def detect_highlights(text: str) -> set[str]:
-    text = text or ""
-    found = set()
-    for label, phrases in POSITIVE_KEYWORDS.items():
-        if any(p in text for p in phrases):
-            found.add(label)
-    return found
+    return KEYWORD_MATCHER.labels(KEYWORD_MATCHER.mask(text), "highlight")
+
+
+def add_label_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Scan the whole body column once and add one boolean column per label,
+    e.g. issue_packaging / highlight_quality.
+    """
+    masks = KEYWORD_MATCHER.mask_column(df["body"]).to_numpy()
+    for group, keywords in (("issue", ISSUE_KEYWORDS), ("highlight", POSITIVE_KEYWORDS)):
+        for label in keywords:
+            df[f"{group}_{label}"] = (masks & KEYWORD_MATCHER.bit(group, label)) != 0
+    return df
+
+
+def top_labels(counts: dict[str, int], n: int = 3) -> list[str]:
+    """Most frequent labels; ties keep the keyword table order."""
+    ranked = sorted((lbl for lbl, c in counts.items() if c > 0), key=lambda lbl: -counts[lbl])
+    return ranked[:n]
 
 
 def classify_sentiment_from_rating(rating):
@@ -83,85 +133,202 @@ def build_summary_sentence(pos_ratio, neg_ratio, recent_delta, recent_packaging_
     return " ".join(parts)
 
 
-def main():
-    df = pd.read_csv(COMMENTS_CSV)
+def sentiment_codes(ratings: pd.Series) -> np.ndarray:
+    """
+    Vectorized classify_sentiment_from_rating: 1 positive, 0 neutral, -1 negative.
+    Only used when there is no text model (see sentiment_model.py).
+    """
+    import pandas as pd
+
+    r = pd.to_numeric(ratings, errors="coerce").to_numpy(dtype="float64")
+    codes = np.zeros(len(r), dtype=np.int8)
+    codes[r >= 4] = 1
+    codes[r <= 2] = -1
+    return codes
+
+
+def load_comments(path: Path) -> pd.DataFrame:
+    import pandas as pd
+
+    df = pd.read_csv(path)
 
     # Fallbacks
     if "rating" not in df.columns:
         df["rating"] = None
 
-    df["sentiment_label"] = df["rating"].apply(classify_sentiment_from_rating)
+    df["sentiment"] = sentiment_codes(df["rating"])
     df["body"] = df["body"].fillna("")
+    return df
+
+
+# ---------- per-product summaries ----------
+
+SAMPLE_COMMENTS = 3
+RECENT_WINDOW = 5
+NO_DATE = np.iinfo(np.int64).min
+
+
+@dataclass
+class GroupChunk:
+    """
+    A run of product groups as flat arrays; group i is rows offsets[i]:offsets[i+1],
+    already in created_at order. This is what gets shipped to worker processes.
+    """
+
+    product_ids: list
+    offsets: np.ndarray
+    sentiment: np.ndarray  # int8, see sentiment_codes
+    rating: np.ndarray  # float64, NaN when missing
+    label_mask: np.ndarray  # int64, KEYWORD_MATCHER bits
+    days: np.ndarray  # int64 days since 1970-01-01, NO_DATE when unknown
+    samples: list[list[str]]  # first SAMPLE_COMMENTS bodies per group
+
+
+def comment_dates(df: pd.DataFrame) -> pd.Series:
+    """
+    Comment date as datetime64: the crawler's Gregorian created_date when
+    present, otherwise created_at parsed as a Jalali date ("26 آبان 1404").
+    """
+    import pandas as pd
+
+    created = pd.Series(pd.NaT, index=df.index, dtype="datetime64[ns]")
+    if "created_date" in df.columns:
+        created = pd.to_datetime(df["created_date"], format="%Y-%m-%d", errors="coerce")
+    if "created_at" in df.columns and created.isna().any():
+        missing = created.isna()
+        created[missing] = parse_jalali_dates(df.loc[missing, "created_at"])
+    return created
+
+
+def label_masks(bodies: np.ndarray) -> np.ndarray:
+    """KEYWORD_MATCHER bitmask per comment body (a worker task when run in a pool)."""
+    import pandas as pd
+
+    return KEYWORD_MATCHER.mask_column(pd.Series(bodies, dtype=object)).to_numpy(dtype="int64")
+
+
+def build_chunks(df: pd.DataFrame, n_chunks: int = 1, label_mask: np.ndarray | None = None) -> list[GroupChunk]:
+    """
+    Label (unless `label_mask` is given) and sort the whole frame once, then
+    cut it into `n_chunks` contiguous runs of product groups with roughly
+    equal row counts.
+    """
+    import pandas as pd
+
+    if label_mask is None:
+        label_mask = label_masks(df["body"].to_numpy(dtype=object))
+
+    created = comment_dates(df)
+
+    work = pd.DataFrame({
+        "product_id": df["product_id"],
+        "created": created,
+        "sentiment": df["sentiment"],
+        "rating": pd.to_numeric(df["rating"], errors="coerce").astype("float64"),
+        "label_mask": label_mask,
+        "body": df["body"],
+    })
+    work = work[work["product_id"].notna()]
+    # stable: comments with the same (or no) date keep their file order
+    work = work.sort_values(["product_id", "created"], kind="stable", na_position="last")
+    if work.empty:
+        return []
+
+    pids = work["product_id"].to_numpy()
+    starts = np.flatnonzero(np.r_[True, pids[1:] != pids[:-1]])
+    ends = np.r_[starts[1:], len(pids)]
+
+    sentiment = work["sentiment"].to_numpy(dtype=np.int8)
+    rating = work["rating"].to_numpy(dtype="float64")
+    label_mask = work["label_mask"].to_numpy(dtype="int64")
+    days = work["created"].to_numpy(dtype="datetime64[D]").astype(np.int64)
+    days[work["created"].isna().to_numpy()] = NO_DATE
+    bodies = work["body"].to_numpy(dtype=object)
+
+    # split group boundaries so every chunk holds about the same number of rows
+    n_chunks = max(1, min(n_chunks, len(starts)))
+    targets = np.linspace(0, len(pids), n_chunks + 1)[1:-1]
+    cuts = np.unique(np.r_[0, np.searchsorted(ends, targets, side="left") + 1, len(starts)])
+    cuts = cuts[cuts <= len(starts)]
+
+    chunks = []
+    for a, b in zip(cuts[:-1], cuts[1:]):
+        lo, hi = starts[a], ends[b - 1]
+        chunks.append(
+            GroupChunk(
+                product_ids=list(pids[starts[a:b]]),
+                offsets=np.r_[starts[a:b], hi] - lo,
+                sentiment=sentiment[lo:hi],
+                rating=rating[lo:hi],
+                label_mask=label_mask[lo:hi],
+                days=days[lo:hi],
+                samples=[list(bodies[s:min(s + SAMPLE_COMMENTS, e)]) for s, e in zip(starts[a:b], ends[a:b])],
+            )
+        )
+    return chunks
 
-    summaries = []
 
-    for product_id, g in df.groupby("product_id"):
-        g = g.copy()
+def _pos_ratio(sentiment: np.ndarray):
+    n = len(sentiment)
+    return ((sentiment == 1).sum() / n) if n else None
 
-        total = len(g)
-        pos = (g["sentiment_label"] == "positive").sum()
-        neg = (g["sentiment_label"] == "negative").sum()
-        neu = (g["sentiment_label"] == "neutral").sum()
 
-        pos_ratio = pos / total if total else 0
-        neg_ratio = neg / total if total else 0
-        sentiment_score = (pos - neg) / total if total else 0  # between -1 and +1
+def summarize_chunk(chunk: GroupChunk) -> list[dict]:
+    """Summaries for every group of a chunk; runs in worker processes."""
+    packaging_bit = KEYWORD_MATCHER.bit("issue", "packaging")
+    issue_bits = {lbl: KEYWORD_MATCHER.bit("issue", lbl) for lbl in ISSUE_KEYWORDS}
+    highlight_bits = {lbl: KEYWORD_MATCHER.bit("highlight", lbl) for lbl in POSITIVE_KEYWORDS}
 
-        # Convert created_at to datetime if possible
-        if "created_at" in g.columns:
-            g["created_at_dt"] = pd.to_datetime(g["created_at"], errors="coerce")
-            g = g.sort_values("created_at_dt")
-        else:
-            g["created_at_dt"] = None
+    summaries = []
+    for i, product_id in enumerate(chunk.product_ids):
+        s, e = chunk.offsets[i], chunk.offsets[i + 1]
+        sentiment = chunk.sentiment[s:e]
+        rating = chunk.rating[s:e]
+        masks = chunk.label_mask[s:e]
 
-        # Trend: last 5 vs the rest
-        recent = g.tail(5)
-        older = g.iloc[:-5] if len(g) > 5 else pd.DataFrame(columns=g.columns)
+        total = e - s
+        pos = (sentiment == 1).sum()
+        neg = (sentiment == -1).sum()
 
-        def ratio_pos(x):
-            n = len(x)
-            return ((x["sentiment_label"] == "positive").sum() / n) if n else None
+        pos_ratio = pos / total if total else 0
+        neg_ratio = neg / total if total else 0
+        sentiment_score = (pos - neg) / total if total else 0  # between -1 and +1
 
-        recent_pos_ratio = ratio_pos(recent)
-        older_pos_ratio = ratio_pos(older)
+        # Trend: last 5 vs the rest (rows are already in created_at order)
+        recent_pos_ratio = _pos_ratio(sentiment[-RECENT_WINDOW:])
+        older_pos_ratio = _pos_ratio(sentiment[:-RECENT_WINDOW] if total > RECENT_WINDOW else sentiment[:0])
         recent_delta = None
         if recent_pos_ratio is not None and older_pos_ratio is not None:
             recent_delta = recent_pos_ratio - older_pos_ratio
 
         # Issues & highlights
-        issue_counts = Counter()
-        highlight_counts = Counter()
-        packaging_recent_flag = False
-
-        for _, row in g.iterrows():
-            text = row["body"]
-            issues = detect_issues(text)
-            highs = detect_highlights(text)
-            issue_counts.update(issues)
-            highlight_counts.update(highs)
+        issue_counts = {lbl: int(np.count_nonzero(masks & bit)) for lbl, bit in issue_bits.items()}
+        highlight_counts = {lbl: int(np.count_nonzero(masks & bit)) for lbl, bit in highlight_bits.items()}
 
         # Check packaging in last 2–3 comments with non-good rating
-        for _, row in recent.iterrows():
-            if classify_sentiment_from_rating(row["rating"]) != "positive":
-                if "packaging" in detect_issues(row["body"]):
-                    packaging_recent_flag = True
-                    break
+        recent_masks = masks[-RECENT_WINDOW:]
+        recent_sentiment = sentiment[-RECENT_WINDOW:]
+        packaging_recent_flag = bool(
+            np.any(((recent_masks & packaging_bit) != 0) & (recent_sentiment != 1))
+        )
 
-        top_issues = [lbl for lbl, _ in issue_counts.most_common(3)]
-        top_highlights = [lbl for lbl, _ in highlight_counts.most_common(3)]
+        top_issues = top_labels(issue_counts)
+        top_highlights = top_labels(highlight_counts)
 
         summary_sentence = build_summary_sentence(
             pos_ratio, neg_ratio, recent_delta, packaging_recent_flag
         )
 
-        # Sample Farsi comments (for display in UI)
-        sample_comments = list(g["body"].head(3))
+        # same as pandas' mean(): NaN ratings are skipped
+        rated = ~np.isnan(rating)
+        n_rated = int(rated.sum())
+        avg_rating = float(np.where(rated, rating, 0.0).sum() / n_rated) if n_rated else float("nan")
 
         summaries.append(
             {
                 "product_id": product_id,
                 "total_reviews": int(total),
-                "avg_rating": float(g["rating"].astype(float).mean()) if total else 0.0,
+                "avg_rating": avg_rating if total else 0.0,
                 "positive_share": round(pos_ratio * 100, 1),
                 "negative_share": round(neg_ratio * 100, 1),
                 "sentiment_score": round(sentiment_score, 3),  # -1 .. +1
@@ -169,21 +336,363 @@ def main():
                 "top_issues_en": ", ".join(top_issues),        # e.g. "packaging, price"
                 "top_highlights_en": ", ".join(top_highlights),
                 # keep Farsi to show as “نمونه نظرات”
-                "sample_comments_fa": " || ".join(sample_comments),
+                "sample_comments_fa": " || ".join(chunk.samples[i]),
             }
         )
 
+    return summaries
+
+
+# ---------- weekly time series ----------
+
+
+@dataclass
+class WeeklySeries:
+    """
+    Weekly buckets of many products as flat columns; product i owns rows
+    offsets[i]:offsets[i+1], oldest week first. Weeks start on Saturday and
+    are stored as days since 1970-01-01. Undated comments are left out.
+    """
+
+    product_ids: list
+    offsets: np.ndarray  # int64
+    week: np.ndarray  # int32
+    positive: np.ndarray  # int32
+    neutral: np.ndarray  # int32
+    negative: np.ndarray  # int32
+    rated: np.ndarray  # int32, comments with a rating
+    rating_sum: np.ndarray  # float32
+    issues: np.ndarray  # int32, (rows, len(ISSUE_KEYWORDS)), ISSUE_KEYWORDS order
+
+    COLUMNS = ("week", "positive", "neutral", "negative", "rated", "rating_sum", "issues")
+
+    @classmethod
+    def empty(cls) -> "WeeklySeries":
+        return cls(
+            product_ids=[],
+            offsets=np.zeros(1, dtype=np.int64),
+            week=np.zeros(0, dtype=np.int32),
+            positive=np.zeros(0, dtype=np.int32),
+            neutral=np.zeros(0, dtype=np.int32),
+            negative=np.zeros(0, dtype=np.int32),
+            rated=np.zeros(0, dtype=np.int32),
+            rating_sum=np.zeros(0, dtype=np.float32),
+            issues=np.zeros((0, len(ISSUE_KEYWORDS)), dtype=np.int32),
+        )
+
+    def product_slices(self) -> dict[str, tuple[int, int]]:
+        return {
+            str(pid): (int(self.offsets[i]), int(self.offsets[i + 1]))
+            for i, pid in enumerate(self.product_ids)
+        }
+
+
+def week_start(days: np.ndarray) -> np.ndarray:
+    """Saturday on or before each day (1970-01-03 was a Saturday)."""
+    return days - (days - 2) % 7
+
+
+def weekly_chunk(chunk: GroupChunk) -> WeeklySeries:
+    """
+    Weekly buckets for every group of a chunk. Rows are already sorted by
+    (product, date) with undated rows last, so each (group, week) bucket is a
+    contiguous run and all sums are a single np.add.reduceat.
+    """
+    sizes = np.diff(chunk.offsets)
+    group = np.repeat(np.arange(len(sizes)), sizes)
+    dated = chunk.days != NO_DATE
+
+    group = group[dated]
+    week = week_start(chunk.days[dated])
+    sentiment = chunk.sentiment[dated]
+    rating = chunk.rating[dated]
+    masks = chunk.label_mask[dated]
+
+    if not len(group):
+        series = WeeklySeries.empty()
+        series.product_ids = list(chunk.product_ids)
+        series.offsets = np.zeros(len(sizes) + 1, dtype=np.int64)
+        return series
+
+    starts = np.flatnonzero(np.r_[True, (group[1:] != group[:-1]) | (week[1:] != week[:-1])])
+    rated = ~np.isnan(rating)
+    issue_hits = np.stack(
+        [(masks & KEYWORD_MATCHER.bit("issue", lbl)) != 0 for lbl in ISSUE_KEYWORDS], axis=1
+    )
+
+    def bucket_sum(values) -> np.ndarray:
+        return np.add.reduceat(values.astype(np.int64), starts, axis=0)
+
+    bucket_group = group[starts]
+    return WeeklySeries(
+        product_ids=list(chunk.product_ids),
+        offsets=np.searchsorted(bucket_group, np.arange(len(sizes) + 1)).astype(np.int64),
+        week=week[starts].astype(np.int32),
+        positive=bucket_sum(sentiment == 1).astype(np.int32),
+        neutral=bucket_sum(sentiment == 0).astype(np.int32),
+        negative=bucket_sum(sentiment == -1).astype(np.int32),
+        rated=bucket_sum(rated).astype(np.int32),
+        rating_sum=np.add.reduceat(np.where(rated, rating, 0.0), starts).astype(np.float32),
+        issues=bucket_sum(issue_hits).astype(np.int32),
+    )
+
+
+def concat_weekly(parts: list[WeeklySeries]) -> WeeklySeries:
+    """Glue series of disjoint product runs together, in the given order."""
+    parts = [p for p in parts if p.product_ids]
+    if not parts:
+        return WeeklySeries.empty()
+    offsets, base = [np.zeros(1, dtype=np.int64)], 0
+    for p in parts:
+        offsets.append(p.offsets[1:] - p.offsets[0] + base)
+        base += int(p.offsets[-1] - p.offsets[0])
+    columns = {
+        col: np.concatenate([getattr(p, col)[p.offsets[0]:p.offsets[-1]] for p in parts])
+        for col in WeeklySeries.COLUMNS
+    }
+    return WeeklySeries(
+        product_ids=[pid for p in parts for pid in p.product_ids],
+        offsets=np.concatenate(offsets),
+        **columns,
+    )
+
+
+def select_weekly(series: WeeklySeries, product_ids: list) -> WeeklySeries:
+    """The buckets of `product_ids` (each must be in `series`), in that order."""
+    slices = series.product_slices()
+    parts = []
+    for pid in product_ids:
+        s, e = slices[pid]
+        parts.append(
+            WeeklySeries(
+                product_ids=[pid],
+                offsets=np.array([s, e], dtype=np.int64),
+                **{col: getattr(series, col) for col in WeeklySeries.COLUMNS},
+            )
+        )
+    return concat_weekly(parts)
+
+
+def analyze_chunk(chunk: GroupChunk) -> tuple[list[dict], WeeklySeries]:
+    return summarize_chunk(chunk), weekly_chunk(chunk)
+
+
+def summarize(df: pd.DataFrame, workers: int = 1) -> tuple[list[dict], WeeklySeries]:
+    """
+    One summary row per product_id, ordered by product_id, plus the weekly
+    series of the same products.
+    With workers > 1 the product groups are spread over a process pool;
+    results come back in chunk order, so the output equals the serial run.
+    """
+    if workers <= 1:
+        results = [analyze_chunk(chunk) for chunk in build_chunks(df, 1)]
+    else:
+        n_chunks = workers * 4
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # keyword scanning is the expensive part, so it is spread out as well
+            bodies = np.array_split(df["body"].to_numpy(dtype=object), n_chunks)
+            label_mask = np.concatenate(list(pool.map(label_masks, bodies)))
+            chunks = build_chunks(df, n_chunks, label_mask=label_mask)
+            results = list(pool.map(analyze_chunk, chunks))
+
+    rows = [row for summaries, _ in results for row in summaries]
+    return rows, concat_weekly([weekly for _, weekly in results])
+
+
+# ---------- incremental rebuild ----------
+
+# Bump when the summary logic changes so stored fingerprints stop matching.
+SUMMARY_VERSION = 4
+FINGERPRINT_COLUMNS = ["comment_id", "rating", "title", "body", "created_at", "created_date"]
+
+
+def summary_logic_version(model: SentimentModel | None = None) -> str:
+    h = hashlib.blake2b(digest_size=8)
+    h.update(str(SUMMARY_VERSION).encode())
+    h.update((model.digest() if model is not None else "rating").encode())
+    h.update(json.dumps([ISSUE_KEYWORDS, POSITIVE_KEYWORDS], ensure_ascii=False, sort_keys=True).encode())
+    return h.hexdigest()
+
+
+def product_fingerprints(df: pd.DataFrame) -> dict[str, str]:
+    """
+    Content hash per product_id over the comment columns that feed the summary.
+    Row hashes are computed for the whole frame in one go; each group's hash
+    keeps row order, since sample comments and the trend depend on it.
+    """
+    import pandas as pd
+
+    cols = [c for c in FINGERPRINT_COLUMNS if c in df.columns]
+    row_hashes = pd.util.hash_pandas_object(df[cols], index=False).to_numpy()
+    out = {}
+    for product_id, idx in sorted(df.groupby("product_id").indices.items()):
+        out[str(product_id)] = hashlib.blake2b(row_hashes[idx].tobytes(), digest_size=16).hexdigest()
+    return out
+
+
+def load_state(path: Path) -> dict:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def load_csv_by_product(path: Path) -> dict[str, dict]:
+    if not path.exists():
+        return {}
+    with path.open("r", encoding="utf-8", newline="") as f:
+        return {row["product_id"]: row for row in csv.DictReader(f)}
+
+
+def _atomic_write(path: Path, write):
+    tmp = path.with_name(path.name + ".tmp")
+    with tmp.open("w", encoding="utf-8", newline="") as f:
+        write(f)
+    os.replace(tmp, path)
+
+
+def write_csv(path: Path, fieldnames: list[str], rows: list[dict]):
+    def write(f):
+        writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+
+    _atomic_write(path, write)
+
+
+def write_state(path: Path, version: str, fingerprints: dict[str, str]):
+    _atomic_write(
+        path,
+        lambda f: json.dump({"version": version, "products": fingerprints}, f, indent=0, sort_keys=True),
+    )
+
+
+def load_weekly(path: Path) -> tuple[str | None, WeeklySeries]:
+    """(version, series) from comments_weekly.npz; (None, empty) if missing or unreadable."""
+    try:
+        with np.load(path) as data:
+            return str(data["version"]), WeeklySeries(
+                product_ids=data["product_ids"].tolist(),
+                offsets=data["offsets"],
+                **{col: data[col] for col in WeeklySeries.COLUMNS},
+            )
+    except (OSError, ValueError, KeyError):
+        return None, WeeklySeries.empty()
+
+
+def write_weekly(path: Path, version: str, series: WeeklySeries):
+    tmp = path.with_name(path.name + ".tmp")
+    with tmp.open("wb") as f:
+        np.savez(
+            f,
+            version=np.array(version),
+            product_ids=np.array(series.product_ids, dtype=str),
+            offsets=series.offsets,
+            issue_labels=np.array(list(ISSUE_KEYWORDS), dtype=str),
+            **{col: getattr(series, col) for col in WeeklySeries.COLUMNS},
+        )
+    os.replace(tmp, path)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Summarise comments_raw.csv per product")
+    parser.add_argument("--data-dir", type=Path, default=DATA_DIR,
+                        help="read comments_raw.csv from and write the outputs to this directory")
+    parser.add_argument("--full", action="store_true",
+                        help="recompute every product instead of only the changed ones")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="processes used to summarise product groups")
+    parser.add_argument("--rating-sentiment", action="store_true",
+                        help="label sentiment from the star rating even if a text model exists")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    comments_csv = args.data_dir / COMMENTS_CSV.name
+    summary_csv = args.data_dir / OUT_SUMMARY_CSV.name
+    state_json = args.data_dir / SUMMARY_STATE_JSON.name
+    weekly_npz = args.data_dir / OUT_WEEKLY_NPZ.name
+    duplicates_csv = args.data_dir / OUT_DUPLICATES_CSV.name
+    model_npz = args.data_dir / SENTIMENT_MODEL_NPZ.name
+
+    df = load_comments(comments_csv)
+    model = None if args.rating_sentiment else SentimentModel.load(model_npz)
+    if model is None and not args.rating_sentiment:
+        print(f"No sentiment model at {model_npz}; sentiment comes from ratings.")
+    version = summary_logic_version(model)
+    fingerprints = product_fingerprints(df)
+
+    state = load_state(state_json)
+    existing = load_csv_by_product(summary_csv)
+    existing_duplicates = load_csv_by_product(duplicates_csv)
+    weekly_version, weekly = load_weekly(weekly_npz)
+    if args.full or state.get("version") != version:
+        previous = {}
+    else:
+        previous = state.get("products") or {}
+    weekly_slices = weekly.product_slices() if weekly_version == version else {}
+
+    changed = {
+        pid for pid, fp in fingerprints.items()
+        if previous.get(pid) != fp
+        or pid not in existing
+        or pid not in weekly_slices
+        or pid not in existing_duplicates
+    }
+    removed = set(existing) - set(fingerprints)
+
+    if not changed and not removed:
+        print(f"No product comments changed; {summary_csv} is up to date.")
+        return
+
+    fresh = {}
+    fresh_duplicates = {}
+    fresh_weekly = WeeklySeries.empty()
+    if changed:
+        subset = df[df["product_id"].astype(str).isin(changed)].copy()
+
+        # reposts / copy-paste spam are counted once
+        cluster, duplicate = find_near_duplicates(subset["product_id"].astype(str), subset["body"])
+        fresh_duplicates = cluster_report(subset["product_id"].astype(str), cluster)
+        subset = subset[~duplicate]
+
+        if model is not None:
+            # only the changed products are scored
+            subset["sentiment"] = model.codes(subset["body"])
+        rows, fresh_weekly = summarize(subset, args.workers)
+        fresh = {str(row["product_id"]): row for row in rows}
+        fresh_weekly.product_ids = [str(pid) for pid in fresh_weekly.product_ids]
+
+    # Merge: unchanged products keep their stored row (and weekly buckets) verbatim.
+    merged = {pid: existing[pid] for pid in fingerprints if pid not in changed}
+    merged.update(fresh)
+    summaries = [merged[pid] for pid in fingerprints]
+
+    duplicates = {pid: existing_duplicates[pid] for pid in fingerprints if pid not in changed}
+    duplicates.update(fresh_duplicates)
+    duplicate_rows = [duplicates[pid] for pid in fingerprints]
+
+    kept = [pid for pid in fingerprints if pid not in changed]
+    weekly = concat_weekly([select_weekly(weekly, kept), fresh_weekly])
+    weekly = select_weekly(weekly, list(fingerprints))
+
     if not summaries:
         print("No rows to summarise.")
         return
 
-    fieldnames = list(summaries[0].keys())
-    with OUT_SUMMARY_CSV.open("w", encoding="utf-8", newline="") as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(summaries)
-
-    print(f"Saved {len(summaries)} product summaries to {OUT_SUMMARY_CSV}")
+    # Outputs first, then state: a crash in between only causes a recompute.
+    write_csv(summary_csv, SUMMARY_FIELDS, summaries)
+    write_csv(duplicates_csv, DUPLICATE_FIELDS, duplicate_rows)
+    write_weekly(weekly_npz, version, weekly)
+    write_state(state_json, version, fingerprints)
+
+    print(
+        f"Saved {len(summaries)} product summaries to {summary_csv} "
+        f"and {len(weekly.week)} weekly buckets to {weekly_npz} "
+        f"({len(fresh)} recomputed, {len(removed)} removed, "
+        f"{sum(int(r['duplicates']) for r in duplicate_rows)} near-duplicate comments skipped)"
+    )
 
 
 if __name__ == "__main__":
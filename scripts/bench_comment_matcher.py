@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark: compiled keyword matcher vs. the old per-keyword scan.
+
+    python scripts/bench_comment_matcher.py --rows 200000 --products 2000
+
+Reports the raw labelling throughput and the per-product label counting step
+of analyze_comments (old: two iterrows loops per product group).
+"""
+import argparse
+import random
+import time
+
+import pandas as pd
+
+from analyze_comments import (
+    ISSUE_KEYWORDS,
+    KEYWORD_MATCHER,
+    POSITIVE_KEYWORDS,
+    add_label_columns,
+)
+
+FILLER_WORDS = [
+    "خیلی", "خوب", "بود", "من", "این", "محصول", "رو", "خریدم", "و", "راضی",
+    "هستم", "رنگ", "سایز", "اندازه", "نسبت", "به", "واقعا", "پیشنهاد", "میکنم",
+    "ولی", "اصلا", "نبود", "دوست", "داشتم", "بچه", "ها", "جنس", "نرم", "بوی",
+    "ماندگاری", "زیبا", "همسرم", "هدیه", "گرفتم", "متوسط", "معمولی",
+]
+KEYWORDS = [w for kw in (ISSUE_KEYWORDS, POSITIVE_KEYWORDS) for ws in kw.values() for w in ws]
+
+
+def synthetic_comments(n: int, seed: int = 7) -> pd.Series:
+    rnd = random.Random(seed)
+    rows = []
+    for _ in range(n):
+        words = rnd.choices(FILLER_WORDS, k=rnd.randint(3, 30))
+        for _ in range(rnd.choice((0, 0, 1, 1, 2, 3))):
+            words.insert(rnd.randrange(len(words) + 1), rnd.choice(KEYWORDS))
+        rows.append(" ".join(words))
+    return pd.Series(rows)
+
+
+def legacy_scan(texts: pd.Series):
+    """The pre-matcher logic: `any(w in text)` for every label of both tables."""
+    out = []
+    for text in texts:
+        issues = {lbl for lbl, ws in ISSUE_KEYWORDS.items() if any(w in text for w in ws)}
+        highs = {lbl for lbl, ps in POSITIVE_KEYWORDS.items() if any(p in text for p in ps)}
+        out.append((issues, highs))
+    return out
+
+
+def legacy_group_counts(df: pd.DataFrame):
+    """Old analyze_comments loop: iterrows over every group, then again over the recent rows."""
+    out = {}
+    for product_id, g in df.groupby("product_id"):
+        issues, highs = {}, {}
+        for _, row in g.iterrows():
+            text = row["body"]
+            for lbl, ws in ISSUE_KEYWORDS.items():
+                if any(w in text for w in ws):
+                    issues[lbl] = issues.get(lbl, 0) + 1
+            for lbl, ps in POSITIVE_KEYWORDS.items():
+                if any(p in text for p in ps):
+                    highs[lbl] = highs.get(lbl, 0) + 1
+        for _, row in g.tail(5).iterrows():
+            if any(w in row["body"] for w in ISSUE_KEYWORDS["packaging"]):
+                break
+        out[product_id] = (issues, highs)
+    return out
+
+
+def vectorized_group_counts(df: pd.DataFrame):
+    add_label_columns(df)
+    cols = [c for c in df.columns if c.startswith(("issue_", "highlight_"))]
+    return df.groupby("product_id")[cols].sum()
+
+
+def _timed(fn, *args):
+    t0 = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    texts = synthetic_comments(args.rows, args.seed)
+    chars = int(texts.str.len().sum())
+    print(f"{args.rows:,} synthetic comments, {chars / 1e6:.1f}M chars")
+
+    print("-- labelling only")
+    for name, fn in (("legacy any(w in text)", legacy_scan), ("compiled matcher", KEYWORD_MATCHER.mask_column)):
+        secs = _timed(fn, texts)
+        print(f"{name:<24} {secs:8.3f}s  {args.rows / secs:12,.0f} comments/s")
+
+    rnd = random.Random(args.seed)
+    df = pd.DataFrame({
+        "product_id": [f"P{rnd.randrange(args.products):06d}" for _ in range(args.rows)],
+        "body": texts,
+    })
+    print(f"-- per-product label counts ({args.products:,} products)")
+    for name, fn in (("legacy iterrows", legacy_group_counts), ("vectorized", vectorized_group_counts)):
+        secs = _timed(fn, df.copy())
+        print(f"{name:<24} {secs:8.3f}s  {args.rows / secs:12,.0f} comments/s")
+
+
+if __name__ == "__main__":
+    main()
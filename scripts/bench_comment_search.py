@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Benchmark the comment search index on a synthetic corpus.
+
+    python scripts/bench_comment_search.py --rows 2000000 --products 20000
+
+Builds an index in a temporary directory, then times queries through the same
+CommentIndex class the /insights/comments/search/ endpoint uses.
+"""
+import argparse
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from bench_comment_matcher import synthetic_comments
+from index_comments import build_index
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from api.comment_search import CommentIndex  # noqa: E402
+
+QUERIES = ["بسته بندی", "packaging", "کیفیت", "ارسال سریع", "خوب", "quality delivery"]
+
+
+def synthetic_csv(path: Path, rows: int, products: int, seed: int):
+    rnd = random.Random(seed)
+    pd.DataFrame({
+        "product_id": [f"P{rnd.randrange(products):06d}" for _ in range(rows)],
+        "comment_id": range(rows),
+        "rating": [rnd.randint(1, 5) for _ in range(rows)],
+        "body": synthetic_comments(rows, seed),
+        "created_date": [f"2025-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}" for _ in range(rows)],
+    }).to_csv(path, index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--products", type=int, default=20_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        csv_path = tmp / "comments_raw.csv"
+        synthetic_csv(csv_path, args.rows, args.products, args.seed)
+
+        t0 = time.perf_counter()
+        n_docs, n_terms, n_postings = build_index(csv_path, tmp / "comment_index")
+        print(f"build: {n_docs:,} comments, {n_terms:,} terms, {n_postings:,} postings "
+              f"in {time.perf_counter() - t0:.1f}s")
+
+        t0 = time.perf_counter()
+        index = CommentIndex(tmp / "comment_index")
+        print(f"open:  {(time.perf_counter() - t0) * 1000:.1f} ms")
+
+        skus = list(index.products)[: args.repeat]
+        for q in QUERIES:
+            for scope, sku_list in (("one sku", skus), ("all", [None])):
+                t0 = time.perf_counter()
+                for sku in sku_list:
+                    docs, query = index.search(q, sku)
+                    page = [index.hit(int(d), query) for d in docs[:20]]
+                ms = (time.perf_counter() - t0) * 1000 / len(sku_list)
+                print(f"{q!r:<22} {scope:<8} {ms:8.2f} ms/query  ({len(docs):,} hits, {len(page)} on page)")
+
+
+if __name__ == "__main__":
+    main()
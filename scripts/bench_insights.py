@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the insight computations in api/views_insights.py.
+
+    python scripts/bench_insights.py --sizes 10000,1000000,10000000 --output bench.json
+    python scripts/bench_insights.py --sizes 1000000 --compare bench.json
+
+For every size a synthetic dataset is written with `manage.py generate_dataset`
+(kept under --datasets if given, so later runs reuse it). Each (size, mode)
+then runs in a fresh Python process pointed at that dataset through
+INSIGHTS_DATA_DIR:
+
+- dicts  DATASET_MMAP=0, sales as a list of dicts
+- mmap   DATASET_MMAP=1, sales as the memory-mapped column table
+
+Cases: _load_existing_data, _sales_by_product, _margin_for_product (every
+product), _compute_slow_movers (every product), the payload functions of
+revenue_forecast, restock_time, golden_times and speed_comparison for --skus
+SKUs, golden_times over all sales and classic_overview.
+
+"seconds" is the best of --repeat timed runs (whole-dataset cases on 1M+ rows
+run once). "peak MB" is the tracemalloc peak of one extra run, so it counts
+Python and numpy allocations but not mmap'd pages; "RSS MB" is the process
+high-water mark after the case. Dict mode is skipped above --max-dict-rows,
+where the list of dicts would not fit in memory. A case that kills its
+process (usually the OOM killer) is reported as failed and the remaining cases
+run in a new process.
+
+--output writes the results as JSON. --compare prints the ratio of each case
+to the same (size, mode, case) in an earlier JSON file.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+MODES = {"dicts": "0", "mmap": "1"}
+DAYS = 365
+CASES = [
+    "load_existing_data",
+    "sales_by_product",
+    "margin_for_product",
+    "compute_slow_movers",
+    "revenue_forecast",
+    "restock_time",
+    "golden_times",
+    "golden_times_all",
+    "speed_comparison",
+    "classic_overview",
+]
+# generate_dataset produces ~1.08 orders per unit of --sales-per-day (seasonality, peaks, trend, launches)
+ORDERS_PER_RATE = 1.08
+
+
+def _timed(fn, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def _peak_mb(fn) -> float:
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 2**20
+    finally:
+        tracemalloc.stop()
+
+
+def _emit(obj: dict):
+    print(json.dumps(obj), flush=True)
+
+
+def child(args):
+    sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
+    import django
+
+    django.setup()
+    from types import SimpleNamespace
+
+    import api.views_insights as vi
+
+    t0 = time.perf_counter()
+    vi._load_existing_data()  # mmap: builds data/dataset_cache once
+    first_load = time.perf_counter() - t0
+
+    data = vi._load_existing_data()
+    rows = len(data.sales)
+    _emit({"rows": rows, "products": len(data.products), "first_load_seconds": first_load})
+    heavy_repeat = 1 if rows >= 1_000_000 else args.repeat
+    profile = vi._settings_profile(SimpleNamespace(**vi.DEFAULT_SELLER_SETTINGS))
+    pids = [p["product_id"] for p in data.products]
+    step = max(1, len(pids) // args.skus)
+    skus = pids[::step][:args.skus]
+
+    def per_sku(payload):
+        return lambda: [payload(data, sku, profile) for sku in skus]
+
+    cases = {name: (calls, repeat, fn) for name, calls, repeat, fn in [
+        ("load_existing_data", 1, heavy_repeat, vi._load_existing_data),
+        ("sales_by_product", 1, heavy_repeat, lambda: vi._sales_by_product(data.sales)),
+        ("margin_for_product", len(data.products), args.repeat,
+         lambda: [vi._margin_for_product(p, profile["extra_cost_pct"]) for p in data.products]),
+        ("compute_slow_movers", 1, heavy_repeat, lambda: vi._compute_slow_movers(
+            data.products,
+            data.sales,
+            extra_cost_pct=profile["extra_cost_pct"],
+            min_weekly_sales=profile["slow_mover_min_speed"],
+            min_margin_pct=profile["slow_mover_min_margin"],
+        )),
+        ("revenue_forecast", len(skus), args.repeat, per_sku(vi._revenue_forecast_payload)),
+        ("restock_time", len(skus), args.repeat, per_sku(vi._restock_time_payload)),
+        ("golden_times", len(skus), args.repeat, per_sku(vi._golden_times_payload)),
+        ("golden_times_all", 1, heavy_repeat, lambda: vi._golden_times_payload(data, None, profile)),
+        ("speed_comparison", len(skus), args.repeat, per_sku(vi._speed_comparison_payload)),
+        ("classic_overview", 1, heavy_repeat, lambda: vi._classic_overview_payload(data, None, profile)),
+    ]}
+    for name in args.cases.split(","):
+        calls, repeat, fn = cases[name]
+        seconds = _timed(fn, repeat)
+        _emit({
+            "case": name,
+            "calls": calls,
+            "repeat": repeat,
+            "seconds": seconds,
+            "per_call_ms": seconds / calls * 1000,
+            "peak_mb": _peak_mb(fn),
+            "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        })
+
+
+def run_cases(env: dict, args, cases: list):
+    """(dataset info, case results); cases after a crashed one run in a fresh process."""
+    info, results = {}, []
+    remaining = list(cases)
+    while remaining:
+        cmd = [sys.executable, __file__, "--child", "--skus", str(args.skus),
+               "--repeat", str(args.repeat), "--cases", ",".join(remaining)]
+        with subprocess.Popen(cmd, env=env, stdout=subprocess.PIPE, text=True) as proc:
+            for line in proc.stdout:
+                r = json.loads(line)
+                if "case" in r:
+                    results.append(r)
+                    remaining.remove(r["case"])
+                else:
+                    info = r
+        if proc.returncode == 0 or not info:
+            if proc.returncode:
+                raise subprocess.CalledProcessError(proc.returncode, cmd)
+            break
+        results.append({"case": remaining.pop(0), "error": f"process died (exit {proc.returncode})"})
+    return info, results
+
+
+def ensure_dataset(root: Path, rows: int, seed: int) -> Path:
+    products = min(max(rows // 1000, 20), 20_000)
+    rate = rows / (products * DAYS * ORDERS_PER_RATE)
+    out = root / f"rows{rows}-seed{seed}"
+    if not (out / "sales.csv").exists():
+        t0 = time.perf_counter()
+        subprocess.run(
+            [sys.executable, str(BASE_DIR / "manage.py"), "generate_dataset", "--products", str(products),
+             "--days", str(DAYS), "--sales-per-day", f"{rate:.6f}", "--seed", str(seed), "--output", str(out)],
+            check=True, stdout=subprocess.DEVNULL,
+        )
+        print(f"generated {out.name} ({products:,} products) in {time.perf_counter() - t0:.1f}s")
+    return out
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR,
+                                capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    import numpy
+
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": numpy.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10000,1000000,10000000", help="target sales rows, comma-separated")
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--cases", default="", help="only these cases (comma-separated)")
+    parser.add_argument("--skus", type=int, default=50, help="SKUs for the per-SKU cases")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--max-dict-rows", type=int, default=2_000_000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--datasets", type=Path, default=None, help="keep generated datasets here")
+    parser.add_argument("--output", type=Path, default=None, help="write results as JSON")
+    parser.add_argument("--compare", type=Path, default=None, help="earlier --output file to compare with")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args)
+        return
+
+    baseline = {}
+    if args.compare:
+        for r in json.loads(args.compare.read_text())["results"]:
+            if "seconds" in r:
+                baseline[(r["target_rows"], r["mode"], r["case"])] = r["seconds"]
+
+    cases = args.cases.split(",") if args.cases else CASES
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        root = args.datasets or Path(tmp)
+        root.mkdir(parents=True, exist_ok=True)
+        for size in (int(s) for s in args.sizes.split(",")):
+            data_dir = ensure_dataset(root, size, args.seed)
+            for mode in args.modes.split(","):
+                if mode == "dicts" and size > args.max_dict_rows:
+                    print(f"\n{size:,} rows / dicts: skipped (above --max-dict-rows)")
+                    continue
+                env = {
+                    **os.environ,
+                    "INSIGHTS_DATA_DIR": str(data_dir),
+                    "DATASET_MMAP": MODES[mode],
+                }
+                r, case_results = run_cases(env, args, cases)
+
+                print(f"\n{r['rows']:,} rows, {r['products']:,} products / {mode} "
+                      f"(first load {r['first_load_seconds']:.1f}s)")
+                print(f"{'case':<22} {'calls':>6} {'seconds':>10} {'ms/call':>10} {'peak MB':>9} {'RSS MB':>8}"
+                      + (f" {'vs base':>8}" if baseline else ""))
+                for c in case_results:
+                    if "error" in c:
+                        print(f"{c['case']:<22} {c['error']}")
+                    else:
+                        line = (f"{c['case']:<22} {c['calls']:>6} {c['seconds']:10.4f} "
+                                f"{c['per_call_ms']:10.3f} {c['peak_mb']:9.1f} {c['rss_mb']:8.0f}")
+                        base = baseline.get((size, mode, c["case"]))
+                        if base:
+                            line += f" {c['seconds'] / base:7.2f}x"
+                        print(line)
+                    results.append({
+                        "target_rows": size,
+                        "rows": r["rows"],
+                        "products": r["products"],
+                        "mode": mode,
+                        **c,
+                    })
+
+    if args.output:
+        args.output.write_text(json.dumps({"environment": environment(), "results": results}, indent=2))
+        print(f"\nwrote {len(results)} results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
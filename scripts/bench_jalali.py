@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Benchmark Jalali date conversion on a synthetic created_at column.
+
+    python scripts/bench_jalali.py --rows 5000000
+
+Compares parse_jalali_dates (whole column) with converting row by row, and
+shows what pd.to_datetime makes of the same strings (all NaT).
+"""
+import argparse
+import random
+import time
+import warnings
+
+import pandas as pd
+
+from jalali import MONTHS, jalali_text_to_iso, parse_jalali_dates
+
+PERSIAN_DIGITS = str.maketrans("0123456789", "۰۱۲۳۴۵۶۷۸۹")
+
+
+def synthetic_dates(n: int, seed: int = 7) -> pd.Series:
+    """Mostly "26 آبان 1404"-style strings, some with Persian digits, some blank."""
+    rnd = random.Random(seed)
+    names = list(MONTHS)
+    distinct = []
+    for _ in range(5000):
+        text = f"{rnd.randint(1, 30)} {rnd.choice(names)} {rnd.randint(1390, 1405)}"
+        if rnd.random() < 0.2:
+            text = text.translate(PERSIAN_DIGITS)
+        distinct.append(text)
+    distinct.append(None)
+    return pd.Series(rnd.choices(distinct, k=n))
+
+
+def _timed(fn, *args):
+    t0 = time.perf_counter()
+    out = fn(*args)
+    return time.perf_counter() - t0, out
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=5_000_000)
+    parser.add_argument("--row-by-row-limit", type=int, default=500_000,
+                        help="row-by-row conversion is timed on at most this many rows")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    values = synthetic_dates(args.rows, args.seed)
+    print(f"{args.rows:,} created_at values")
+
+    secs, out = _timed(parse_jalali_dates, values)
+    print(f"{'parse_jalali_dates':<22} {secs:8.3f}s  {args.rows / secs:14,.0f} rows/s  ({int(out.isna().sum()):,} NaT)")
+
+    sample = values.iloc[: args.row_by_row_limit]
+    secs, _ = _timed(lambda v: [jalali_text_to_iso(x) for x in v], sample)
+    print(f"{'row by row':<22} {secs:8.3f}s  {len(sample) / secs:14,.0f} rows/s  (first {len(sample):,} rows)")
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        secs, out = _timed(lambda v: pd.to_datetime(v, errors="coerce"), sample)
+    print(f"{'pd.to_datetime':<22} {secs:8.3f}s  {len(sample) / secs:14,.0f} rows/s  ({int(out.isna().sum()):,} NaT)")
+
+
+if __name__ == "__main__":
+    main()
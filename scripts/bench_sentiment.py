@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Throughput of the hashed n-gram sentiment scorer.
+
+    python scripts/bench_sentiment.py --rows 1000000
+
+Uses the saved model when there is one, otherwise random weights (the cost
+of scoring does not depend on the weight values).
+"""
+import argparse
+import time
+
+import numpy as np
+
+from bench_comment_matcher import synthetic_comments
+from sentiment_model import HASH_BITS, SENTIMENT_MODEL_NPZ, SentimentModel, featurize
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    model = SentimentModel.load(SENTIMENT_MODEL_NPZ)
+    if model is None:
+        rng = np.random.default_rng(args.seed)
+        model = SentimentModel(weights=rng.normal(size=1 << HASH_BITS).astype(np.float32), bias=0.0)
+
+    texts = synthetic_comments(args.rows, args.seed).tolist()
+    print(f"{args.rows:,} synthetic comments")
+
+    t0 = time.perf_counter()
+    X = featurize(texts, model.hash_bits)
+    t1 = time.perf_counter()
+    X.dot(model.weights)
+    t2 = time.perf_counter()
+    codes = model.codes(texts)
+    t3 = time.perf_counter()
+
+    print(f"{'featurize':<22} {t1 - t0:8.3f}s  {args.rows / (t1 - t0):12,.0f} comments/s  ({X.indices.size:,} nonzeros)")
+    print(f"{'sparse mat-vec':<22} {t2 - t1:8.3f}s  {args.rows / (t2 - t1):12,.0f} comments/s")
+    print(f"{'codes (end to end)':<22} {t3 - t2:8.3f}s  {args.rows / (t3 - t2):12,.0f} comments/s  "
+          f"(pos/neu/neg {np.bincount(codes + 1, minlength=3)[::-1].tolist()})")
+
+
+if __name__ == "__main__":
+    main()
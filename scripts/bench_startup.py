@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Cold-start import cost of the API, measured with `python -X importtime`.
+
+    python scripts/bench_startup.py
+    python scripts/bench_startup.py --module api.views_insights --runs 5 --top 25
+    python scripts/bench_startup.py --budget-ms 900 --json startup.json
+
+Every run is a fresh interpreter that does what a worker does before its first
+request: `django.setup()` and import the URLconf (which imports every view).
+The dataset preload is opt-in (DATASET_WATCHER=1, set by gunicorn.conf.py),
+so it stays out of the measurement.
+
+"total" is the sum of the top-level cumulative import times reported by
+-X importtime (interpreter startup itself is not included), the best of
+--runs. The table lists the modules with the largest cumulative time,
+nested imports included, so one heavy dependency shows up as a single line.
+Modules in HEAVY_MODULES must not be imported at startup at all; they are
+reported separately and fail --budget-ms just like a slow total does.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+# loaded on first use only (card analysis, golden_times, comment scripts)
+HEAVY_MODULES = ("openai", "pandas")
+
+
+def parse_importtime(stderr: str) -> dict:
+    """-X importtime output → {"total_ms", "modules": {name: cumulative ms}}."""
+    total_us = 0
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _self_us, cumulative_us, name = line.split("|", 2)
+        cumulative_us = cumulative_us.strip()
+        if not cumulative_us.isdigit():
+            continue  # the header line
+        stripped = name.lstrip(" ")
+        if len(name) - len(stripped) == 1:  # not nested under another import
+            total_us += int(cumulative_us)
+        modules[stripped] = int(cumulative_us) / 1000
+    return {"total_ms": total_us / 1000, "modules": modules}
+
+
+def measure_once(module: str) -> dict:
+    code = f"import django; django.setup(); import {module}"
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE="backend.settings")
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(BASE_DIR), env.get("PYTHONPATH")]))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=BASE_DIR, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    return parse_importtime(proc.stderr)
+
+
+def measure(module: str = "api.urls", runs: int = 3) -> dict:
+    """Best of `runs` fresh processes, plus which HEAVY_MODULES got imported."""
+    results = [measure_once(module) for _ in range(runs)]
+    best = min(results, key=lambda r: r["total_ms"])
+    return {
+        "module": module,
+        "runs": runs,
+        "total_ms": round(best["total_ms"], 1),
+        "all_totals_ms": [round(r["total_ms"], 1) for r in results],
+        "heavy_imported": [m for m in HEAVY_MODULES if m in best["modules"]],
+        "modules": best["modules"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="api.urls", help="module to import after django.setup()")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=15, help="show this many slowest modules")
+    parser.add_argument("--budget-ms", type=float, default=None, help="exit 1 if the total is above this")
+    parser.add_argument("--json", default=None, help="write the results to this file")
+    args = parser.parse_args()
+
+    result = measure(args.module, args.runs)
+    print(f"django.setup() + import {args.module}: {result['total_ms']:.1f} ms "
+          f"(best of {args.runs}: {', '.join(f'{t:.0f}' for t in result['all_totals_ms'])})")
+    print(f"\n{'module':<50} {'cumulative ms':>14}")
+    slowest = sorted(result["modules"].items(), key=lambda kv: -kv[1])
+    for name, ms in slowest[:args.top]:
+        print(f"{name:<50} {ms:>14.1f}")
+    if result["heavy_imported"]:
+        print(f"\nheavy modules imported at startup: {', '.join(result['heavy_imported'])}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(result, indent=2) + "\n", encoding="utf-8")
+
+    if args.budget_ms is not None:
+        if result["total_ms"] > args.budget_ms:
+            print(f"\nover budget: {result['total_ms']:.1f} ms > {args.budget_ms:.1f} ms")
+            sys.exit(1)
+        if result["heavy_imported"]:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
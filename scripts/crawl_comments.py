@@ -1,10 +1,19 @@
 #!/usr/bin/env python3
+import argparse
+import asyncio
 import csv
+import json
+import os
 import re
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from urllib.parse import urlsplit
 
 import requests
+from requests.adapters import HTTPAdapter
+
+from jalali import jalali_text_to_iso
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 #DATA_DIR = "/Users/foadferdows/Desktop/project/ERD/Data"
@@ -13,6 +22,7 @@ DATA_DIR.mkdir(exist_ok=True)
 
 URL_CSV = DATA_DIR / "urls.csv"
 OUT_CSV = DATA_DIR / "comments_raw.csv"
+CHECKPOINT_JSON = DATA_DIR / "crawl_checkpoint.json"
 
 # Very light headers so we look like a browser
 HEADERS = {
@@ -24,6 +34,227 @@ HEADERS = {
 
 DIGIKALA_COMMENT_API = "https://api.digikala.com/v1/product/{pid}/comments/?page={page}"
 
+FIELDNAMES = [
+    "product_id",
+    "digikala_id",
+    "comment_id",
+    "rating",
+    "title",
+    "body",
+    "created_at",
+    "created_date",  # created_at converted to a Gregorian ISO date at ingest
+    "recommendation_status",
+    "likes",
+    "dislikes",
+]
+
+# Crawl tuning. The rate is what we allow ourselves per host (requests/second);
+# concurrency only decides how many products are in flight at the same time.
+DEFAULT_CONCURRENCY = 8
+DEFAULT_RATE_PER_HOST = 4.0
+DEFAULT_BURST = 4
+DEFAULT_MAX_PAGES = 10
+REQUEST_TIMEOUT = 15
+MAX_RETRIES = 3
+CHECKPOINT_INTERVAL = 5.0  # seconds between checkpoint flushes
+
+
+class TokenBucket:
+    """
+    Async token bucket: refills `rate` tokens per second up to `capacity`.
+    Waiters are served in arrival order because the lock is held while sleeping.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class HostRateLimiter:
+    """One token bucket per host, created on first use."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self._buckets: dict[str, TokenBucket] = {}
+
+    async def acquire(self, url: str):
+        host = urlsplit(url).netloc
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            bucket = self._buckets[host] = TokenBucket(self.rate, self.burst)
+        await bucket.acquire()
+
+
+class CommentWriter:
+    """
+    Streams rows to comments_raw.csv as pages arrive, skipping comment_ids
+    that are already stored.
+
+    In append mode new rows go to the end of the existing file (the header is
+    only written when the file is new). A file from before a column was added
+    (created_date) is first rewritten once with the missing columns, so new
+    rows don't silently lose them. Otherwise the file is truncated, but only
+    once the first row shows up, so an empty crawl leaves the previous output
+    untouched.
+    """
+
+    def __init__(self, path: Path, seen_ids: set[str] | None = None, append: bool = True):
+        self.path = path
+        self.seen_ids = seen_ids if seen_ids is not None else set()
+        self.append = append
+        self.count = 0
+        self._file = None
+        self._writer = None
+
+    def _migrate(self) -> list[str]:
+        """Header of the existing file, with any missing FIELDNAMES added to the file."""
+        with self.path.open("r", encoding="utf-8", newline="") as f:
+            reader = csv.DictReader(f)
+            fieldnames = list(reader.fieldnames or [])
+            missing = [name for name in FIELDNAMES if name not in fieldnames]
+            if not fieldnames or not missing:
+                return fieldnames or FIELDNAMES
+            tmp = self.path.with_name(self.path.name + ".tmp")
+            with tmp.open("w", encoding="utf-8", newline="") as out:
+                writer = csv.DictWriter(out, fieldnames=fieldnames + missing, extrasaction="ignore")
+                writer.writeheader()
+                for row in reader:
+                    if "created_date" in missing:
+                        row["created_date"] = jalali_text_to_iso(row.get("created_at"))
+                    writer.writerow(row)
+        os.replace(tmp, self.path)
+        print(f"Added column(s) {', '.join(missing)} to {self.path}")
+        return fieldnames + missing
+
+    def _open(self):
+        has_rows = self.append and self.path.exists() and self.path.stat().st_size > 0
+        fieldnames = self._migrate() if has_rows else FIELDNAMES
+        self._file = self.path.open("a" if has_rows else "w", encoding="utf-8", newline="")
+        self._writer = csv.DictWriter(self._file, fieldnames=fieldnames, extrasaction="ignore")
+        if not has_rows:
+            self._writer.writeheader()
+
+    def write_rows(self, rows) -> int:
+        new_rows = []
+        for row in rows:
+            cid = str(row.get("comment_id") or "")
+            if cid:
+                if cid in self.seen_ids:
+                    continue
+                self.seen_ids.add(cid)
+            new_rows.append(row)
+
+        if not new_rows:
+            return 0
+        if self._writer is None:
+            self._open()
+        self._writer.writerows(new_rows)
+        self._file.flush()
+        self.count += len(new_rows)
+        return len(new_rows)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+
+class CrawlCheckpoint:
+    """
+    Per-product progress of the current (unfinished) crawl, kept in
+    crawl_checkpoint.json:
+
+        {"mode": "full" | "incremental", "stored_rows": 5210,
+         "products": {"P003": {"last_page": 4, "done": false}}}
+
+    `stored_rows` is how many rows comments_raw.csv had when the run started.
+    Incremental runs stop paging at the first page whose comments are all
+    among those rows; counting only them keeps a resumed run from mistaking
+    its own fresh rows (the checkpoint can lag the file by a few pages) for
+    old ones. The file is removed once every product is done.
+    """
+
+    def __init__(self, path: Path, mode: str):
+        self.path = path
+        self.mode = mode
+        self.products: dict[str, dict] = {}
+        self.stored_rows = 0
+        self.resumed = False
+        self._dirty = False
+        self._last_save = 0.0
+
+        if path.exists():
+            try:
+                state = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError) as e:
+                print(f"[WARN] Ignoring unreadable checkpoint {path}: {e}")
+                state = {}
+            if state.get("mode") == mode:
+                self.products = state.get("products") or {}
+                self.stored_rows = state.get("stored_rows") or 0
+                self.resumed = True
+            elif state:
+                print(f"[WARN] Checkpoint is for a {state.get('mode')} crawl; starting a new {mode} crawl.")
+
+    def begin(self, product_ids, stored_rows: int):
+        """Start a new run: one entry per product, persisted right away."""
+        self.products = {}
+        self.stored_rows = stored_rows
+        for product_id in product_ids:
+            self.progress(product_id)
+        self._dirty = True
+        self.save(force=True)
+
+    def progress(self, product_id: str) -> dict:
+        return self.products.setdefault(product_id, {"last_page": 0, "done": False})
+
+    def mark_page(self, product_id: str, page: int):
+        self.progress(product_id)["last_page"] = page
+        self._dirty = True
+        self.save()
+
+    def mark_done(self, product_id: str):
+        self.progress(product_id)["done"] = True
+        self._dirty = True
+        self.save()
+
+    def save(self, force: bool = False):
+        if not self._dirty:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_save < CHECKPOINT_INTERVAL:
+            return
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        tmp.write_text(
+            json.dumps(
+                {"mode": self.mode, "stored_rows": self.stored_rows, "products": self.products},
+                ensure_ascii=False,
+            ),
+            encoding="utf-8",
+        )
+        os.replace(tmp, self.path)
+        self._dirty = False
+        self._last_save = now
+
+    def clear(self):
+        self.products = {}
+        self._dirty = False
+        self.path.unlink(missing_ok=True)
+
 
 def extract_numeric_id(product_url: str) -> str | None:
     """
@@ -45,81 +276,248 @@ def load_product_urls(path: Path):
             yield product_id.strip(), url.strip()
 
 
-def fetch_comments_for_product(product_id: str, product_url: str, max_pages: int = 10):
-    pid = extract_numeric_id(product_url)
-    if not pid:
-        print(f"[WARN] Could not detect numeric id in URL for {product_id}: {product_url}")
+def load_stored_comments(path: Path) -> list[str]:
+    """comment_id of every row in comments_raw.csv, in file order ("" if missing)."""
+    if not path.exists():
         return []
+    with path.open("r", encoding="utf-8", newline="") as f:
+        return [(row.get("comment_id") or "").strip() for row in csv.DictReader(f)]
+
+
+def make_session(pool_size: int) -> requests.Session:
+    """Shared session so TCP/TLS connections are reused across all products."""
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def extract_comments(payload: dict) -> list:
+    # Structure may change; try a few common patterns
+    data = payload.get("data") or {}
+    return (
+        data.get("comments")
+        or data.get("hits")
+        or data.get("items")
+        or []
+    )
+
+
+def comment_to_row(product_id: str, pid: str, c: dict) -> dict:
+    created_at = c.get("created_at") or c.get("created_at_dt")
+    return {
+        "product_id": product_id,
+        "digikala_id": pid,
+        "comment_id": c.get("id"),
+        "rating": c.get("rate") or c.get("score"),
+        "title": (c.get("title") or "").strip(),
+        "body": (c.get("body") or c.get("comment") or "").strip(),
+        "created_at": created_at,
+        "created_date": jalali_text_to_iso(created_at),
+        "recommendation_status": c.get("recommendation_status"),
+        "likes": c.get("likes"),
+        "dislikes": c.get("dislikes"),
+    }
+
+
+async def fetch_page(session: requests.Session, limiter: HostRateLimiter, api_url: str):
+    """
+    Fetch one comments page, honouring the per-host rate limit.
+    429/5xx responses are retried (respecting Retry-After); anything else
+    that isn't a 200 returns None so the caller stops paging.
+    """
+    for attempt in range(1, MAX_RETRIES + 1):
+        await limiter.acquire(api_url)
+        try:
+            resp = await asyncio.to_thread(session.get, api_url, timeout=REQUEST_TIMEOUT)
+        except requests.RequestException as e:
+            print(f"[WARN] request failed for {api_url}: {e}")
+            if attempt == MAX_RETRIES:
+                return None
+            await asyncio.sleep(attempt)
+            continue
+
+        if resp.status_code == 429 or resp.status_code >= 500:
+            if attempt == MAX_RETRIES:
+                print(f"[WARN] HTTP {resp.status_code} for {api_url} (giving up)")
+                return None
+            retry_after = resp.headers.get("Retry-After", "")
+            await asyncio.sleep(float(retry_after) if retry_after.isdigit() else attempt)
+            continue
 
-    all_comments = []
-    for page in range(1, max_pages + 1):
-        api_url = DIGIKALA_COMMENT_API.format(pid=pid, page=page)
-        resp = requests.get(api_url, headers=HEADERS, timeout=15)
         if resp.status_code != 200:
             print(f"[WARN] HTTP {resp.status_code} for {api_url}")
-            break
+            return None
 
         try:
-            payload = resp.json()
+            return resp.json()
         except Exception as e:
             print(f"[WARN] .json() failed for {api_url}: {e}")
-            break
+            return None
+    return None
 
-        # Structure may change; try a few common patterns
-        data = payload.get("data") or {}
-        comments = (
-            data.get("comments")
-            or data.get("hits")
-            or data.get("items")
-            or []
-        )
 
+async def crawl_product(
+    session: requests.Session,
+    limiter: HostRateLimiter,
+    writer: CommentWriter,
+    checkpoint: CrawlCheckpoint,
+    product_id: str,
+    product_url: str,
+    max_pages: int = DEFAULT_MAX_PAGES,
+    known_ids: set[str] | None = None,
+) -> int:
+    """
+    Page through one product's comments. With `known_ids` (incremental runs)
+    paging stops after the first page whose comments are all known. Known
+    comments are recognised by id, not by position or by comparing ids, so
+    the API's sort order doesn't matter and a late-approved comment with an
+    older id is still picked up.
+    """
+    pid = extract_numeric_id(product_url)
+    if not pid:
+        print(f"[WARN] Could not detect numeric id in URL for {product_id}: {product_url}")
+        checkpoint.mark_done(product_id)
+        return 0
+
+    progress = checkpoint.progress(product_id)
+
+    fetched = 0
+    for page in range(progress["last_page"] + 1, max_pages + 1):
+        api_url = DIGIKALA_COMMENT_API.format(pid=pid, page=page)
+        payload = await fetch_page(session, limiter, api_url)
+        if payload is None:
+            # leave the product unfinished so the next run picks it up here
+            return fetched
+
+        comments = extract_comments(payload)
         if not comments:
             break
 
-        for c in comments:
-            all_comments.append(
-                {
-                    "product_id": product_id,
-                    "digikala_id": pid,
-                    "comment_id": c.get("id"),
-                    "rating": c.get("rate") or c.get("score"),
-                    "title": (c.get("title") or "").strip(),
-                    "body": (c.get("body") or c.get("comment") or "").strip(),
-                    "created_at": c.get("created_at") or c.get("created_at_dt"),
-                    "recommendation_status": c.get("recommendation_status"),
-                    "likes": c.get("likes"),
-                    "dislikes": c.get("dislikes"),
-                }
-            )
-
-        # be nice to their servers
-        time.sleep(1.0)
-
-    return all_comments
-
-
-def main():
-    all_rows = []
-
-    for product_id, url in load_product_urls(URL_CSV):
-        print(f"Fetching comments for {product_id} ...")
-        comments = fetch_comments_for_product(product_id, url)
-        all_rows.extend(comments)
-
-    if not all_rows:
-        print("No comments fetched; nothing to write.")
-        return
+        rows = [comment_to_row(product_id, pid, c) for c in comments]
+        # the writer drops comment_ids it already has, so only new rows are written
+        fetched += writer.write_rows(rows)
+        checkpoint.mark_page(product_id, page)
+        if known_ids is not None and all(str(row["comment_id"] or "") in known_ids for row in rows):
+            break
+
+    checkpoint.mark_done(product_id)
+    return fetched
+
+
+async def crawl(
+    products,
+    out_path: Path = OUT_CSV,
+    checkpoint_path: Path = CHECKPOINT_JSON,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    rate: float = DEFAULT_RATE_PER_HOST,
+    burst: float = DEFAULT_BURST,
+    max_pages: int = DEFAULT_MAX_PAGES,
+    incremental: bool = False,
+    fresh: bool = False,
+) -> int:
+    """
+    Crawl all (product_id, url) pairs with `concurrency` workers.
+    Pages of a single product are fetched in order (we only learn the last
+    page when it comes back empty); products run in parallel.
+
+    - default:      resume from the checkpoint, append new comment_ids only
+    - incremental:  per product, stop at the first page with nothing new on it
+    - fresh:        ignore checkpoint and stored rows, rewrite the file
+    """
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=concurrency))
+
+    mode = "incremental" if incremental else "full"
+    if fresh:
+        checkpoint_path.unlink(missing_ok=True)
+        stored = []
+    else:
+        stored = load_stored_comments(out_path)
+
+    checkpoint = CrawlCheckpoint(checkpoint_path, mode)
+    if checkpoint.resumed:
+        print(f"Resuming {mode} crawl from {checkpoint_path}")
+    else:
+        checkpoint.begin([product_id for product_id, _ in products], stored_rows=len(stored))
+    # ids stored before this run started; rows a resumed run wrote itself don't count
+    known_ids = set(stored[:checkpoint.stored_rows]) - {""} if incremental else None
+
+    queue: asyncio.Queue = asyncio.Queue()
+    for product_id, url in products:
+        if not checkpoint.progress(product_id).get("done"):
+            queue.put_nowait((product_id, url))
+
+    limiter = HostRateLimiter(rate, burst)
+    writer = CommentWriter(out_path, set(stored) - {""}, append=not fresh)
+    session = make_session(concurrency)
+
+    async def worker():
+        while True:
+            try:
+                product_id, url = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            print(f"Fetching comments for {product_id} ...")
+            await crawl_product(session, limiter, writer, checkpoint, product_id, url, max_pages, known_ids)
 
-    fieldnames = list(all_rows[0].keys())
-    with OUT_CSV.open("w", encoding="utf-8", newline="") as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(all_rows)
+    try:
+        await asyncio.gather(*(worker() for _ in range(max(concurrency, 1))))
+    finally:
+        writer.close()
+        session.close()
+        checkpoint.save(force=True)
 
-    print(f"Saved {len(all_rows)} comments to {OUT_CSV}")
+    pending = [pid for pid, _ in products if not checkpoint.progress(pid).get("done")]
+    if pending:
+        print(f"[WARN] {len(pending)} products unfinished; rerun to resume from {checkpoint_path}")
+    else:
+        checkpoint.clear()
+    return writer.count
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Crawl Digikala comments into comments_raw.csv")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help="number of products crawled at the same time")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE_PER_HOST,
+                        help="max requests per second per host")
+    parser.add_argument("--burst", type=float, default=DEFAULT_BURST,
+                        help="token bucket size (requests allowed back-to-back)")
+    parser.add_argument("--max-pages", type=int, default=DEFAULT_MAX_PAGES,
+                        help="max comment pages per product")
+    parser.add_argument("--incremental", action="store_true",
+                        help="per product, stop at the first page with no new comments")
+    parser.add_argument("--fresh", action="store_true",
+                        help="ignore checkpoint and existing rows; rewrite comments_raw.csv")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    saved = asyncio.run(
+        crawl(
+            list(load_product_urls(URL_CSV)),
+            out_path=OUT_CSV,
+            checkpoint_path=CHECKPOINT_JSON,
+            concurrency=args.concurrency,
+            rate=args.rate,
+            burst=args.burst,
+            max_pages=args.max_pages,
+            incremental=args.incremental,
+            fresh=args.fresh,
+        )
+    )
+
+    if not saved:
+        print("No new comments fetched; nothing to write.")
+        return
+
+    print(f"Saved {saved} new comments to {OUT_CSV}")
 
 
 if __name__ == "__main__":
     main()
-
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Build the full-text search index over comments_raw.csv.
+
+    python scripts/index_comments.py [--data-dir DIR]
+
+Run after crawling (next to analyze_comments.py). The API's
+/insights/comments/search/ endpoint reads the result from <data dir>/comment_index, a symlink
+to the latest versioned build directory (comment_index.<n>/), where the data dir is INSIGHTS_DATA_DIR (default data/) unless --data-dir is given:
+
+- meta.json         format, doc count, product -> [start, end) doc range,
+                    label aliases ("packaging" -> its Persian keywords)
+- terms.txt         sorted vocabulary, one normalized token per line
+- term_offsets.npy  int64, postings of term i are postings[offsets[i]:offsets[i+1]]
+- postings.npy      int32 doc ids, ascending within every term
+- docs.npz          per doc: comment_id, date (days since 1970, -1 unknown), rating
+- bodies.bin        utf-8 comment bodies back to back; body_offsets in docs.npz
+
+Docs are numbered in (product_id, newest first) order, so every product owns a
+contiguous doc id range and a term's postings for one product are a slice of
+its (sorted) postings list that is already in date order.
+"""
+import argparse
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from analyze_comments import COMMENTS_CSV, DATA_DIR, ISSUE_KEYWORDS, POSITIVE_KEYWORDS, comment_dates
+from persian_text import TOKEN_RE, normalize_fa_column, tokenize
+
+INDEX_DIR = DATA_DIR / "comment_index"
+INDEX_FORMAT = 1
+TOKENIZE_CHUNK = 200_000
+
+
+def label_aliases() -> dict[str, list[list[str]]]:
+    """Label name -> token lists of its keywords, so "packaging" also finds "بسته بندی"."""
+    aliases: dict[str, list[list[str]]] = {}
+    for table in (ISSUE_KEYWORDS, POSITIVE_KEYWORDS):
+        for label, words in table.items():
+            alts = aliases.setdefault(label, [])
+            for w in words:
+                tokens = tokenize(w)
+                if tokens and tokens not in alts:
+                    alts.append(tokens)
+    return aliases
+
+
+def sort_docs(df: pd.DataFrame) -> pd.DataFrame:
+    """Product order, newest comment first; undated comments last, in file order."""
+    work = pd.DataFrame({
+        "product_id": df["product_id"],
+        "comment_id": pd.to_numeric(df.get("comment_id"), errors="coerce"),
+        "created": comment_dates(df),
+        "rating": pd.to_numeric(df.get("rating"), errors="coerce"),
+        "body": df["body"].fillna("").astype(str),
+    })
+    work = work[work["product_id"].notna()]
+    work["product_id"] = work["product_id"].astype(str)
+    work = work.sort_values(
+        ["product_id", "created"], ascending=[True, False], kind="stable", na_position="last"
+    )
+    return work.reset_index(drop=True)
+
+
+def build_postings(bodies: pd.Series, chunk_size: int = TOKENIZE_CHUNK) -> tuple[list[str], np.ndarray, np.ndarray]:
+    """
+    (sorted terms, term offsets, postings) for a column of bodies whose
+    position is the doc id.
+
+    Bodies are tokenized a chunk at a time (one regex pass per chunk) so only
+    one chunk's tokens exist as Python strings at once; each chunk is reduced
+    to unique (term id, doc id) pairs packed into int64 keys, and a final
+    sort of all keys groups the postings by term.
+    """
+    n_docs = len(bodies)
+    vocab: dict[str, int] = {}
+    parts = []
+    for start in range(0, n_docs, chunk_size):
+        chunk = bodies.iloc[start:start + chunk_size].reset_index(drop=True)
+        tokens = normalize_fa_column(chunk).str.lower().str.findall(TOKEN_RE).explode()
+        tokens = tokens[tokens.notna()]
+        if tokens.empty:
+            continue
+        codes, uniques = pd.factorize(tokens)
+        term_ids = np.fromiter((vocab.setdefault(t, len(vocab)) for t in uniques), dtype=np.int64, count=len(uniques))
+        docs = tokens.index.to_numpy(dtype=np.int64) + start
+        parts.append(np.unique(term_ids[codes] * n_docs + docs))
+
+    if not parts:
+        return [], np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.int32)
+
+    # renumber term ids in sorted term order (the API prefix-searches the vocabulary)
+    terms = sorted(vocab)
+    rank = np.empty(len(vocab), dtype=np.int64)
+    rank[np.fromiter((vocab[t] for t in terms), dtype=np.int64, count=len(terms))] = np.arange(len(terms))
+
+    keys = np.concatenate(parts)
+    del parts
+    term_ids = keys // n_docs
+    keys -= term_ids * n_docs
+    keys += rank[term_ids] * n_docs
+    del term_ids
+    keys.sort()
+    term_ids = keys // n_docs
+    postings = (keys - term_ids * n_docs).astype(np.int32)
+    offsets = np.searchsorted(term_ids, np.arange(len(terms) + 1)).astype(np.int64)
+    return terms, offsets, postings
+
+
+def product_ranges(product_ids: np.ndarray) -> dict[str, list[int]]:
+    if len(product_ids) == 0:
+        return {}
+    starts = np.flatnonzero(np.r_[True, product_ids[1:] != product_ids[:-1]])
+    ends = np.r_[starts[1:], len(product_ids)]
+    return {str(product_ids[s]): [int(s), int(e)] for s, e in zip(starts, ends)}
+
+
+def write_index(out_dir: Path, docs: pd.DataFrame):
+    terms, offsets, postings = build_postings(docs["body"])
+
+    encoded = [b.encode("utf-8") for b in docs["body"]]
+    body_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=body_offsets[1:])
+
+    days = docs["created"].to_numpy(dtype="datetime64[D]").astype(np.int64)
+    days[docs["created"].isna().to_numpy()] = -1
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    (out_dir / "terms.txt").write_text("\n".join(terms), encoding="utf-8")
+    np.save(out_dir / "term_offsets.npy", offsets)
+    np.save(out_dir / "postings.npy", postings)
+    np.savez(
+        out_dir / "docs.npz",
+        comment_id=docs["comment_id"].fillna(-1).to_numpy(dtype=np.int64),
+        date=days.astype(np.int32),
+        rating=docs["rating"].fillna(0).to_numpy(dtype=np.int8),
+        body_offsets=body_offsets,
+    )
+    with (out_dir / "bodies.bin").open("wb") as f:
+        f.writelines(encoded)
+    # meta.json last: the API reloads when it changes
+    (out_dir / "meta.json").write_text(
+        json.dumps({
+            "format": INDEX_FORMAT,
+            "built_at": int(time.time()),
+            "docs": len(docs),
+            "terms": len(terms),
+            "products": product_ranges(docs["product_id"].to_numpy()),
+            "aliases": label_aliases(),
+        }, ensure_ascii=False),
+        encoding="utf-8",
+    )
+    return len(terms), len(postings)
+
+
+def index_versions(index_dir: Path) -> list[Path]:
+    """Versioned build directories next to index_dir (<name>.<n>), oldest first."""
+    prefix = index_dir.name + "."
+    versions = []
+    for path in index_dir.parent.glob(prefix + "*"):
+        suffix = path.name[len(prefix):]
+        if suffix.isdigit() and path.is_dir() and not path.is_symlink():
+            versions.append((int(suffix), path))
+    return [path for _, path in sorted(versions)]
+
+
+def build_index(comments_csv: Path, index_dir: Path):
+    """
+    Build into a new versioned directory next to index_dir, then point the
+    index_dir symlink at it with a single os.replace, so a reader always sees
+    one complete build. The previous build is kept for readers still opening
+    it; older ones are removed.
+    """
+    df = pd.read_csv(comments_csv, dtype={"product_id": str})
+    docs = sort_docs(df)
+    del df
+
+    version = index_dir.with_name(f"{index_dir.name}.{time.time_ns()}")
+    n_terms, n_postings = write_index(version, docs)
+
+    if index_dir.is_dir() and not index_dir.is_symlink():
+        # index from before versioned builds: a directory cannot be replaced by
+        # a symlink, so move it aside once (the only moment without an index)
+        index_dir.rename(index_dir.with_name(index_dir.name + ".0"))
+    link = index_dir.with_name(index_dir.name + ".link")
+    link.unlink(missing_ok=True)
+    link.symlink_to(version.name, target_is_directory=True)
+    os.replace(link, index_dir)
+
+    for old in index_versions(index_dir)[:-2]:
+        shutil.rmtree(old, ignore_errors=True)
+    return len(docs), n_terms, n_postings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the comment search index")
+    parser.add_argument("--data-dir", type=Path, default=DATA_DIR,
+                        help="read comments_raw.csv from and write comment_index/ to this directory")
+    args = parser.parse_args(argv)
+    index_dir = args.data_dir / INDEX_DIR.name
+
+    t0 = time.perf_counter()
+    n_docs, n_terms, n_postings = build_index(args.data_dir / COMMENTS_CSV.name, index_dir)
+    print(
+        f"Indexed {n_docs:,} comments ({n_terms:,} terms, {n_postings:,} postings) "
+        f"into {index_dir} in {time.perf_counter() - t0:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
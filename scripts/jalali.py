@@ -0,0 +1,180 @@
+"""
+Jalali (Solar Hijri) -> Gregorian conversion for crawled comment dates.
+
+Digikala returns created_at as Persian text, e.g. "26 آبان 1404". pandas can't
+parse that, so we convert it ourselves:
+
+- jalali_to_gregorian(jy, jm, jd):  one date
+- jalali_text_to_iso(text):         one string -> "2025-11-17" (crawler, at ingest)
+- parse_jalali_dates(series):       a whole column -> datetime64 (analysis)
+- gregorian_to_jalali(d):           the other way, for synthetic data
+
+Conversion goes through a precomputed table of the Gregorian ordinal of
+1 Farvardin for every supported year, so a date is just
+`table[jy] + month_offset[jm] + jd - 1`. Days past the end of their month
+(31 Mehr, 30 Esfand of a common year) are rejected, not rolled over.
+"""
+import re
+from bisect import bisect_right
+from datetime import date
+
+try:
+    from persian_text import normalize_fa
+except ImportError:  # imported as scripts.jalali
+    from scripts.persian_text import normalize_fa
+
+# Breaks of the 2820-year cycle approximation (from jalaali-js).
+_BREAKS = [-61, 9, 38, 199, 426, 686, 756, 818, 1111, 1181, 1210, 1635,
+           2060, 2097, 2192, 2262, 2324, 2394, 2456, 3178]
+
+MIN_YEAR = 1200
+MAX_YEAR = 1600  # exclusive
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+MONTHS = {
+    "فروردین": 1,
+    "اردیبهشت": 2,
+    "خرداد": 3,
+    "تیر": 4,
+    "مرداد": 5,
+    "امرداد": 5,
+    "شهریور": 6,
+    "مهر": 7,
+    "آبان": 8,
+    "آذر": 9,
+    "دی": 10,
+    "بهمن": 11,
+    "اسفند": 12,
+}
+
+MONTH_NAMES = [None, "فروردین", "اردیبهشت", "خرداد", "تیر", "مرداد", "شهریور",
+               "مهر", "آبان", "آذر", "دی", "بهمن", "اسفند"]
+
+# days before the 1st of each month (index 1..12); months 1-6 have 31 days, 7-11 have 30
+MONTH_OFFSET = [0] + [31 * (m - 1) if m <= 7 else 186 + 30 * (m - 7) for m in range(1, 13)]
+
+# "26 آبان 1404" or a numeric "1404/08/26" / "1404-08-26"
+_DATE_RE = re.compile(
+    r"^\s*(?:(?P<d>\d{1,2})\s+(?P<mname>\S+)\s+(?P<y>\d{4})"
+    r"|(?P<ny>\d{4})[/-](?P<nm>\d{1,2})[/-](?P<nd>\d{1,2}))"
+)
+
+
+def _farvardin_first_march_day(jy: int) -> int:
+    """Day of March (Gregorian year jy + 621) on which 1 Farvardin jy falls."""
+    gy = jy + 621
+    leap_j = -14
+    jp = _BREAKS[0]
+    jump = 0
+    for jm in _BREAKS[1:]:
+        jump = jm - jp
+        if jy < jm:
+            break
+        leap_j += (jump // 33) * 8 + (jump % 33) // 4
+        jp = jm
+    n = jy - jp
+    leap_j += (n // 33) * 8 + ((n % 33) + 3) // 4
+    if jump % 33 == 4 and jump - n == 4:
+        leap_j += 1
+    leap_g = gy // 4 - ((gy // 100 + 1) * 3) // 4 - 150
+    return 20 + leap_j - leap_g
+
+
+# ordinal (date.toordinal) of 1 Farvardin, for MIN_YEAR <= jy <= MAX_YEAR
+# (one year past the range, so the length of the last supported year is known)
+FARVARDIN_FIRST = [
+    date(jy + 621, 3, 1).toordinal() + _farvardin_first_march_day(jy) - 1
+    for jy in range(MIN_YEAR, MAX_YEAR + 1)
+]
+
+
+def is_leap_year(jy: int) -> bool:
+    i = jy - MIN_YEAR
+    return FARVARDIN_FIRST[i + 1] - FARVARDIN_FIRST[i] == 366
+
+
+def month_length(jy: int, jm: int) -> int:
+    if jm <= 6:
+        return 31
+    if jm <= 11:
+        return 30
+    return 30 if is_leap_year(jy) else 29
+
+
+def _ordinal(jy: int, jm: int, jd: int) -> int | None:
+    if not (MIN_YEAR <= jy < MAX_YEAR and 1 <= jm <= 12 and 1 <= jd <= month_length(jy, jm)):
+        return None
+    return FARVARDIN_FIRST[jy - MIN_YEAR] + MONTH_OFFSET[jm] + jd - 1
+
+
+def jalali_to_gregorian(jy: int, jm: int, jd: int) -> date | None:
+    ordinal = _ordinal(jy, jm, jd)
+    return date.fromordinal(ordinal) if ordinal is not None else None
+
+
+def gregorian_to_jalali(d: date) -> tuple[int, int, int] | None:
+    """date(2025, 11, 17) -> (1404, 8, 26); None outside the supported years."""
+    ordinal = d.toordinal()
+    i = bisect_right(FARVARDIN_FIRST, ordinal) - 1
+    if i < 0 or i == len(FARVARDIN_FIRST) - 1:
+        return None
+    day = ordinal - FARVARDIN_FIRST[i]
+    if day < 186:
+        return MIN_YEAR + i, day // 31 + 1, day % 31 + 1
+    return MIN_YEAR + i, 7 + (day - 186) // 30, (day - 186) % 30 + 1
+
+
+def _parse_text(text) -> date | None:
+    m = _DATE_RE.match(normalize_fa(text))
+    if not m:
+        return None
+    if m.group("y"):
+        jy, jm, jd = int(m.group("y")), MONTHS.get(m.group("mname")), int(m.group("d"))
+    else:
+        jy, jm, jd = int(m.group("ny")), int(m.group("nm")), int(m.group("nd"))
+    if jm is None:
+        return None
+    if jy >= MAX_YEAR:
+        try:
+            return date(jy, jm, jd)
+        except ValueError:
+            return None
+    return jalali_to_gregorian(jy, jm, jd)
+
+
+def jalali_text_to_iso(text) -> str | None:
+    """
+    "26 آبان 1404" -> "2025-11-17". Numeric dates with a year >= MAX_YEAR are
+    assumed to be Gregorian already and returned as-is (date part only).
+    """
+    d = _parse_text(text)
+    return d.isoformat() if d else None
+
+
+def parse_jalali_dates(values):
+    """
+    Convert a whole column of Jalali date strings to datetime64[ns].
+
+    A comment column holds only a few thousand distinct dates, so the column
+    is factorized once (hash pass in C), each distinct string is parsed once,
+    and the result is gathered back with a single array take. Unparseable
+    values become NaT.
+    """
+    import numpy as np
+    import pandas as pd
+
+    values = pd.Series(values)
+    codes, uniques = pd.factorize(values)
+
+    nat = np.iinfo(np.int64).min
+    days = np.empty(len(uniques) + 1, dtype=np.int64)
+    for i, text in enumerate(uniques):
+        d = _parse_text(text)
+        days[i] = d.toordinal() - _EPOCH_ORDINAL if d else nat
+    days[-1] = nat  # factorize gives -1 for missing values
+
+    return pd.Series(
+        days[codes].astype("datetime64[D]").astype("datetime64[ns]"),
+        index=values.index,
+    )
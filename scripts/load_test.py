@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+"""
+Concurrent load test that replays InsightsDashboard sessions.
+
+    # against a running server (any of them)
+    gunicorn -c gunicorn.conf.py                               # WSGI
+    uvicorn backend.asgi:application --workers 4 --port 8001   # ASGI
+    python scripts/load_test.py --target http://localhost:8000/api --concurrency 32 --duration 60
+
+    # in-process, straight into backend.wsgi / backend.asgi (no server needed)
+    python scripts/load_test.py --target wsgi,asgi --concurrency 16 --duration 30
+
+Each virtual user loops over dashboard sessions, one request at a time, with
+--think-ms between requests. A session does what pages/InsightsDashboard.tsx
+and pages/Settings.tsx do:
+
+1. POST auth/seller/login/ with FAKE_SELLER_TOKEN
+2. GET insights/products/ and settings/
+3. for --skus-per-session random SKUs: the nine per-SKU cards (profit margin,
+   slow movers, breakeven, golden times, revenue forecast, discount
+   competition, restock time, speed compare, comment analysis)
+4. GET insights/classic-overview/
+5. POST settings/ in --settings-update-rate of the sessions
+
+In-process targets call the WSGI callable from a thread per virtual user and
+the ASGI callable from an asyncio task per virtual user, so the two Django
+handlers can be compared on the same box without a server. The http target
+uses one keep-alive connection per virtual user.
+
+The report has, per endpoint, requests, errors (exceptions and non-2xx), req/s
+and latency percentiles. --json writes the same numbers.
+"""
+import argparse
+import asyncio
+import io
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+import warnings
+from collections import defaultdict
+from pathlib import Path
+from urllib.parse import urlsplit
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+FAKE_SELLER_TOKEN = "FAKE_SELLER_TOKEN"
+SKU_CARDS = [
+    "insights/profit-margin/",
+    "insights/slow-movers/",
+    "insights/breakeven/",
+    "insights/golden-times/",
+    "insights/revenue-forecast/",
+    "insights/discount-competition/",
+    "insights/restock-time/",
+    "insights/speed-compare/",
+    "insights/comment-analysis/",
+]
+
+
+def dashboard_session(rng: random.Random, args):
+    """
+    Yields (method, path, body, label) and receives (status, data) back, so the
+    same session runs under the threaded and the asyncio drivers.
+    """
+    status, data = yield "POST", "auth/seller/login/", {"seller_token": FAKE_SELLER_TOKEN}, "auth/seller/login/"
+    if status != 200:
+        return
+    token = data["access"]
+
+    status, products = yield "GET", "insights/products/", token, "insights/products/"
+    yield "GET", "settings/", token, "settings/"
+    skus = [p["product_id"] for p in products or [] if p.get("product_id")] if status == 200 else []
+
+    for sku in rng.sample(skus, min(args.skus_per_session, len(skus))):
+        for card in SKU_CARDS:
+            yield "GET", f"{card}?sku={sku}", token, card
+    yield "GET", "insights/classic-overview/", token, "insights/classic-overview/"
+
+    if rng.random() < args.settings_update_rate:
+        body = {"extra_cost_pct": rng.choice([3.0, 5.0, 10.0]), "slow_mover_min_speed": rng.choice([1, 3, 5])}
+        yield "POST", "settings/", (token, body), "settings/ (POST)"
+
+
+def _split_auth(method: str, payload):
+    """(token, body) from what the session yielded."""
+    if method == "GET":
+        return payload, None
+    if isinstance(payload, tuple):
+        return payload
+    return None, payload
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.error_samples = {}
+        self.sessions = 0
+
+    def record(self, label: str, seconds: float, status, error: str = ""):
+        with self.lock:
+            self.latencies[label].append(seconds * 1000)
+            if error or not (200 <= status < 300):
+                self.errors[label] += 1
+                self.error_samples.setdefault(label, error or f"HTTP {status}")
+
+    def report(self, name: str, elapsed: float, concurrency: int) -> dict:
+        def pct(values, p):
+            return values[max(0, math.ceil(p / 100 * len(values)) - 1)] if values else 0.0
+
+        endpoints = {}
+        for label in sorted(self.latencies):
+            values = sorted(self.latencies[label])
+            endpoints[label] = {
+                "requests": len(values),
+                "errors": self.errors[label],
+                "error_rate": self.errors[label] / len(values),
+                "rps": len(values) / elapsed,
+                "p50_ms": pct(values, 50),
+                "p90_ms": pct(values, 90),
+                "p99_ms": pct(values, 99),
+                "max_ms": values[-1],
+            }
+        total = sum(e["requests"] for e in endpoints.values())
+        errors = sum(e["errors"] for e in endpoints.values())
+        all_values = sorted(v for values in self.latencies.values() for v in values)
+
+        print(f"\n== {name}: {concurrency} virtual users, {elapsed:.1f}s")
+        print(f"{total:,} requests, {total / elapsed:,.1f} req/s, {self.sessions / elapsed:,.2f} sessions/s, "
+              f"{errors:,} errors ({errors / max(total, 1):.2%}), "
+              f"p50 {pct(all_values, 50):.1f}ms p99 {pct(all_values, 99):.1f}ms")
+        print(f"{'endpoint':<32} {'reqs':>7} {'err %':>7} {'req/s':>8} {'p50':>8} {'p90':>8} {'p99':>8} {'max':>8}")
+        for label, e in endpoints.items():
+            print(f"{label:<32} {e['requests']:>7,} {e['error_rate']:7.2%} {e['rps']:8.1f} "
+                  f"{e['p50_ms']:8.1f} {e['p90_ms']:8.1f} {e['p99_ms']:8.1f} {e['max_ms']:8.1f}")
+        for label, sample in self.error_samples.items():
+            print(f"  first error on {label}: {sample}")
+        return {
+            "target": name,
+            "concurrency": concurrency,
+            "seconds": elapsed,
+            "requests": total,
+            "errors": errors,
+            "rps": total / elapsed,
+            "sessions": self.sessions,
+            "endpoints": endpoints,
+        }
+
+
+# ---------- transports ----------
+
+class HttpTransport:
+    def __init__(self, base_url: str):
+        import requests
+
+        self.base_url = base_url.rstrip("/") + "/"
+        self.session = requests.Session()
+
+    def __call__(self, method: str, path: str, token, body):
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        r = self.session.request(method, self.base_url + path, json=body, headers=headers, timeout=60)
+        try:
+            data = r.json()
+        except ValueError:
+            data = None
+        return r.status_code, data
+
+
+def _environ(method: str, path: str, token, body, prefix: str) -> dict:
+    url = urlsplit(f"{prefix}{path}")
+    raw = json.dumps(body).encode() if body is not None else b""
+    environ = {
+        "REQUEST_METHOD": method,
+        "PATH_INFO": url.path,
+        "QUERY_STRING": url.query,
+        "SERVER_NAME": "localhost",
+        "SERVER_PORT": "80",
+        "SERVER_PROTOCOL": "HTTP/1.1",
+        "HTTP_HOST": "localhost",
+        "CONTENT_TYPE": "application/json",
+        "CONTENT_LENGTH": str(len(raw)),
+        "wsgi.input": io.BytesIO(raw),
+        "wsgi.errors": sys.stderr,
+        "wsgi.url_scheme": "http",
+        "wsgi.version": (1, 0),
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    if token:
+        environ["HTTP_AUTHORIZATION"] = f"Bearer {token}"
+    return environ
+
+
+class WsgiTransport:
+    def __init__(self, application, prefix: str):
+        self.application = application
+        self.prefix = prefix
+
+    def __call__(self, method: str, path: str, token, body):
+        status = []
+        chunks = self.application(_environ(method, path, token, body, self.prefix),
+                                  lambda s, headers, exc_info=None: status.append(int(s.split()[0])))
+        try:
+            raw = b"".join(chunks)
+        finally:
+            if hasattr(chunks, "close"):
+                chunks.close()
+        return status[0], _json_or_none(raw)
+
+
+class AsgiTransport:
+    def __init__(self, application, prefix: str):
+        self.application = application
+        self.prefix = prefix
+
+    async def __call__(self, method: str, path: str, token, body):
+        url = urlsplit(f"{self.prefix}{path}")
+        raw = json.dumps(body).encode() if body is not None else b""
+        headers = [(b"host", b"localhost"), (b"content-type", b"application/json"),
+                   (b"content-length", str(len(raw)).encode())]
+        if token:
+            headers.append((b"authorization", f"Bearer {token}".encode()))
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": url.path,
+            "raw_path": url.path.encode(),
+            "query_string": url.query.encode(),
+            "root_path": "",
+            "headers": headers,
+            "client": ("127.0.0.1", 50000),
+            "server": ("localhost", 80),
+        }
+        sent = False
+        response = {"status": 500, "body": []}
+
+        async def receive():
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {"type": "http.request", "body": raw, "more_body": False}
+            await asyncio.Event().wait()  # no more body; wait until the handler is done
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                response["body"].append(message.get("body", b""))
+
+        await self.application(scope, receive, send)
+        return response["status"], _json_or_none(b"".join(response["body"]))
+
+
+def _json_or_none(raw: bytes):
+    try:
+        return json.loads(raw)
+    except ValueError:
+        return None
+
+
+# ---------- drivers ----------
+
+def _describe(exc: Exception) -> str:
+    return f"{type(exc).__name__}: {exc}"[:200]
+
+
+def run_threads(make_transport, args, stats: Stats) -> float:
+    deadline = time.perf_counter() + args.duration
+
+    def user(i: int):
+        rng = random.Random(args.seed * 1000 + i)
+        transport = make_transport()
+        while time.perf_counter() < deadline:
+            session = dashboard_session(rng, args)
+            response = None
+            try:
+                while time.perf_counter() < deadline:
+                    method, path, payload, label = session.send(response)
+                    token, body = _split_auth(method, payload)
+                    t0 = time.perf_counter()
+                    try:
+                        response = transport(method, path, token, body)
+                        stats.record(label, time.perf_counter() - t0, response[0])
+                    except Exception as exc:
+                        stats.record(label, time.perf_counter() - t0, 0, _describe(exc))
+                        response = (0, None)
+                    if args.think_ms:
+                        time.sleep(args.think_ms / 1000)
+            except StopIteration:
+                with stats.lock:
+                    stats.sessions += 1
+
+    t0 = time.perf_counter()
+    threads = [threading.Thread(target=user, args=(i,), daemon=True) for i in range(args.concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - t0
+
+
+def run_asyncio(transport: AsgiTransport, args, stats: Stats) -> float:
+    async def user(i: int, deadline: float):
+        rng = random.Random(args.seed * 1000 + i)
+        while time.perf_counter() < deadline:
+            session = dashboard_session(rng, args)
+            response = None
+            try:
+                while time.perf_counter() < deadline:
+                    method, path, payload, label = session.send(response)
+                    token, body = _split_auth(method, payload)
+                    t0 = time.perf_counter()
+                    try:
+                        response = await transport(method, path, token, body)
+                        stats.record(label, time.perf_counter() - t0, response[0])
+                    except Exception as exc:
+                        stats.record(label, time.perf_counter() - t0, 0, _describe(exc))
+                        response = (0, None)
+                    if args.think_ms:
+                        await asyncio.sleep(args.think_ms / 1000)
+            except StopIteration:
+                stats.sessions += 1
+
+    async def main():
+        deadline = time.perf_counter() + args.duration
+        await asyncio.gather(*(user(i, deadline) for i in range(args.concurrency)))
+
+    t0 = time.perf_counter()
+    asyncio.run(main())
+    return time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--target", default="wsgi,asgi",
+                        help="comma-separated: wsgi, asgi (in-process) and/or http(s)://host:port/api URLs")
+    parser.add_argument("--concurrency", type=int, default=16, help="virtual users")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds per target")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="pause between a user's requests")
+    parser.add_argument("--skus-per-session", type=int, default=2)
+    parser.add_argument("--settings-update-rate", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", type=Path, default=None, help="write results as JSON")
+    args = parser.parse_args()
+    warnings.filterwarnings("ignore", module="jwt")  # dev SECRET_KEY, once per request
+
+    results = []
+    for target in args.target.split(","):
+        stats = Stats()
+        if target in ("wsgi", "asgi"):
+            sys.path.insert(0, str(BASE_DIR))
+            os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
+            if target == "wsgi":
+                from backend.wsgi import application
+
+                elapsed = run_threads(lambda: WsgiTransport(application, "/api/"), args, stats)
+            else:
+                from backend.asgi import application
+
+                elapsed = run_asyncio(AsgiTransport(application, "/api/"), args, stats)
+        else:
+            elapsed = run_threads(lambda: HttpTransport(target), args, stats)
+        results.append(stats.report(target, elapsed, args.concurrency))
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+        print(f"\nwrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Per-worker memory of the insights dataset under a pre-forking server.
+
+    python scripts/measure_worker_rss.py --sales 2000000 --products 5000 --workers 4
+
+Writes a synthetic dataset to a temporary directory (or uses --data-dir),
+then for each mode starts a fresh Python process that forks --workers
+children the way gunicorn does, has every child compute the insights for
+--skus SKUs plus the full-scan ones (classic overview, all-SKU golden times),
+and reads /proc/self/smaps_rollup in every child while all of them are
+alive:
+
+- per-worker     DATASET_MMAP=0, no preload: each worker parses the CSVs
+- preload-dicts  DATASET_MMAP=0, parsed once in the master, gc.freeze(), fork
+- preload-mmap   DATASET_MMAP=1, sales as mmap'd columns (gunicorn.conf.py)
+
+"worker s" is the per-worker time for the workload, including the CSV parse
+in per-worker mode.
+
+RSS counts shared pages in full; PSS splits them between the processes that
+map them; USS (private) is what each extra worker really costs. Linux only.
+"""
+import argparse
+import csv
+import gc
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+MODES = {
+    "per-worker": {"DATASET_MMAP": "0", "preload": False},
+    "preload-dicts": {"DATASET_MMAP": "0", "preload": True},
+    "preload-mmap": {"DATASET_MMAP": "1", "preload": True},
+}
+
+
+def write_dataset(out: Path, n_sales: int, n_products: int, seed: int):
+    rnd = random.Random(seed)
+    pids = [f"P{i:06d}" for i in range(n_products)]
+    categories = ["Fashion", "Home", "Digital", "Beauty", "Toys", "Sports"]
+    prices = {pid: round(rnd.uniform(50, 5000), 2) for pid in pids}
+
+    with (out / "products.csv").open("w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["product_id", "title", "category", "brand", "cost_price", "selling_price", "stock"])
+        for pid in pids:
+            price = prices[pid]
+            w.writerow([pid, f"Product {pid}", rnd.choice(categories), f"Brand {rnd.randint(1, 50)}",
+                        round(price * rnd.uniform(0.5, 0.9), 2), price, rnd.randint(0, 500)])
+    with (out / "inventory.csv").open("w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["product_id", "current_stock", "last_restock_date", "restock_quantity"])
+        for pid in pids:
+            w.writerow([pid, rnd.randint(0, 500), "2025-10-01", rnd.randint(10, 100)])
+    with (out / "pricing.csv").open("w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["product_id", "your_price", "your_discount_pct", "competitor_min_price",
+                    "competitor_avg_price", "competitor_max_price"])
+        for pid in pids:
+            p = prices[pid]
+            w.writerow([pid, p, rnd.choice([0, 5, 10]), round(p * 0.95, 2), round(p * 1.05, 2), round(p * 1.2, 2)])
+    with (out / "restocks.csv").open("w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["product_id", "typical_restock_delay_days", "supplier_lead_time_days"])
+        for pid in pids:
+            w.writerow([pid, rnd.randint(2, 20), rnd.randint(3, 30)])
+
+    start = date(2024, 1, 1)
+    with (out / "sales.csv").open("w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["sale_id", "product_id", "sale_date", "quantity", "final_price"])
+        for i in range(n_sales):
+            pid = pids[rnd.randrange(n_products)]
+            d = start + timedelta(days=rnd.randrange(640))
+            w.writerow([f"S{i}", pid, d.isoformat(), rnd.randint(1, 5), round(prices[pid] * rnd.uniform(0.9, 1.1), 2)])
+
+
+def memory_kb() -> dict:
+    stats = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[1].isdigit():
+                stats[parts[0].rstrip(":")] = int(parts[1])
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                stats["VmHWM"] = int(line.split()[1])
+    return {
+        "rss": stats["Rss"],
+        "pss": stats["Pss"],
+        "uss": stats.get("Private_Clean", 0) + stats.get("Private_Dirty", 0),
+        "peak": stats["VmHWM"],
+    }
+
+
+def workload(n_skus: int):
+    from api.views_insights import INSIGHTS, _dataset_watcher, _settings_profile, DEFAULT_SELLER_SETTINGS
+    from types import SimpleNamespace
+
+    data = _dataset_watcher.current().data
+    profile = _settings_profile(SimpleNamespace(**DEFAULT_SELLER_SETTINGS))
+    skus = [p["product_id"] for p in data.products][:n_skus]
+    for name, spec in INSIGHTS.items():
+        targets = [None] if spec.sku is None else ([None] if spec.sku == "optional" else []) + skus
+        for sku in targets:
+            try:
+                spec.compute(data, sku, profile)
+            except Exception:
+                pass
+
+
+def child(mode: str, workers: int, n_skus: int):
+    import django
+
+    sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
+    django.setup()
+    from api.views_insights import _dataset_watcher
+
+    t0 = time.perf_counter()
+    if MODES[mode]["preload"]:
+        _dataset_watcher.preload()
+        gc.freeze()
+    master_load = time.perf_counter() - t0
+
+    go_r, go_w = os.pipe()
+    results_r, results_w = os.pipe()
+    ready_r, ready_w = os.pipe()
+    pids = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            os.close(go_w)
+            t = time.perf_counter()
+            workload(n_skus)
+            elapsed = time.perf_counter() - t
+            os.write(ready_w, b".")
+            os.read(go_r, 1)  # measure only once every worker has done its work
+            line = json.dumps({**memory_kb(), "seconds": elapsed}) + "\n"
+            os.write(results_w, line.encode())
+            os._exit(0)
+        pids.append(pid)
+
+    os.close(results_w)
+    os.close(ready_w)
+    for _ in range(workers):
+        os.read(ready_r, 1)
+    master = memory_kb()
+    os.close(go_w)
+    with os.fdopen(results_r) as f:
+        workers_stats = [json.loads(line) for line in f]
+    for pid in pids:
+        os.waitpid(pid, 0)
+    print(json.dumps({"master": master, "master_load": master_load, "workers": workers_stats}))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sales", type=int, default=2_000_000)
+    parser.add_argument("--products", type=int, default=5_000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--skus", type=int, default=200, help="SKUs each worker computes insights for")
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--data-dir", type=Path, default=None, help="use existing CSVs instead of synthetic ones")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--child", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.workers, args.skus)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = args.data_dir
+        if data_dir is None:
+            data_dir = Path(tmp)
+            t0 = time.perf_counter()
+            write_dataset(data_dir, args.sales, args.products, args.seed)
+            print(f"synthetic dataset: {args.sales:,} sales, {args.products:,} products "
+                  f"({time.perf_counter() - t0:.1f}s)")
+        size_mb = (data_dir / "sales.csv").stat().st_size / 2**20
+        print(f"sales.csv {size_mb:.0f} MiB, {args.workers} workers, {args.skus} SKUs per worker\n")
+        print(f"{'mode':<15} {'master s':>8} {'worker s':>8} {'master RSS':>11} {'worker RSS':>11} "
+              f"{'PSS':>9} {'USS':>9} {'peak':>9} {'total PSS':>10}")
+
+        for mode in args.modes.split(","):
+            env = {
+                **os.environ,
+                "INSIGHTS_DATA_DIR": str(data_dir),
+                "DATASET_MMAP": MODES[mode]["DATASET_MMAP"],
+            }
+            out = subprocess.run(
+                [sys.executable, __file__, "--child", mode, "--workers", str(args.workers), "--skus", str(args.skus)],
+                env=env, check=True, capture_output=True, text=True,
+            ).stdout
+            r = json.loads(out.strip().splitlines()[-1])
+            w = r["workers"]
+            mean = {k: sum(x[k] for x in w) / len(w) / 1024 for k in ("rss", "pss", "uss", "peak")}
+            work = sum(x["seconds"] for x in w) / len(w)
+            total = (r["master"]["pss"] + sum(x["pss"] for x in w)) / 1024
+            print(f"{mode:<15} {r['master_load']:8.1f} {work:8.1f} {r['master']['rss'] / 1024:9.0f}MB {mean['rss']:9.0f}MB "
+                  f"{mean['pss']:7.0f}MB {mean['uss']:7.0f}MB {mean['peak']:7.0f}MB {total:8.0f}MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Near-duplicate comments (reposts, copy-pasted spam) via MinHash + LSH.
+
+- minhash_signatures(texts): NUM_PERM MinHash values per comment over its
+                             word-bigram shingles
+- find_near_duplicates(product_ids, texts): cluster id per comment and which
+                             comments are repeats of an earlier one
+
+Comparisons stay within a product: LSH buckets are keyed by (product, band),
+so a product's clusters only depend on that product's comments and the
+incremental rebuild in analyze_comments.py can treat them like its summary.
+Candidates from a shared bucket are confirmed by signature agreement, and
+clusters are the connected components of the confirmed pairs. Everything is
+sorting and array ops, so the cost grows about linearly with the corpus.
+
+Very short comments ("عالی بود") are never flagged: many different people
+write exactly that, it is not spam.
+"""
+import numpy as np
+
+from sentiment_model import token_hashes
+
+NUM_PERM = 64
+BANDS = 8  # of NUM_PERM // BANDS rows: pairs at 0.85 Jaccard become candidates ~90% of the time
+SIMILARITY_THRESHOLD = 0.7  # share of equal MinHash values (~ Jaccard) to count as a duplicate
+MIN_TOKENS = 5
+SIGNATURE_CHUNK = 10_000
+
+_rng = np.random.default_rng(20240611)
+_PERM_A = _rng.integers(1, 2**63, size=NUM_PERM, dtype=np.uint64) | np.uint64(1)
+_PERM_B = _rng.integers(0, 2**63, size=NUM_PERM, dtype=np.uint64)
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+_EMPTY = np.iinfo(np.uint32).max
+
+
+def _signature_chunk(texts: list) -> tuple[np.ndarray, np.ndarray]:
+    n_docs = len(texts)
+    docs, hashes = token_hashes(texts)
+    n_tokens = np.bincount(docs, minlength=n_docs)
+
+    # bigrams only: single common words ("خیلی", "خوب") would dominate the minimums
+    same_doc = docs[1:] == docs[:-1]
+    shingle_docs = docs[:-1][same_doc]
+    shingles = hashes[:-1][same_doc] * _MIX + hashes[1:][same_doc]
+
+    sig = np.full((NUM_PERM, n_docs), _EMPTY, dtype=np.uint32)
+    if len(shingles):
+        starts = np.flatnonzero(np.r_[True, shingle_docs[1:] != shingle_docs[:-1]])
+        owners = shingle_docs[starts]
+        values = np.empty_like(shingles)
+        for k in range(NUM_PERM):
+            # universal hashing: (a * x + b) mod 2**64, top 32 bits
+            np.multiply(shingles, _PERM_A[k], out=values)
+            values += _PERM_B[k]
+            values >>= np.uint64(32)
+            sig[k, owners] = np.minimum.reduceat(values, starts)
+    return sig.T, n_tokens
+
+
+def minhash_signatures(texts, chunk_size: int = SIGNATURE_CHUNK) -> tuple[np.ndarray, np.ndarray]:
+    """(uint32 signatures of shape (n, NUM_PERM), token count per text)."""
+    texts = list(texts)
+    parts = [_signature_chunk(texts[i:i + chunk_size]) for i in range(0, len(texts), chunk_size)]
+    if not parts:
+        return np.zeros((0, NUM_PERM), dtype=np.uint32), np.zeros(0, dtype=np.int64)
+    return np.concatenate([p[0] for p in parts]), np.concatenate([p[1] for p in parts])
+
+
+def _band_keys(sig: np.ndarray, product_codes: np.ndarray, band: int) -> np.ndarray:
+    rows = NUM_PERM // BANDS
+    key = product_codes.astype(np.uint64) * _MIX + np.uint64(band)
+    for col in sig[:, band * rows:(band + 1) * rows].T:
+        key = (key ^ col.astype(np.uint64)) * _MIX
+    return key
+
+
+def _candidate_pairs(sig: np.ndarray, product_codes: np.ndarray):
+    """Every doc that shares a band bucket with others is paired with the bucket's first doc."""
+    us, vs = [], []
+    for band in range(BANDS):
+        keys = _band_keys(sig, product_codes, band)
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        new_group = np.r_[True, sorted_keys[1:] != sorted_keys[:-1]]
+        first = order[np.flatnonzero(new_group)]
+        group_first = first[np.cumsum(new_group) - 1]
+        member = ~new_group
+        us.append(group_first[member])
+        vs.append(order[member])
+    u, v = np.concatenate(us), np.concatenate(vs)
+    if not len(u):
+        return u, v
+    pairs = np.unique(np.minimum(u, v) * len(sig) + np.maximum(u, v))
+    return pairs // len(sig), pairs % len(sig)
+
+
+def _components(n: int, u: np.ndarray, v: np.ndarray) -> np.ndarray:
+    """Smallest node index of each node's connected component (label propagation)."""
+    labels = np.arange(n)
+    while True:
+        low = np.minimum(labels[u], labels[v])
+        new = labels.copy()
+        np.minimum.at(new, u, low)
+        np.minimum.at(new, v, low)
+        new = new[new]
+        if np.array_equal(new, labels):
+            return labels
+        labels = new
+
+
+def find_near_duplicates(product_ids, texts) -> tuple[np.ndarray, np.ndarray]:
+    """
+    (cluster, duplicate) per comment, in input order.
+
+    cluster is the position of the first comment of its near-duplicate group
+    (-1 when the comment has no near duplicate); duplicate is True for every
+    member except that first one, i.e. the rows to leave out of summaries.
+    """
+    product_codes = np.unique(np.asarray(product_ids, dtype=str), return_inverse=True)[1]
+    sig, n_tokens = minhash_signatures(texts)
+    n = len(sig)
+
+    eligible = np.flatnonzero(n_tokens >= MIN_TOKENS)
+    cluster = np.full(n, -1, dtype=np.int64)
+    if len(eligible) < 2:
+        return cluster, np.zeros(n, dtype=bool)
+
+    u, v = _candidate_pairs(sig[eligible], product_codes[eligible])
+    similar = (sig[eligible[u]] == sig[eligible[v]]).mean(axis=1) >= SIMILARITY_THRESHOLD
+    u, v = u[similar], v[similar]
+
+    labels = eligible[_components(len(eligible), u, v)]
+    sizes = np.bincount(labels, minlength=n)
+    grouped = sizes[labels] > 1
+    cluster[eligible[grouped]] = labels[grouped]
+    duplicate = (cluster >= 0) & (cluster != np.arange(n))
+    return cluster, duplicate
+
+
+def cluster_report(product_ids, cluster: np.ndarray) -> dict[str, dict]:
+    """Per product: comments, duplicates removed and near-duplicate cluster sizes (largest first)."""
+    product_ids = np.asarray(product_ids, dtype=str)
+    report = {
+        str(pid): {"product_id": str(pid), "comments": int(n), "duplicates": 0, "clusters": 0, "cluster_sizes": ""}
+        for pid, n in zip(*np.unique(product_ids, return_counts=True))
+    }
+    grouped = cluster >= 0
+    roots, sizes = np.unique(cluster[grouped], return_counts=True)
+    by_product: dict[str, list[int]] = {}
+    for root, size in zip(roots, sizes):
+        by_product.setdefault(str(product_ids[root]), []).append(int(size))
+    for pid, cluster_sizes in by_product.items():
+        cluster_sizes.sort(reverse=True)
+        report[pid].update(
+            duplicates=sum(cluster_sizes) - len(cluster_sizes),
+            clusters=len(cluster_sizes),
+            cluster_sizes=", ".join(map(str, cluster_sizes)),
+        )
+    return report
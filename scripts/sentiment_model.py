@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+Text sentiment for comments: hashed word n-grams + a linear model.
+
+    python scripts/sentiment_model.py train      # fit on rated comments, write the model
+    python scripts/sentiment_model.py evaluate   # accuracy of the saved model on rated comments
+
+- featurize(texts):   a whole batch -> CSRMatrix of hashed unigram + bigram features
+- SentimentModel:     logistic regression weights; scoring a batch is one
+                      sparse matrix-vector product
+- train(texts, y):    full-batch gradient descent (Adagrad) on the same CSRMatrix
+
+Only numpy is needed. Tokenizing and hashing work on the UTF-8 bytes of the
+whole batch at once: every non-ASCII byte counts as a word character (Persian
+letters), ASCII letters/digits too, everything else separates words. A token's
+hash is a polynomial hash over its bytes, taken from one prefix-sum over the
+batch, so no per-token Python work is done.
+"""
+import argparse
+import hashlib
+import os
+import re
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+from persian_text import _FA_REPLACEMENTS
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+DATA_DIR = Path(os.getenv("INSIGHTS_DATA_DIR", BASE_DIR / "data"))
+
+COMMENTS_CSV = DATA_DIR / "comments_raw.csv"
+SENTIMENT_MODEL_NPZ = DATA_DIR / "sentiment_model.npz"
+
+HASH_BITS = 18
+POSITIVE_THRESHOLD = 0.6
+NEGATIVE_THRESHOLD = 0.4
+FEATURIZE_CHUNK = 50_000  # comments hashed per pass; bounds the byte-level temporaries
+
+# Persian normalization plus Persian punctuation turned into separators.
+_FEATURE_REPLACEMENTS = dict(_FA_REPLACEMENTS)
+_FEATURE_REPLACEMENTS.update({ch: " " for ch in "،؛؟«»…"})
+_FEATURE_CHARS = re.compile("[" + "".join(re.escape(ch) for ch in _FEATURE_REPLACEMENTS) + "]")
+
+_WORD_BYTE = np.zeros(256, dtype=bool)
+_WORD_BYTE[0x80:] = True
+for _lo, _hi in ((ord("0"), ord("9")), (ord("A"), ord("Z")), (ord("a"), ord("z"))):
+    _WORD_BYTE[_lo:_hi + 1] = True
+
+# ASCII lower-casing, shifted by one so that no byte maps to 0
+_LOWER_BYTE = np.arange(1, 257, dtype=np.uint64)
+_LOWER_BYTE[ord("A"):ord("Z") + 1] += 32
+
+_P = np.uint64(0x100000001B3)  # FNV prime; odd, so invertible mod 2**64
+_P_INV = np.uint64(pow(int(_P), -1, 2**64))
+_BIGRAM_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+
+def _replace_feature_char(m: re.Match) -> str:
+    return _FEATURE_REPLACEMENTS[m.group()]
+
+
+@dataclass
+class CSRMatrix:
+    """Row i holds indices[indptr[i]:indptr[i+1]] with values data[...]."""
+
+    indptr: np.ndarray  # int64, n_rows + 1
+    indices: np.ndarray  # int32
+    data: np.ndarray  # float32
+    n_cols: int
+
+    @property
+    def n_rows(self) -> int:
+        return len(self.indptr) - 1
+
+    def _row_ids(self) -> np.ndarray:
+        return np.repeat(np.arange(self.n_rows), np.diff(self.indptr))
+
+    def dot(self, vec: np.ndarray) -> np.ndarray:
+        """X @ vec"""
+        products = vec[self.indices] * self.data
+        out = np.zeros(self.n_rows, dtype=np.float64)
+        nonempty = self.indptr[:-1] < self.indptr[1:]
+        if products.size:
+            out[nonempty] = np.add.reduceat(products, self.indptr[:-1][nonempty])
+        return out
+
+    def tdot(self, vec: np.ndarray) -> np.ndarray:
+        """X.T @ vec"""
+        weights = self.data * vec[self._row_ids()]
+        return np.bincount(self.indices, weights=weights, minlength=self.n_cols)
+
+    @classmethod
+    def vstack(cls, parts: list["CSRMatrix"]) -> "CSRMatrix":
+        indptr = [np.zeros(1, dtype=np.int64)]
+        base = 0
+        for p in parts:
+            indptr.append(p.indptr[1:] + base)
+            base += int(p.indptr[-1])
+        return cls(
+            indptr=np.concatenate(indptr),
+            indices=np.concatenate([p.indices for p in parts]) if parts else np.zeros(0, dtype=np.int32),
+            data=np.concatenate([p.data for p in parts]) if parts else np.zeros(0, dtype=np.float32),
+            n_cols=parts[0].n_cols if parts else 1 << HASH_BITS,
+        )
+
+
+def token_hashes(texts: list):
+    """(doc id per token, 64-bit token hash) for one batch, tokens in text order."""
+    texts = [t if isinstance(t, str) else "" for t in texts]
+    joined = "\x00".join(texts)
+    if joined.count("\x00") != max(len(texts) - 1, 0):
+        joined = "\x00".join(t.replace("\x00", " ") for t in texts)
+    joined = _FEATURE_CHARS.sub(_replace_feature_char, joined)
+    raw = np.frombuffer(("\x00" + joined + "\x00").encode("utf-8"), dtype=np.uint8)
+
+    word = _WORD_BYTE[raw]
+    edges = np.diff(word.view(np.int8))
+    starts = np.flatnonzero(edges == 1) + 1
+    ends = np.flatnonzero(edges == -1) + 1
+    # doc boundaries are the \x00 bytes
+    docs = np.searchsorted(np.flatnonzero(raw == 0), starts) - 1
+
+    # hash of raw[s:e] = (prefix[e] - prefix[s]) * P**-s = sum of byte_i * P**(i - s),
+    # which only depends on the token's bytes, not on where it sits in the batch
+    n = len(raw)
+    powers, inv_powers = _powers(n + 1)
+    prefix = np.zeros(n + 1, dtype=np.uint64)
+    values = _LOWER_BYTE[raw]
+    values *= powers[:n]
+    np.cumsum(values, out=prefix[1:])
+    hashes = prefix[ends]
+    hashes -= prefix[starts]
+    hashes *= inv_powers[starts]
+    return docs, hashes
+
+
+_POWERS = np.ones(1, dtype=np.uint64)
+_INV_POWERS = np.ones(1, dtype=np.uint64)
+
+
+def _geometric(base: np.uint64, n: int) -> np.ndarray:
+    out = np.full(n, base, dtype=np.uint64)
+    out[0] = 1
+    return np.cumprod(out, out=out)
+
+
+def _powers(n: int) -> tuple[np.ndarray, np.ndarray]:
+    """(P**k, P**-k) mod 2**64 for k < n at least; grown on demand and reused."""
+    global _POWERS, _INV_POWERS
+    if len(_POWERS) < n:
+        size = max(n, 2 * len(_POWERS))
+        _POWERS = _geometric(_P, size)
+        _INV_POWERS = _geometric(_P_INV, size)
+    return _POWERS, _INV_POWERS
+
+
+def _bucket(hashes: np.ndarray, hash_bits: int) -> np.ndarray:
+    h = hashes ^ (hashes >> np.uint64(29))
+    h *= np.uint64(0xBF58476D1CE4E5B9)
+    h ^= h >> np.uint64(32)
+    return (h >> np.uint64(64 - hash_bits)).astype(np.int32)
+
+
+def _featurize_chunk(texts: list, hash_bits: int) -> CSRMatrix:
+    n_docs = len(texts)
+    docs, hashes = token_hashes(texts)
+
+    # bigram = consecutive tokens of the same doc
+    same_doc = docs[1:] == docs[:-1]
+    bigram_docs = docs[:-1][same_doc]
+    bigram_hashes = hashes[:-1][same_doc] * _BIGRAM_MIX + hashes[1:][same_doc]
+
+    uni_counts = np.bincount(docs, minlength=n_docs)
+    bi_counts = np.bincount(bigram_docs, minlength=n_docs)
+    row_len = uni_counts + bi_counts
+    indptr = np.zeros(n_docs + 1, dtype=np.int64)
+    np.cumsum(row_len, out=indptr[1:])
+
+    # place each doc's unigrams, then its bigrams, in its row
+    uni_first = np.zeros(n_docs, dtype=np.int64)
+    np.cumsum(uni_counts[:-1], out=uni_first[1:])
+    bi_first = np.zeros(n_docs, dtype=np.int64)
+    np.cumsum(bi_counts[:-1], out=bi_first[1:])
+    uni_pos = indptr[docs] + np.arange(len(docs)) - uni_first[docs]
+    bi_pos = indptr[bigram_docs] + uni_counts[bigram_docs] + np.arange(len(bigram_docs)) - bi_first[bigram_docs]
+
+    indices = np.empty(int(indptr[-1]), dtype=np.int32)
+    indices[uni_pos] = _bucket(hashes, hash_bits)
+    indices[bi_pos] = _bucket(bigram_hashes, hash_bits)
+
+    # every row scaled to unit length, so long comments don't dominate
+    scale = 1.0 / np.sqrt(np.maximum(row_len, 1))
+    data = np.repeat(scale, row_len).astype(np.float32)
+    return CSRMatrix(indptr=indptr, indices=indices, data=data, n_cols=1 << hash_bits)
+
+
+def featurize(texts, hash_bits: int = HASH_BITS, chunk_size: int = FEATURIZE_CHUNK) -> CSRMatrix:
+    texts = list(texts)
+    return CSRMatrix.vstack([
+        _featurize_chunk(texts[i:i + chunk_size], hash_bits)
+        for i in range(0, len(texts), chunk_size)
+    ] or [_featurize_chunk([], hash_bits)])
+
+
+@dataclass
+class SentimentModel:
+    weights: np.ndarray  # float32, 2**hash_bits
+    bias: float
+    hash_bits: int = HASH_BITS
+
+    def predict_proba(self, texts) -> np.ndarray:
+        """P(positive) per text: one sparse matrix-vector product for the whole batch."""
+        X = featurize(texts, self.hash_bits)
+        return _sigmoid(X.dot(self.weights) + self.bias)
+
+    def codes(self, texts) -> np.ndarray:
+        """1 positive, 0 neutral, -1 negative (same codes as analyze_comments.sentiment_codes)."""
+        p = self.predict_proba(texts)
+        out = np.zeros(len(p), dtype=np.int8)
+        out[p >= POSITIVE_THRESHOLD] = 1
+        out[p <= NEGATIVE_THRESHOLD] = -1
+        return out
+
+    def digest(self) -> str:
+        h = hashlib.blake2b(digest_size=8)
+        h.update(np.float32(self.bias).tobytes())
+        h.update(np.ascontiguousarray(self.weights, dtype=np.float32).tobytes())
+        return h.hexdigest()
+
+    def save(self, path: Path):
+        tmp = path.with_name(path.name + ".tmp")
+        with tmp.open("wb") as f:
+            np.savez_compressed(f, weights=self.weights, bias=np.float64(self.bias), hash_bits=np.int64(self.hash_bits))
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> "SentimentModel | None":
+        if not path.exists():
+            return None
+        with np.load(path) as data:
+            return cls(
+                weights=data["weights"].astype(np.float32),
+                bias=float(data["bias"]),
+                hash_bits=int(data["hash_bits"]),
+            )
+
+
+def _sigmoid(z: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-np.clip(z, -30, 30)))
+
+
+def train(texts, labels: np.ndarray, hash_bits: int = HASH_BITS,
+          epochs: int = 200, lr: float = 0.5, l2: float = 1e-4) -> SentimentModel:
+    """
+    Logistic regression with balanced class weights. `labels` is 1 for
+    positive, 0 for negative.
+    """
+    X = featurize(texts, hash_bits)
+    y = np.asarray(labels, dtype=np.float64)
+    n_pos = max(y.sum(), 1.0)
+    n_neg = max(len(y) - y.sum(), 1.0)
+    sample_w = np.where(y == 1, len(y) / (2 * n_pos), len(y) / (2 * n_neg)) / len(y)
+
+    w = np.zeros(X.n_cols, dtype=np.float64)
+    b = 0.0
+    g2 = np.full(X.n_cols, 1e-8)
+    gb2 = 1e-8
+    for _ in range(epochs):
+        err = (_sigmoid(X.dot(w) + b) - y) * sample_w
+        grad = X.tdot(err) + l2 * w
+        g2 += grad * grad
+        w -= lr * grad / np.sqrt(g2)
+        gb = err.sum()
+        gb2 += gb * gb
+        b -= lr * gb / np.sqrt(gb2)
+    return SentimentModel(weights=w.astype(np.float32), bias=float(b), hash_bits=hash_bits)
+
+
+def rated_examples(path: Path):
+    """(bodies, labels) of comments rated >= 4 (positive) or <= 2 (negative)."""
+    import pandas as pd
+
+    df = pd.read_csv(path)
+    rating = pd.to_numeric(df.get("rating"), errors="coerce")
+    keep = (rating >= 4) | (rating <= 2)
+    bodies = df.loc[keep, "body"].fillna("").astype(str).tolist()
+    return bodies, (rating[keep] >= 4).to_numpy(dtype=np.int8)
+
+
+def _accuracy(model: SentimentModel, texts, labels) -> float:
+    if not len(labels):
+        return float("nan")
+    pred = model.predict_proba(texts) >= 0.5
+    return float((pred == labels.astype(bool)).mean())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train / evaluate the comment sentiment model")
+    parser.add_argument("command", choices=["train", "evaluate"])
+    parser.add_argument("--epochs", type=int, default=200)
+    parser.add_argument("--holdout", type=float, default=0.2,
+                        help="share of rated comments kept out of training for the accuracy report")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--data-dir", type=Path, default=DATA_DIR,
+                        help="directory with comments_raw.csv; the model is stored there too")
+    args = parser.parse_args(argv)
+    model_npz = args.data_dir / SENTIMENT_MODEL_NPZ.name
+
+    texts, labels = rated_examples(args.data_dir / COMMENTS_CSV.name)
+    if args.command == "evaluate":
+        model = SentimentModel.load(model_npz)
+        if model is None:
+            print(f"No model at {model_npz}; run `train` first.")
+            return
+        print(f"accuracy on {len(labels)} rated comments: {_accuracy(model, texts, labels):.3f}")
+        return
+
+    order = np.random.default_rng(args.seed).permutation(len(labels))
+    n_test = int(len(order) * args.holdout)
+    test, fit = order[:n_test], order[n_test:]
+    model = train([texts[i] for i in fit], labels[fit], epochs=args.epochs)
+    print(f"holdout accuracy: {_accuracy(model, [texts[i] for i in test], labels[test]):.3f} "
+          f"({len(fit)} train / {n_test} test, {labels.mean():.0%} positive)")
+
+    # final model uses every rated comment
+    model = train(texts, labels, epochs=args.epochs)
+    model.save(model_npz)
+    print(f"Saved sentiment model to {model_npz}")
+
+
+if __name__ == "__main__":
+    main()